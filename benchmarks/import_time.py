@@ -0,0 +1,121 @@
+"""
+Measures how long it takes to import nymphes-osc's modules, using
+python -X importtime, and checks that slow optional modules aren't
+imported where they aren't needed.
+
+Run it from the repository root:
+
+    python benchmarks/import_time.py
+
+The exit status is 1 if a module takes longer than its budget to
+import, imports a module it shouldn't, or creates files in the home
+folder when imported.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+
+# Each entry: (module name, budget in milliseconds, modules it must not import)
+checks = [
+    ('nymphes_midi.NymphesPreset', 100, ['mido', 'rtmidi', 'pythonosc', 'zeroconf', 'netifaces']),
+    ('nymphes_osc.__main__', 60, ['mido', 'rtmidi', 'pythonosc', 'zeroconf', 'netifaces', 'multiprocessing']),
+    ('nymphes_osc.NymphesOSC', 275, ['zeroconf', 'netifaces', 'numpy', 'multiprocessing']),
+]
+
+
+def import_times(module_name, env):
+    """
+    Import module_name in a new interpreter with -X importtime.
+    :param module_name: str
+    :param env: dict. The environment for the interpreter.
+    :return: A dict. key: module name. value: cumulative import time in microseconds
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module_name}'],
+        env=env,
+        capture_output=True,
+        text=True
+    )
+
+    if result.returncode != 0:
+        raise Exception(f'Failed to import {module_name}: {result.stderr.strip().splitlines()[-1:]}')
+
+    times = {}
+    for line in result.stderr.splitlines():
+        # ie: import time:       312 |       2424 |     nymphes_midi.PresetLibrary
+        if not line.startswith('import time:'):
+            continue
+
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            continue
+
+        times[fields[2].strip()] = int(fields[1])
+
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the import time of nymphes-osc modules')
+    parser.add_argument('--runs', type=int, default=7, help='The number of times to import each module. Defaults to 7.')
+    parser.add_argument(
+        '--budget_scale',
+        type=float,
+        default=1.0,
+        help='Multiply every budget by this, for slower or faster machines. Defaults to 1.0.'
+    )
+    args = parser.parse_args()
+
+    src_directory_path = Path(__file__).absolute().parent.parent / 'src'
+
+    failures = []
+
+    with tempfile.TemporaryDirectory() as home_directory_path:
+        env = dict(os.environ)
+
+        # Import the modules in this repository, using an empty home
+        # folder so we can check that importing doesn't create files
+        env['PYTHONPATH'] = os.pathsep.join(
+            [str(src_directory_path)] + [path for path in env.get('PYTHONPATH', '').split(os.pathsep) if path]
+        )
+        env['HOME'] = home_directory_path
+        env['USERPROFILE'] = home_directory_path
+
+        # Compiling the modules would be counted as import time
+        env.pop('PYTHONDONTWRITEBYTECODE', None)
+
+        for module_name, budget_ms, forbidden_module_names in checks:
+            # The first import writes bytecode files, so it isn't counted
+            times = import_times(module_name, env)
+
+            imported_forbidden_module_names = [name for name in forbidden_module_names if name in times]
+            if len(imported_forbidden_module_names) > 0:
+                failures.append(f'{module_name} imports {", ".join(imported_forbidden_module_names)}')
+
+            median_ms = statistics.median(
+                import_times(module_name, env)[module_name] / 1000 for _ in range(args.runs)
+            )
+
+            scaled_budget_ms = budget_ms * args.budget_scale
+            print(f'{module_name}: {median_ms:.1f} ms (budget {scaled_budget_ms:.0f} ms)')
+
+            if median_ms > scaled_budget_ms:
+                failures.append(f'{module_name} took {median_ms:.1f} ms to import (budget {scaled_budget_ms:.0f} ms)')
+
+        created_paths = sorted(str(path.relative_to(home_directory_path)) for path in Path(home_directory_path).rglob('*'))
+        if len(created_paths) > 0:
+            failures.append(f'Importing created files in the home folder: {", ".join(created_paths)}')
+
+    for failure in failures:
+        print(f'FAILED: {failure}')
+
+    return 1 if len(failures) > 0 else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
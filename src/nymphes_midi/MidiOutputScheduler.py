@@ -0,0 +1,572 @@
+import time
+import threading
+from collections import deque
+import mido
+
+
+class MidiOutputScheduler:
+    """
+    Queues MIDI messages for one output port and sends them at a
+    limited byte rate, using a token bucket, so bursts of SYSEX don't
+    overrun the receiving device's input buffer.
+    Messages are sorted into three lanes:
+    - Performance controls (mod wheel, sustain pedal, aftertouch, etc)
+      are always sent first, and may use the whole budget.
+    - Parameter MIDI CCs and program changes.
+    - SYSEX, which can't use the last reserve_bytes of the budget, so
+      performance controls queued while presets are being sent go out
+      straight away.
+    Parameter messages and SYSEX messages are sent in the order they
+    were queued, as a SYSEX preset replaces every parameter value. A
+    SYSEX message therefore acts as a barrier: parameter messages queued
+    after it wait for it to be sent. Performance controls aren't part of
+    the preset, so they may overtake both.
+    Only the latest value of each controller is kept: a controller
+    message replaces the queued message for the same controller and
+    channel, keeping its place in the queue, unless a SYSEX message or
+    program change (for parameters) or a note (for performance controls)
+    was queued in between. Notes, program changes and SYSEX messages are
+    all sent.
+    Modulation matrix parameters are set by selecting a modulation source
+    with MIDI CC 30 and then sending the parameter's MIDI CC. The last
+    source sent is tracked, and CC 30 messages which select the source
+    that is already selected are left out. The source is forgotten when
+    a SYSEX message or program change is sent, as it may load a preset. Before sending, queued
+    modulation matrix writes are grouped by source so each source is
+    selected once, and the last source requested is selected at the end.
+    Messages from MIDI input ports are queued with put_in_order(), and
+    are sent in the order they were received: a note must not overtake
+    the program change or parameter MIDI CC played just before it.
+    Performance controls may also be sent straight away with send_now(),
+    ie: for MIDI thru, without waiting for the next call to send_pending().
+    Messages may be queued and sent from any thread.
+    """
+
+    # Lanes, in priority order
+    performance_lane = 0
+    parameter_lane = 1
+    sysex_lane = 2
+
+    # MIDI CC numbers which are performance controls rather than parameters:
+    # mod wheel, foot controller, sustain pedal
+    performance_control_numbers = {1, 4, 64}
+
+    # Message types which are always performance controls
+    performance_message_types = {'aftertouch', 'polytouch', 'pitchwheel', 'note_on', 'note_off'}
+
+    # The MIDI CC which selects the modulation source
+    mod_source_control = 30
+
+    def __init__(self, port, bytes_per_sec=10000, burst_bytes=4096, reserve_bytes=256,
+                 mod_matrix_control_numbers=None):
+        """
+        :param port: A mido output port
+        :param bytes_per_sec: int or None. The byte rate budget. None means no limit.
+        :param burst_bytes: int. The most that may be sent at once after
+        a quiet period. This should be more than the largest SYSEX message.
+        :param reserve_bytes: int. The part of the budget that SYSEX can't use.
+        :param mod_matrix_control_numbers: A set of the MIDI CC numbers whose meaning
+        depends on the selected modulation source. If None, then mod matrix
+        writes are not grouped, but redundant CC 30 messages are still left out.
+        """
+        self.port = port
+
+        # Held while the lanes are being changed
+        self._lock = threading.Lock()
+
+        self._mod_matrix_control_numbers = mod_matrix_control_numbers or set()
+
+        # The modulation source last selected on the port
+        # key: MIDI channel, value: CC 30 value
+        # A channel is missing if its source is unknown.
+        self._mod_sources_dict = {}
+
+        # True when messages have been queued which should be grouped
+        # by modulation source before they are sent
+        self._mod_matrix_writes_queued = False
+
+        self._bytes_per_sec = None
+        self._burst_bytes = burst_bytes
+        self._reserve_bytes = reserve_bytes
+        self.set_byte_rate(bytes_per_sec)
+
+        # Each lane is a deque of lists:
+        # [sequence number, mido message, size in bytes, controller key, bool: queued with put_in_order()]
+        self._lanes = (deque(), deque(), deque())
+        self._next_sequence_number = 0
+
+        # The number of messages queued with put_in_order() that haven't been sent
+        self._in_order_pending_count = 0
+
+        # The queued entry for each controller, so a new value can replace it.
+        # One dict each for the performance and parameter lanes.
+        # key: controller key tuple, value: the entry list
+        self._controller_entries_dicts = ({}, {})
+
+        # The modulation source selected by the CC 30 messages queued in
+        # the parameter lane, used to tell mod matrix parameters apart.
+        # key: MIDI channel, value: CC 30 value
+        self._queued_mod_sources_dict = {}
+
+        # The number of bytes we may send now
+        self._tokens = float(burst_bytes)
+        self._tokens_timestamp = time.monotonic()
+
+        # Counters, for stats
+        self.messages_sent = 0
+        self.bytes_sent = 0
+        self.mod_source_messages_elided = 0
+        self.messages_coalesced = 0
+        self.messages_sent_immediately = 0
+
+    @property
+    def bytes_per_sec(self):
+        return self._bytes_per_sec
+
+    @property
+    def pending_count(self):
+        return sum(len(lane) for lane in self._lanes)
+
+    @property
+    def sysex_pending_count(self):
+        return len(self._lanes[self.sysex_lane])
+
+    def set_byte_rate(self, bytes_per_sec):
+        """
+        Change the byte rate budget.
+        Raises an Exception if bytes_per_sec is invalid.
+        :param bytes_per_sec: int or None. None or 0 means no limit.
+        :return:
+        """
+        if bytes_per_sec is not None and (not isinstance(bytes_per_sec, int) or bytes_per_sec < 0):
+            raise Exception(f'bytes_per_sec should be None or an int of 0 or more: {bytes_per_sec}')
+
+        self._bytes_per_sec = bytes_per_sec if bytes_per_sec else None
+
+    def put(self, msg):
+        """
+        Queue a message to be sent.
+        :param msg: A mido message
+        :return:
+        """
+        with self._lock:
+            self._put(msg)
+
+    def _put(self, msg):
+        """
+        Queue a message. The lock must be held.
+        """
+        if msg.type == 'sysex':
+            lane = self.sysex_lane
+            size = len(msg.data) + 2
+
+        elif msg.type in self.performance_message_types or \
+                (msg.type == 'control_change' and msg.control in self.performance_control_numbers):
+            lane = self.performance_lane
+            size = 2 if msg.type == 'aftertouch' else 3
+
+        else:
+            lane = self.parameter_lane
+            size = len(msg.bytes())
+
+            if msg.type == 'control_change' and \
+                    (msg.control == self.mod_source_control or msg.control in self._mod_matrix_control_numbers):
+                self._mod_matrix_writes_queued = True
+
+        key = self._controller_key(msg)
+
+        if key is not None:
+            entries_dict = self._controller_entries_dicts[lane]
+            entry = entries_dict.get(key)
+
+            if entry is not None:
+                # Replace the queued value
+                entry[1] = msg
+                self.messages_coalesced += 1
+                return
+
+            entry = [self._next_sequence_number, msg, size, key, False]
+            entries_dict[key] = entry
+
+        else:
+            entry = [self._next_sequence_number, msg, size, None, False]
+
+            if msg.type == 'sysex' or msg.type == 'program_change':
+                # Parameter messages queued after this must not replace ones
+                # queued before it, and the modulation source is unknown
+                self._controller_entries_dicts[self.parameter_lane].clear()
+                self._queued_mod_sources_dict.clear()
+
+            elif msg.type == 'note_on' or msg.type == 'note_off':
+                # Performance controls queued after a note must not replace
+                # ones queued before it, ie: a sustain pedal press after a
+                # note must not be sent before the note
+                self._controller_entries_dicts[self.performance_lane].clear()
+
+            elif msg.type == 'control_change' and msg.control == self.mod_source_control:
+                self._queued_mod_sources_dict[msg.channel] = msg.value
+
+        self._lanes[lane].append(entry)
+        self._next_sequence_number += 1
+
+    def put_in_order(self, msg):
+        """
+        Queue a message which must be sent after every message queued
+        before it with put_in_order(), ie: a message from a MIDI input port.
+        It is not replaced by later values for the same controller, and
+        later parameter messages don't replace ones queued before it.
+        :param msg: A mido message
+        :return:
+        """
+        with self._lock:
+            self._put_in_order(msg)
+
+    def _put_in_order(self, msg):
+        """
+        Queue a message in order. The lock must be held.
+        """
+        if msg.type == 'sysex':
+            lane = self.sysex_lane
+            size = len(msg.data) + 2
+
+        else:
+            # The parameter lane is sent in order with the SYSEX lane,
+            # so performance controls go there too
+            lane = self.parameter_lane
+            size = len(msg.bytes())
+
+        self._controller_entries_dicts[self.parameter_lane].clear()
+
+        if msg.type == 'control_change' and msg.control == self.mod_source_control:
+            self._queued_mod_sources_dict[msg.channel] = msg.value
+
+        elif msg.type == 'sysex' or msg.type == 'program_change':
+            self._queued_mod_sources_dict.clear()
+
+        self._lanes[lane].append([self._next_sequence_number, msg, size, None, True])
+        self._next_sequence_number += 1
+        self._in_order_pending_count += 1
+
+    def _controller_key(self, msg):
+        """
+        Get the key used to find a queued message for the same controller.
+        :param msg: A mido message
+        :return: A tuple, or None if the message must always be sent
+        """
+        if msg.type == 'control_change':
+            if msg.control == self.mod_source_control:
+                return None
+
+            if msg.control in self._mod_matrix_control_numbers:
+                # The same MIDI CC sets a different parameter for each modulation source
+                return msg.control, msg.channel, self._queued_mod_sources_dict.get(msg.channel)
+
+            return msg.control, msg.channel
+
+        if msg.type == 'aftertouch' or msg.type == 'pitchwheel':
+            return msg.type, msg.channel
+
+        if msg.type == 'polytouch':
+            return msg.type, msg.channel, msg.note
+
+        return None
+
+    def set_mod_source(self, channel, value):
+        """
+        Record that the device's modulation source has been changed by
+        something other than this scheduler, ie: on the device's panel.
+        :param channel: int. The zero-referenced MIDI channel
+        :param value: int or None. The CC 30 value, or None if it is unknown.
+        :return:
+        """
+        with self._lock:
+            if value is None:
+                self._mod_sources_dict.pop(channel, None)
+            else:
+                self._mod_sources_dict[channel] = value
+
+    def clear(self):
+        """
+        Discard all queued messages.
+        :return:
+        """
+        with self._lock:
+            for lane in self._lanes:
+                lane.clear()
+
+            for entries_dict in self._controller_entries_dicts:
+                entries_dict.clear()
+
+            self._queued_mod_sources_dict.clear()
+            self._in_order_pending_count = 0
+
+    def send_pending(self, send_function=None):
+        """
+        Send as many queued messages as the budget allows.
+        :param send_function: Optional. A function taking a mido message
+        which sends it. Defaults to port.send. Exceptions it raises are
+        passed on, after the message has been removed from its lane.
+        :return: int. The number of messages sent.
+        """
+        if send_function is None:
+            send_function = self.port.send
+
+        with self._lock:
+            return self._send_pending(send_function)
+
+    def send_now(self, msg, send_function=None):
+        """
+        Send a performance control straight away if no performance controls
+        or messages queued with put_in_order() are waiting, and the budget
+        allows. Otherwise queue it, in order if put_in_order() messages are
+        waiting.
+        :param msg: A mido message. Raises an Exception if it is not a performance control.
+        :param send_function: Optional. A function taking a mido message
+        which sends it. Defaults to port.send.
+        :return: bool. True if the message was sent, False if it was queued.
+        """
+        if msg.type in self.performance_message_types:
+            size = 2 if msg.type == 'aftertouch' else 3
+
+        elif msg.type == 'control_change' and msg.control in self.performance_control_numbers:
+            size = 3
+
+        else:
+            raise Exception(f'Only performance controls can be sent immediately: {msg}')
+
+        if send_function is None:
+            send_function = self.port.send
+
+        with self._lock:
+            # Don't overtake messages from MIDI input ports, ie: a note
+            # must not arrive before the program change played before it
+            if self._in_order_pending_count > 0:
+                self._put_in_order(msg)
+                return False
+
+            # Don't overtake queued performance controls, ie: a note off
+            # must not arrive before its note on
+            if self._lanes[self.performance_lane]:
+                self._put(msg)
+                return False
+
+            if self._bytes_per_sec is not None:
+                self._refill_tokens()
+
+                if self._tokens < size:
+                    self._put(msg)
+                    return False
+
+                self._tokens -= size
+
+            self.messages_sent += 1
+            self.bytes_sent += size
+            self.messages_sent_immediately += 1
+
+            send_function(msg)
+
+        return True
+
+    def _refill_tokens(self):
+        """
+        Add the tokens earned since the last refill. The lock must be held.
+        """
+        now = time.monotonic()
+        self._tokens = min(
+            self._tokens + (now - self._tokens_timestamp) * self._bytes_per_sec,
+            float(self._burst_bytes)
+        )
+        self._tokens_timestamp = now
+
+    def _send_pending(self, send_function):
+        """
+        Send queued messages. The lock must be held.
+        """
+        performance_lane, parameter_lane, sysex_lane = self._lanes
+
+        if not (performance_lane or parameter_lane or sysex_lane):
+            return 0
+
+        if self._bytes_per_sec is not None:
+            self._refill_tokens()
+
+        if self._mod_matrix_writes_queued:
+            self._group_mod_matrix_writes()
+
+        sent_count = 0
+
+        while True:
+            # Choose the next message
+            if performance_lane:
+                lane = performance_lane
+                floor = 0
+
+            elif parameter_lane and (not sysex_lane or parameter_lane[0][0] < sysex_lane[0][0]):
+                lane = parameter_lane
+                floor = 0
+
+            elif sysex_lane:
+                lane = sysex_lane
+                floor = self._reserve_bytes
+
+            else:
+                break
+
+            entry = lane[0]
+            size = entry[2]
+            msg = entry[1]
+
+            if msg.type == 'control_change' and msg.control == self.mod_source_control:
+                if self._mod_sources_dict.get(msg.channel) == msg.value:
+                    # This source is already selected
+                    lane.popleft()
+                    if entry[4]:
+                        self._in_order_pending_count -= 1
+                    self.mod_source_messages_elided += 1
+                    continue
+
+            if self._bytes_per_sec is not None:
+                # Messages larger than the budget allows are sent once
+                # the bucket is full, so they aren't held back forever
+                if self._tokens - size < floor and self._tokens < self._burst_bytes:
+                    break
+
+                self._tokens -= size
+
+            lane.popleft()
+
+            if entry[4]:
+                self._in_order_pending_count -= 1
+
+            key = entry[3]
+            if key is not None:
+                # New values for this controller are queued separately now
+                entries_dict = self._controller_entries_dicts[
+                    self.parameter_lane if lane is parameter_lane else self.performance_lane
+                ]
+                if entries_dict.get(key) is entry:
+                    del entries_dict[key]
+
+            if msg.type == 'control_change' and msg.control == self.mod_source_control:
+                self._mod_sources_dict[msg.channel] = msg.value
+
+            elif msg.type == 'sysex' or msg.type == 'program_change':
+                # A preset may change the selected modulation source
+                self._mod_sources_dict.clear()
+
+            self.messages_sent += 1
+            self.bytes_sent += size
+            sent_count += 1
+
+            send_function(msg)
+
+        return sent_count
+
+    def _group_mod_matrix_writes(self):
+        """
+        Reorder the parameter messages that will be sent before the next
+        SYSEX message or program change, so modulation matrix writes are
+        grouped by modulation source and each source is selected once.
+        Other parameter messages are sent first, in their queued order,
+        as they don't depend on the modulation source.
+        :return:
+        """
+        parameter_lane = self._lanes[self.parameter_lane]
+        sysex_lane = self._lanes[self.sysex_lane]
+        barrier_sequence_number = sysex_lane[0][0] if sysex_lane else None
+
+        # Take the messages up to the next barrier
+        run = []
+        while parameter_lane:
+            entry = parameter_lane[0]
+            if barrier_sequence_number is not None and entry[0] > barrier_sequence_number:
+                break
+            # Messages from MIDI input ports are sent in order
+            if entry[1].type == 'program_change' or entry[4]:
+                break
+            run.append(parameter_lane.popleft())
+
+        # Messages after the barrier are grouped once it has been sent
+        self._mod_matrix_writes_queued = len(parameter_lane) > 0
+
+        if len(run) == 0:
+            return
+
+        # Messages which don't depend on the modulation source
+        other_entries = []
+
+        # Modulation matrix writes
+        # key: (channel, CC 30 value), value: a list of entries
+        # A value of None means whichever source is selected when they are sent
+        groups_dict = {}
+
+        # The last source requested for each channel
+        # key: channel, value: CC 30 value
+        requested_sources_dict = {}
+
+        mod_source_message_count = 0
+
+        for entry in run:
+            msg = entry[1]
+
+            if msg.type != 'control_change':
+                other_entries.append(entry)
+
+            elif msg.control == self.mod_source_control:
+                requested_sources_dict[msg.channel] = msg.value
+                mod_source_message_count += 1
+
+            elif msg.control in self._mod_matrix_control_numbers:
+                source = requested_sources_dict.get(msg.channel)
+                groups_dict.setdefault((msg.channel, source), []).append(entry)
+
+            else:
+                other_entries.append(entry)
+
+        sequence_number = run[0][0]
+        grouped_entries = other_entries
+
+        for channel in sorted({key[0] for key in groups_dict} | set(requested_sources_dict)):
+            selected_source = self._mod_sources_dict.get(channel)
+            final_source = requested_sources_dict.get(channel)
+
+            # Writes for the source that is already selected go first,
+            # then the other sources in the order they were requested,
+            # ending with the last source requested
+            sources = [None, selected_source]
+            for group_channel, source in groups_dict:
+                if group_channel == channel and source not in sources and source != final_source:
+                    sources.append(source)
+            sources.append(final_source)
+
+            for source in sources:
+                entries = groups_dict.pop((channel, source), None)
+                if entries is None:
+                    continue
+
+                if source is not None and source != selected_source:
+                    grouped_entries.append(self._mod_source_entry(sequence_number, channel, source))
+                    selected_source = source
+
+                grouped_entries.extend(entries)
+
+            if final_source is not None and final_source != selected_source:
+                grouped_entries.append(self._mod_source_entry(sequence_number, channel, final_source))
+
+        self.mod_source_messages_elided += mod_source_message_count - sum(
+            1 for entry in grouped_entries
+            if entry[1].type == 'control_change' and entry[1].control == self.mod_source_control
+        )
+
+        parameter_lane.extendleft(reversed(grouped_entries))
+
+    def _mod_source_entry(self, sequence_number, channel, value):
+        """
+        Create a parameter lane entry which selects a modulation source.
+        :param sequence_number: int
+        :param channel: int. The zero-referenced MIDI channel
+        :param value: int. The CC 30 value
+        :return: A list: [sequence number, mido message, size in bytes, controller key, False]
+        """
+        msg = mido.Message('control_change', channel=channel, control=self.mod_source_control, value=value)
+        return [sequence_number, msg, 3, None, False]
@@ -0,0 +1,372 @@
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import platform
+import select
+import threading
+import time
+import mido
+
+
+class _AlsaSeqAnnounceListener:
+    """
+    A minimal ctypes wrapper around the ALSA sequencer API, which
+    subscribes to the System:Announce port so we are told when MIDI
+    ports are added, removed or changed.
+    Raises an Exception on creation if the ALSA sequencer is not available.
+    """
+
+    # Stream and mode flags for snd_seq_open (from alsa/seq.h)
+    SND_SEQ_OPEN_INPUT = 2
+    SND_SEQ_NONBLOCK = 1
+
+    # Port capabilities and types (from alsa/seq.h)
+    SND_SEQ_PORT_CAP_WRITE = 1 << 1
+    SND_SEQ_PORT_CAP_SUBS_WRITE = 1 << 6
+    SND_SEQ_PORT_CAP_NO_EXPORT = 1 << 7
+    SND_SEQ_PORT_TYPE_APPLICATION = 1 << 20
+
+    # The System client's announce port
+    SND_SEQ_CLIENT_SYSTEM = 0
+    SND_SEQ_PORT_SYSTEM_ANNOUNCE = 1
+
+    # Announce event types which mean the list of ports may have changed
+    # (SND_SEQ_EVENT_PORT_START, SND_SEQ_EVENT_PORT_EXIT, SND_SEQ_EVENT_PORT_CHANGE).
+    # Client start and exit events are ignored, as enumerating ports
+    # creates and closes a client without any ports.
+    port_event_types = {63, 64, 65}
+
+    POLLIN = 1
+
+    class _PollFd(ctypes.Structure):
+        _fields_ = [('fd', ctypes.c_int), ('events', ctypes.c_short), ('revents', ctypes.c_short)]
+
+    def __init__(self, client_name):
+        """
+        :param client_name: str. The name of our sequencer client. Ports
+        of this client should be left out of port listings.
+        """
+        if platform.system() != 'Linux':
+            raise Exception('The ALSA sequencer is only available on Linux')
+
+        library_name = ctypes.util.find_library('asound') or 'libasound.so.2'
+        self._libasound = ctypes.CDLL(library_name)
+
+        self._libasound.snd_seq_open.argtypes = [
+            ctypes.POINTER(ctypes.c_void_p), ctypes.c_char_p, ctypes.c_int, ctypes.c_int
+        ]
+        self._libasound.snd_seq_set_client_name.argtypes = [ctypes.c_void_p, ctypes.c_char_p]
+        self._libasound.snd_seq_create_simple_port.argtypes = [
+            ctypes.c_void_p, ctypes.c_char_p, ctypes.c_uint, ctypes.c_uint
+        ]
+        self._libasound.snd_seq_connect_from.argtypes = [ctypes.c_void_p, ctypes.c_int, ctypes.c_int, ctypes.c_int]
+        self._libasound.snd_seq_poll_descriptors_count.argtypes = [ctypes.c_void_p, ctypes.c_short]
+        self._libasound.snd_seq_poll_descriptors.argtypes = [
+            ctypes.c_void_p, ctypes.POINTER(self._PollFd), ctypes.c_uint, ctypes.c_short
+        ]
+        self._libasound.snd_seq_event_input.argtypes = [ctypes.c_void_p, ctypes.POINTER(ctypes.c_void_p)]
+        self._libasound.snd_seq_close.argtypes = [ctypes.c_void_p]
+
+        self._seq = ctypes.c_void_p()
+
+        result = self._libasound.snd_seq_open(
+            ctypes.byref(self._seq), b'default', self.SND_SEQ_OPEN_INPUT, self.SND_SEQ_NONBLOCK
+        )
+        if result < 0:
+            raise OSError(-result, f'snd_seq_open failed: {os.strerror(-result)}')
+
+        try:
+            self._libasound.snd_seq_set_client_name(self._seq, client_name.encode())
+
+            port = self._libasound.snd_seq_create_simple_port(
+                self._seq,
+                b'announce',
+                self.SND_SEQ_PORT_CAP_WRITE | self.SND_SEQ_PORT_CAP_SUBS_WRITE | self.SND_SEQ_PORT_CAP_NO_EXPORT,
+                self.SND_SEQ_PORT_TYPE_APPLICATION
+            )
+            if port < 0:
+                raise OSError(-port, f'snd_seq_create_simple_port failed: {os.strerror(-port)}')
+
+            result = self._libasound.snd_seq_connect_from(
+                self._seq, port, self.SND_SEQ_CLIENT_SYSTEM, self.SND_SEQ_PORT_SYSTEM_ANNOUNCE
+            )
+            if result < 0:
+                raise OSError(-result, f'snd_seq_connect_from failed: {os.strerror(-result)}')
+
+            # Get the file descriptors to wait on
+            fd_count = self._libasound.snd_seq_poll_descriptors_count(self._seq, self.POLLIN)
+            poll_fds = (self._PollFd * fd_count)()
+            fd_count = self._libasound.snd_seq_poll_descriptors(self._seq, poll_fds, fd_count, self.POLLIN)
+            self.fds = [poll_fds[i].fd for i in range(fd_count)]
+
+        except Exception:
+            self.close()
+            raise
+
+    def read_port_events(self):
+        """
+        Read all pending events without blocking.
+        :return: bool. True if any of them were port events.
+        """
+        port_event_received = False
+        event_pointer = ctypes.c_void_p()
+
+        while True:
+            result = self._libasound.snd_seq_event_input(self._seq, ctypes.byref(event_pointer))
+
+            if result == -errno.ENOSPC:
+                # The input buffer overflowed, so events were lost
+                port_event_received = True
+                continue
+
+            if result < 0 or not event_pointer.value:
+                # -EAGAIN: There are no more events
+                return port_event_received
+
+            # The event type is the first byte of snd_seq_event_t
+            if ctypes.c_ubyte.from_address(event_pointer.value).value in self.port_event_types:
+                port_event_received = True
+
+    def close(self):
+        if self._seq:
+            self._libasound.snd_seq_close(self._seq)
+            self._seq = ctypes.c_void_p()
+
+
+class MidiPortScanner:
+    """
+    Lists MIDI input and output ports on a background thread, so the
+    thread handling MIDI messages never waits for port enumeration.
+    On Linux, the ALSA sequencer's announce events are used to scan as
+    soon as ports are added or removed, with an occasional scan as a
+    safety net. Elsewhere, or if ALSA can't be used, ports are polled,
+    quickly while fast_polling_function returns True and slowly otherwise.
+    Call get_changed_port_names() regularly to get the port names when
+    they change.
+    """
+
+    # The name of our ALSA sequencer client
+    alsa_client_name = 'nymphes-osc port scanner'
+
+    def __init__(self, fast_polling_function=None, fast_poll_interval_sec=0.5,
+                 slow_poll_interval_sec=2.0, announce_settle_sec=0.1, announce_poll_interval_sec=10.0):
+        """
+        :param fast_polling_function: Optional. A function returning a bool, called
+        on the scanner thread. While it returns True, ports are polled every
+        fast_poll_interval_sec. Otherwise they are polled every slow_poll_interval_sec.
+        If None, then fast polling is always used.
+        :param fast_poll_interval_sec: float
+        :param slow_poll_interval_sec: float
+        :param announce_settle_sec: When using ALSA announce events, scan this
+        long after a port event, as a device adds its ports one at a time
+        :param announce_poll_interval_sec: When using ALSA announce events, also
+        scan this often in case an event was missed
+        """
+        # Get logger
+        self.logger = logging.getLogger('nymphes-osc.midi_port_scanner')
+
+        self._fast_polling_function = fast_polling_function
+        self._fast_poll_interval_sec = fast_poll_interval_sec
+        self._slow_poll_interval_sec = slow_poll_interval_sec
+        self._announce_settle_sec = announce_settle_sec
+        self._announce_poll_interval_sec = announce_poll_interval_sec
+
+        self._thread = None
+        self._stop_event = threading.Event()
+
+        # Set to wake the polling thread for an immediate scan
+        self._scan_requested_event = threading.Event()
+
+        # The pipe used to wake the ALSA thread, and a lock so it isn't
+        # written to while it is being closed
+        self._wake_write_fd = None
+        self._wake_lock = threading.Lock()
+
+        # Used for the port names handed over to get_changed_port_names()
+        self._lock = threading.Lock()
+
+        # A tuple: (list of input port names, list of output port names)
+        self._port_names = None
+        self._port_names_changed = False
+
+        # The number of scans performed, for stats
+        self._scan_count = 0
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def scan_count(self):
+        return self._scan_count
+
+    def start(self):
+        """
+        Start scanning on a background thread. The first scan is done immediately.
+        :return:
+        """
+        if self.running:
+            return
+
+        self._stop_event.clear()
+
+        try:
+            listener = _AlsaSeqAnnounceListener(self.alsa_client_name)
+        except Exception as e:
+            self.logger.info(f'Using polling to detect MIDI ports ({e})')
+            listener = None
+
+        if listener is not None:
+            self.logger.info('Using ALSA sequencer announcements to detect MIDI ports')
+            self._thread = threading.Thread(target=self._run_alsa, args=(listener,), daemon=True)
+        else:
+            self._thread = threading.Thread(target=self._run_polling, daemon=True)
+
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop scanning, and wait for the background thread to finish.
+        :return:
+        """
+        self._stop_event.set()
+        self._scan_requested_event.set()
+        self._wake()
+
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def request_scan(self):
+        """
+        Ask the scanner thread to scan as soon as possible.
+        :return:
+        """
+        self._scan_requested_event.set()
+        self._wake()
+
+    def get_changed_port_names(self):
+        """
+        Returns the port names if they have changed since this was last called.
+        Doesn't block, apart from briefly taking a lock.
+        :return: A tuple: (list of input port names, list of output port names),
+        or None if they haven't changed.
+        """
+        with self._lock:
+            if not self._port_names_changed:
+                return None
+
+            self._port_names_changed = False
+            return self._port_names
+
+    def _scan(self):
+        """
+        List the MIDI ports and store the names if they have changed.
+        :return:
+        """
+        self._scan_count += 1
+
+        # Sometimes getting port names causes an Exception...
+        try:
+            input_port_names = mido.get_input_names()
+            output_port_names = mido.get_output_names()
+
+        except Exception as e:
+            self.logger.debug(f'Failed to list MIDI ports ({e})')
+            return
+
+        # Remove None if it is in the list of port names.
+        # A recently-disconnected port may be added as None.
+        # Perhaps this is a bug in mido.
+        # Also leave out our own ALSA sequencer client's port.
+        input_port_names = [
+            name for name in input_port_names if name is not None and not name.startswith(self.alsa_client_name)
+        ]
+        output_port_names = [
+            name for name in output_port_names if name is not None and not name.startswith(self.alsa_client_name)
+        ]
+
+        with self._lock:
+            if self._port_names is not None and \
+                    set(input_port_names) == set(self._port_names[0]) and \
+                    set(output_port_names) == set(self._port_names[1]):
+                return
+
+            self._port_names = input_port_names, output_port_names
+            self._port_names_changed = True
+
+    def _run_polling(self):
+        """
+        The scanner thread's loop when polling.
+        :return:
+        """
+        while not self._stop_event.is_set():
+            self._scan()
+
+            if self._fast_polling_function is None or self._fast_polling_function():
+                interval_sec = self._fast_poll_interval_sec
+            else:
+                interval_sec = self._slow_poll_interval_sec
+
+            self._scan_requested_event.wait(interval_sec)
+            self._scan_requested_event.clear()
+
+    def _run_alsa(self, listener):
+        """
+        The scanner thread's loop when using ALSA announce events.
+        :param listener: _AlsaSeqAnnounceListener
+        :return:
+        """
+        # request_scan() and stop() write to this pipe to wake select()
+        wake_read_fd, wake_write_fd = os.pipe()
+        os.set_blocking(wake_write_fd, False)
+        with self._wake_lock:
+            self._wake_write_fd = wake_write_fd
+
+        try:
+            next_scan_timestamp = time.monotonic()
+
+            while not self._stop_event.is_set():
+                timeout_sec = max(next_scan_timestamp - time.monotonic(), 0.0)
+                readable, _, _ = select.select(listener.fds + [wake_read_fd], [], [], timeout_sec)
+
+                if wake_read_fd in readable:
+                    os.read(wake_read_fd, 1024)
+                    next_scan_timestamp = time.monotonic()
+
+                if len(readable) > 0 and listener.read_port_events():
+                    # Wait for the device to finish adding or removing its ports
+                    next_scan_timestamp = min(next_scan_timestamp, time.monotonic() + self._announce_settle_sec)
+
+                if time.monotonic() >= next_scan_timestamp:
+                    self._scan()
+
+                    # Discard the events caused by listing the ports, so
+                    # scans don't trigger more scans. A port added during
+                    # the scan is found by the next periodic scan at worst.
+                    listener.read_port_events()
+
+                    next_scan_timestamp = time.monotonic() + self._announce_poll_interval_sec
+
+        finally:
+            with self._wake_lock:
+                os.close(self._wake_write_fd)
+                self._wake_write_fd = None
+
+            os.close(wake_read_fd)
+            listener.close()
+
+    def _wake(self):
+        """
+        Wake the ALSA thread, if it is waiting.
+        :return:
+        """
+        with self._wake_lock:
+            if self._wake_write_fd is not None:
+                try:
+                    os.write(self._wake_write_fd, b'\0')
+                except BlockingIOError:
+                    # The pipe is full, so the thread will be woken anyway
+                    pass
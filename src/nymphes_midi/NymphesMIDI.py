@@ -1,6 +1,7 @@
 import time
-from queue import Queue
-import copy
+import threading
+from queue import Queue, Empty
+from functools import partial
 from pathlib import Path
 import logging
 from logging.handlers import RotatingFileHandler
@@ -9,11 +10,19 @@ import platform
 import mido
 import mido.backends.rtmidi
 import rtmidi
-from rtmidi import InvalidPortError
 from nymphes_midi.NymphesPreset import NymphesPreset
+from nymphes_midi.PresetLibrary import PresetLibrary
+from nymphes_midi.PresetLibraryWatcher import PresetLibraryWatcher
+from nymphes_midi.PresetCache import PresetCache
+from nymphes_midi.PresetMatrix import PresetMatrix
+from nymphes_midi.SyxFileReader import SyxFileReader
+from nymphes_midi.MidiPortScanner import MidiPortScanner
+from nymphes_midi.MidiOutputScheduler import MidiOutputScheduler
+from nymphes_midi.PresetSnapshotScheduler import PresetSnapshotScheduler
+from nymphes_midi.PresetConverter import PresetConverter
 from nymphes_midi.PresetEvents import PresetEvents
 from nymphes_midi.MidiConnectionEvents import MidiConnectionEvents
-from nymphes_osc.file_locations import get_data_files_directory_path
+from nymphes_midi.file_locations import get_data_files_directory_path
 
 
 class NymphesMIDI:
@@ -21,11 +30,32 @@ class NymphesMIDI:
     An object which allows full control of the Dreadbox Nymphes synthesizer via USB MIDI.
     """
 
+    # If more preset files than this change at once, a single
+    # preset_library_refreshed notification is sent instead of
+    # one preset_library_changed notification per file
+    max_preset_library_change_notifications = 100
+
+    # The minimum time between progress notifications, such as
+    # syx_import_progress and preset_conversion_progress
+    progress_notification_interval_sec = 0.1
+
+    # The maximum number of preset_conversion_failed notifications
+    # sent for one conversion
+    max_preset_conversion_failure_notifications = 100
+
+    # The minimum time between MIDI messages sent for a parameter
+    # while a client is touching its control
+    param_gesture_transmit_interval_sec = 0.02
+
     def __init__(
             self,
             notification_callback_function,
             log_level=logging.WARNING,
-            presets_directory_path=None
+            presets_directory_path=None,
+            preset_cache_capacity=32,
+            midi_output_bytes_per_sec=10000,
+            preset_snapshot_min_interval_sec=0.1,
+            hybrid_float_params=False
     ):
         # Callback function for us to call with notifications.
         self._notification_callback_function = notification_callback_function
@@ -34,6 +64,16 @@ class NymphesMIDI:
         self.logger = logging.getLogger('nymphes-osc.nymphes_midi')
         self.logger.setLevel(log_level)
     
+        #
+        # Create the data files directory, which holds the fallback
+        # presets directory and the preset library index
+        #
+        try:
+            get_data_files_directory_path().mkdir(parents=True, exist_ok=True)
+
+        except Exception as e:
+            self.logger.warning(f'Failed to create data files directory at {get_data_files_directory_path()} ({e})')
+
         #
         # Handle presets directory path
         #
@@ -114,9 +154,14 @@ class NymphesMIDI:
         # MIDI Output port for messages to Nymphes
         self._nymphes_midi_output_port_object = None
 
-        # MIDI Port Scanning Timer
-        self._midi_port_scan_interval_sec = 0.5
-        self._midi_port_scan_last_timestamp = None
+        # MIDI Port Scanning
+        # Ports are listed on a background thread. They are scanned
+        # often while Nymphes is not connected, and less often once it is.
+        self._midi_port_scanner = MidiPortScanner(
+            fast_polling_function=lambda: not self.nymphes_connected,
+            fast_poll_interval_sec=0.5,
+            slow_poll_interval_sec=2.0
+        )
 
         # Virtual MIDI ports (macOS)
         self.should_create_virtual_midi_ports = True if platform.system() == 'Darwin' else False
@@ -136,6 +181,8 @@ class NymphesMIDI:
         self._detected_nymphes_midi_inputs = []
         self._detected_nymphes_midi_outputs = []
 
+        self._midi_port_scanner.start()
+
         # List of currently-connected MIDI ports
         self._connected_midi_input_port_objects = []
         self._connected_midi_output_port_objects = []
@@ -145,20 +192,43 @@ class NymphesMIDI:
         self._midi_message_receive_last_timestamp = None
 
         # MIDI Message Send Queues
-
-        # Queue for MIDI messages to be sent to Nymphes.
-        # When Nymphes is not connected, the queue is deleted.
-        self._nymphes_midi_message_send_queue = None
-
-        # Queues for MIDI output ports. There will be one queue for
+        # Each output port has a MidiOutputScheduler, which paces
+        # messages to a byte rate budget and sends performance controls
+        # before parameters and SYSEX.
+
+        # The default byte rate budget for each output port.
+        # None or 0 means no limit.
+        self._midi_output_bytes_per_sec = midi_output_bytes_per_sec
+
+        # Byte rate budgets set with set_midi_output_byte_rate() for
+        # specific ports, which override the default.
+        # key: port name str. None is used for Nymphes. value: int or None
+        self._midi_output_byte_rates_dict = {}
+
+        # The MIDI CC numbers of modulation matrix parameters, whose
+        # meaning depends on the modulation source selected with CC 30.
+        # The output schedulers use this to group them by source.
+        self._mod_matrix_control_numbers = {
+            NymphesPreset.midi_cc_for_param_name(param_name)
+            for param_name in NymphesPreset.all_param_names()
+            if NymphesPreset.mod_source_for_param_name(param_name) is not None
+        }
+        self._mod_matrix_control_numbers.discard(None)
+
+        # Scheduler for MIDI messages to be sent to Nymphes.
+        # When Nymphes is not connected, it is deleted.
+        self._nymphes_midi_output_scheduler = None
+
+        # Schedulers for MIDI output ports. There will be one for
         # each connected MIDI output port.
         # The port object itself is used as the key.
-        # When a MIDI output port is disconnected its queue is deleted.
-        self._midi_message_send_queues_dict = {}
+        # When a MIDI output port is disconnected its scheduler is deleted.
+        self._midi_output_schedulers_dict = {}
 
-        # Add a queue for the virtual output port (if it exists)
+        # Add a scheduler for the virtual output port (if it exists)
         if self.should_create_virtual_midi_ports:
-            self._midi_message_send_queues_dict[self._virtual_midi_output_port_object] = Queue()
+            self._midi_output_schedulers_dict[self._virtual_midi_output_port_object] = \
+                self._create_midi_output_scheduler(self._virtual_midi_output_port_object)
 
         #
         # MIDI Feedback Suppression
@@ -174,9 +244,30 @@ class NymphesMIDI:
         # SYSEX messages can take a lot longer to be echoed back
         self._midi_feedback_suppression_messages_list_sysex_retention_time_sec = 60.0
 
-        # List containing MIDI messages recently sent to connected
-        # MIDI output ports.
-        self._midi_feedback_suppression_messages_list = []
+        # MIDI messages recently sent to connected MIDI output ports.
+        # It is read on MIDI input ports' threads, so a lookup is one
+        # dict access rather than a scan.
+        # key: tuple of the message's bytes, value: expiry time
+        self._midi_feedback_suppression_messages_dict = {}
+
+        #
+        # MIDI Thru
+        #
+
+        # Messages from MIDI input ports arrive on each port's own thread.
+        # They are passed on to Nymphes on that thread, in the order they
+        # arrive, with notes and performance controls sent straight away.
+        # Then they are queued here and interpreted in update().
+        # Each item is a tuple: (mido message, input port name)
+        self._midi_input_queue = Queue()
+
+        # Now that everything the callback uses exists, receive
+        # messages from the virtual MIDI input port
+        if self._virtual_midi_input_port_object is not None:
+            self._virtual_midi_input_port_object.callback = partial(
+                self._on_midi_input_port_callback,
+                self._virtual_midi_input_port_object.name
+            )
 
         # Upon connecting to Nymphes, wait a short time and then
         # load the init preset file.
@@ -257,21 +348,126 @@ class NymphesMIDI:
         # preset was loaded or saved.
         self._unsaved_changes = False
 
-        # Flag indicating that a value in the current preset object has
-        # been changed and we need to send the entire preset via SYSEX
-        # to Nymphes and connected MIDI output ports.
+        # Decides when to send the current preset to Nymphes and connected
+        # MIDI output ports after a value in it has been changed.
         # This is only necessary when float parameter values have been
         # changed, or for int parameters with no associated MIDI CC
         # (ie: chord settings).
-        self._preset_snapshot_needed = False
-        self._preset_snapshot_timer_interval_sec = 0.1
-        self._preset_snapshot_last_timestamp = None
+        self._preset_snapshot_scheduler = PresetSnapshotScheduler(
+            min_interval_sec=preset_snapshot_min_interval_sec
+        )
+
+        # When hybrid float params are enabled, setting a float parameter
+        # which has a MIDI CC sends the nearest MIDI CC value straight
+        # away, and the exact value is sent in a preset snapshot once
+        # the changes have settled.
+        self._hybrid_float_params_enabled = hybrid_float_params
+
+        # The bytes of MIDI CC messages sent with the nearest value of
+        # a float parameter (in hybrid mode, or during a gesture) since
+        # the last preset snapshot. Copies of them received on MIDI inputs
+        # are treated as feedback, so they don't replace the exact values
+        # with the nearest MIDI CC values.
+        self._rounded_float_cc_messages_bytes_set = set()
+
+        # Parameters whose controls are being touched by a client.
+        # While a gesture is active, the parameter's value is sent at
+        # most once every param_gesture_transmit_interval_sec, and its
+        # exact value is sent when the gesture ends.
+        # key: param name, value: a dict with these keys:
+        #   'last_transmit_timestamp': float or None
+        #   'transmit_pending': bool. True if the value has changed since it was sent
+        #   'changed': bool. True if the value has changed during the gesture
+        #   'cc_value': int or None. The last MIDI CC value sent for a float parameter
+        self._param_gestures_dict = {}
+        self._param_gestures_lock = threading.Lock()
+
+        # A copy of the preset that Nymphes and connected MIDI output
+        # ports were last known to have. When we send a preset snapshot
+        # we compare against it to find the parameters that have changed,
+        # and send just those as MIDI CCs if that is fewer bytes than
+        # a SYSEX message.
+        # This is None when we don't know what Nymphes has (ie: just after
+        # connecting, or after a preset has been loaded on Nymphes but
+        # we haven't received it yet). In this case we always use SYSEX.
+        self._nymphes_preset_baseline = None
+
+        # The current preset object may be replaced (ie: by loading a file)
+        # before the next snapshot is sent. When that happens we collect
+        # the names of the parameters that differ between the old and new
+        # current presets here, as Nymphes may have either value.
+        self._preset_transition_pending_param_names = set()
+
+        # Counters describing how preset snapshots have been sent
+        self._preset_transition_stats = {
+            'preset_transitions_sysex': 0,
+            'preset_transitions_cc': 0,
+            'preset_transition_bytes_sent': 0,
+            'preset_transition_bytes_saved': 0
+        }
 
         # A queue for notifying clients when things change.
         # It will contain dicts with the following keys:
         # 'name', 'value'
         self._notification_queue = Queue()
 
+        # The index of preset files in the presets directory.
+        # It is brought up to date on a background thread, which is
+        # started at the end of __init__.
+        # This is None if the index database could not be opened.
+        try:
+            self._preset_library = PresetLibrary(
+                presets_directory_path=self.presets_directory_path,
+                database_filepath=get_data_files_directory_path() / 'preset_library.sqlite3'
+            )
+
+        except Exception as e:
+            self.logger.warning(f'Failed to open preset library ({e})')
+            self._preset_library = None
+
+        # The parameter values of all presets in the preset library,
+        # used for searching presets.
+        # This is None if the preset library is not available.
+        self._preset_matrix = None
+        if self._preset_library is not None:
+            self._preset_matrix = PresetMatrix(
+                preset_library=self._preset_library,
+                matrix_filepath=get_data_files_directory_path() / 'preset_matrix.npy'
+            )
+
+        # The background thread running a preset conversion, if one is running
+        self._preset_conversion_thread = None
+
+        # The background thread importing a .syx file, if one is running
+        self._syx_import_thread = None
+
+        # The first preset file written by the last .syx file import.
+        # update() loads it on the main thread once the import has finished.
+        self._syx_import_first_preset_filepath = None
+
+        # Recently loaded preset files, so loading them again doesn't
+        # require reading and parsing the file
+        self._preset_cache = PresetCache(capacity=preset_cache_capacity)
+
+        # Watches the presets directory and applies changes to the
+        # preset library as they happen.
+        # This is None if the preset library is not available.
+        self._preset_library_watcher = None
+        if self._preset_library is not None:
+            self._preset_library_watcher = PresetLibraryWatcher(
+                preset_library=self._preset_library,
+                changes_callback_function=self._on_preset_library_changed
+            )
+
+            # Drop cached presets as soon as their files change
+            self._preset_library_watcher.add_changed_paths_callback(self._preset_cache.invalidate)
+
+            self._preset_library_watcher.start()
+
+        # Bring the preset library up to date. This is done last, as the
+        # refresh thread's callback uses the objects created above.
+        self.refresh_preset_library()
+
     @property
     def logging_enabled(self):
         return self._logging_enabled
@@ -365,7 +561,16 @@ class NymphesMIDI:
         Returns None if Nymphes is not connected.
         :return:
         """
-        return copy.deepcopy(self._curr_preset_object) if self._curr_preset_object is not None else None
+        return self._curr_preset_object.clone() if self._curr_preset_object is not None else None
+
+    @property
+    def has_curr_preset(self):
+        """
+        Returns True if there is a current preset object.
+        Unlike curr_preset_object, this doesn't make a copy.
+        :return: bool
+        """
+        return self._curr_preset_object is not None
 
     @property
     def curr_preset_dict_key(self):
@@ -383,7 +588,63 @@ class NymphesMIDI:
         Returns None if if Nymphes is not connected.
         :return: a dict
         """
-        return copy.deepcopy(self._nymphes_memory_slots_dict) if self._nymphes_memory_slots_dict is not None else None
+        if self._nymphes_memory_slots_dict is None:
+            return None
+
+        return {key: p.clone() for key, p in self._nymphes_memory_slots_dict.items()}
+
+    @property
+    def curr_preset_fingerprint(self):
+        """
+        Returns the fingerprint of the current preset.
+        Returns None if Nymphes is not connected.
+        :return: str or None
+        """
+        return self._curr_preset_object.fingerprint if self._curr_preset_object is not None else None
+
+    @property
+    def memory_slot_fingerprints(self):
+        """
+        Returns the fingerprints of the presets we have received from
+        Nymphes' memory slots.
+        :return: A dict. The keys are the same as all_presets_dict's.
+        The values are fingerprint strings.
+        """
+        return {key: p.fingerprint for key, p in self._nymphes_memory_slots_dict.items()}
+
+    def memory_slots_for_fingerprint(self, fingerprint):
+        """
+        Find the memory slots that contain a preset with the
+        supplied fingerprint.
+        :param fingerprint: str
+        :return: A list of keys: (preset_type, bank_name, preset_number)
+        """
+        return [key for key, p in self._nymphes_memory_slots_dict.items() if p.fingerprint == fingerprint]
+
+    @property
+    def stats(self):
+        """
+        Returns a dict of counters describing what NymphesMIDI has been doing.
+        Keys are strings and values are ints or floats.
+        :return: dict
+        """
+        stats = {}
+        stats.update(self._preset_transition_stats)
+        stats.update(self._preset_snapshot_scheduler.stats)
+        stats.update(self._preset_cache.stats)
+        stats['midi_port_scans'] = self._midi_port_scanner.scan_count
+
+        if self._nymphes_midi_output_scheduler is not None:
+            stats['nymphes_midi_messages_sent'] = self._nymphes_midi_output_scheduler.messages_sent
+            stats['nymphes_midi_bytes_sent'] = self._nymphes_midi_output_scheduler.bytes_sent
+            stats['nymphes_midi_messages_pending'] = self._nymphes_midi_output_scheduler.pending_count
+            stats['nymphes_midi_messages_coalesced'] = self._nymphes_midi_output_scheduler.messages_coalesced
+            stats['nymphes_midi_messages_sent_immediately'] = \
+                self._nymphes_midi_output_scheduler.messages_sent_immediately
+            stats['nymphes_mod_source_messages_elided'] = \
+                self._nymphes_midi_output_scheduler.mod_source_messages_elided
+
+        return stats
 
     @property
     def connected_midi_inputs(self):
@@ -405,6 +666,10 @@ class NymphesMIDI:
     def midi_feedback_suppression_enabled(self):
         return self._midi_feedback_suppression_enabled
 
+    @property
+    def hybrid_float_params_enabled(self):
+        return self._hybrid_float_params_enabled
+
     def add_notification(self, name, value=None):
         """
         Add a notification to the queue.
@@ -425,7 +690,7 @@ class NymphesMIDI:
         Raises an Exception if param_name is invalid.
         """
         # Validate param_name
-        if param_name not in NymphesPreset.all_param_names():
+        if not NymphesPreset.is_param_name(param_name):
             raise Exception(f'Invalid param_name: {param_name}')
 
         # Get the type for this parameter
@@ -436,15 +701,15 @@ class NymphesMIDI:
             # range is only 0 to 1, while Nymphes uses MIDI values of 0 or 127.
             #
             type_string = 'int_param'
-            value = 127 if self.curr_preset_object.get_int(param_name) == 1 else 0
+            value = 127 if self._curr_preset_object.get_int(param_name) == 1 else 0
 
         elif param_type == int:
             type_string = 'int_param'
-            value = self.curr_preset_object.get_int(param_name)
+            value = self._curr_preset_object.get_int(param_name)
 
         elif param_type == float:
             type_string = 'float_param'
-            value = self.curr_preset_object.get_float(param_name)
+            value = self._curr_preset_object.get_float(param_name)
 
         self.add_notification(type_string, (param_name, value))
 
@@ -465,6 +730,22 @@ class NymphesMIDI:
             # Call the callback
             self._notification_callback_function(data['name'], data['value'])
 
+        # Load the First Preset from a Finished .syx File Import
+        #
+        if self._syx_import_thread is not None and not self._syx_import_thread.is_alive():
+            self._syx_import_thread.join()
+            self._syx_import_thread = None
+
+            first_preset_filepath = self._syx_import_first_preset_filepath
+            self._syx_import_first_preset_filepath = None
+
+            if first_preset_filepath is not None:
+                try:
+                    self.load_file(first_preset_filepath)
+
+                except Exception as e:
+                    self.logger.warning(f'Failed to load preset file at {first_preset_filepath}: {e}')
+
         # Receive MIDI Messages
         #
         if self._midi_message_receive_last_timestamp is None or \
@@ -477,70 +758,43 @@ class NymphesMIDI:
                 for midi_message in self._nymphes_midi_input_port_object.iter_pending():
                     self._on_message_from_nymphes(midi_message)
 
-            # Handle incoming MIDI messages from the virtual MIDI input port
-            if self._virtual_midi_input_port_object is not None:
-                for midi_message in self._virtual_midi_input_port_object.iter_pending():
-                    self._on_message_from_midi_input_port(midi_message, self._virtual_midi_input_port_object.name)
-
-            # Handle Incoming MIDI Messages from Connected MIDI input ports
+            # Handle Incoming MIDI Messages from the virtual MIDI input port
+            # and Connected MIDI input ports, which were queued by their callbacks
             #
-            for port in self._connected_midi_input_port_objects:
-                for midi_message in port.iter_pending():
-                    self._on_message_from_midi_input_port(midi_message, port.name)
+            while True:
+                try:
+                    midi_message, input_port_name = self._midi_input_queue.get_nowait()
+                except Empty:
+                    break
+
+                self._on_message_from_midi_input_port(midi_message, input_port_name)
 
             # Store the current time
             self._midi_message_receive_last_timestamp = time.time()
 
         # Detect MIDI Ports
+        # Ports are listed on the port scanner's thread, so this
+        # never waits for port enumeration
         #
-        if self._midi_port_scan_last_timestamp is None or \
-                time.time() - self._midi_port_scan_last_timestamp >= \
-                self._midi_port_scan_interval_sec:
-
-            # Detect MIDI Ports
-            #
-            self._detect_midi_input_ports()
-            self._detect_midi_output_ports()
-
-            # Store the current time
-            self._midi_port_scan_last_timestamp = time.time()
+        port_names = self._midi_port_scanner.get_changed_port_names()
+        if port_names is not None:
+            input_port_names, output_port_names = port_names
+            self._detect_midi_input_ports(input_port_names)
+            self._detect_midi_output_ports(output_port_names)
 
         # Send the current preset to Nymphes and Connected MIDI output ports
-        # if the snapshot flag is set
+        # if it has changed and the snapshot scheduler says it is time.
+        # A new snapshot isn't sent while the last SYSEX snapshot is still
+        # waiting for Nymphes' byte rate budget.
         #
-        if self._preset_snapshot_last_timestamp is None or \
-                time.time() - self._preset_snapshot_last_timestamp >= \
-                self._preset_snapshot_timer_interval_sec:
-
-            if self._preset_snapshot_needed:
-
-                if self.nymphes_connected:
-                    # Generate a list of bytes in the MIDI SYSEX format used by Nymphes
-                    sysex_data = self._curr_preset_object.generate_sysex_data(
-                        preset_import_type='non-persistent',
-                        preset_type='user',
-                        bank_name='A',
-                        preset_number=1
-                    )
-
-                    # Create a mido MIDI SYSEX message from it
-                    msg = mido.Message('sysex', data=sysex_data)
+        if self._preset_snapshot_scheduler.pending:
+            if not self.nymphes_connected:
+                # There is nothing to send it to
+                self._preset_snapshot_scheduler.cancel()
 
-                    # Add it to the message send queue for Nymphes
-                    self._send_to_nymphes(msg)
-
-                    # Add it to the queues for all connected MIDI output ports
-                    self._send_to_all_connected_midi_output_ports(msg)
-
-                    self.logger.info('Sent current preset to Nymphes and connected MIDI Output ports via SYSEX')
-
-                # Clear the flag and store the current time
-                # regardless of whether Nymphes was connected
-                # and we actually sent out the preset via
-                # SYSEX.
-                #
-                self._preset_snapshot_needed = False
-                self._preset_snapshot_last_timestamp = time.time()
+            elif self._preset_snapshot_scheduler.take_due(
+                    link_busy=self._nymphes_midi_output_scheduler.sysex_pending_count > 0):
+                self._send_curr_preset_snapshot()
 
         # Recall First Preset Timer
         #
@@ -582,35 +836,92 @@ class NymphesMIDI:
                 #
                 self._stop_ignoring_control_change_messages_from_nymphes()
 
-        # Send All Queued MIDI Messages to Nymphes
+        # Send the values of parameters being touched by clients
+        # which were held back by the gesture transmit interval
         #
-        if self._nymphes_midi_message_send_queue is not None:
-            while not self._nymphes_midi_message_send_queue.empty():
-                msg = self._nymphes_midi_message_send_queue.get()
+        if self._param_gestures_dict:
+            self._transmit_pending_gesture_values()
+
+        # Send Queued MIDI Messages to Nymphes, as the byte rate budget allows
+        #
+        if self._nymphes_midi_output_scheduler is not None:
+            while True:
                 try:
-                    self._nymphes_midi_output_port_object.send(msg)
+                    self._nymphes_midi_output_scheduler.send_pending()
+                    break
                 except rtmidi.SystemError as e:
                     self.logger.error(f'Failed to send MIDI message to Nymphes ({e})')
 
-        # Send All Queued Messages to MIDI output ports
+        # Send Queued Messages to MIDI output ports, as their byte rate budgets allow
         #
-        for port, queue in self._midi_message_send_queues_dict.items():
-            while not queue.empty():
-                # Remove the message from the queue
-                msg = queue.get()
-
-                # Send it
+        for port, scheduler in self._midi_output_schedulers_dict.items():
+            while True:
                 try:
-                    port.send(msg)
+                    scheduler.send_pending()
+                    break
                 except rtmidi.SystemError as e:
                     self.logger.error(f'Failed to send MIDI message to port {port.name} ({e})')
 
-        # Clear all expired messages from the feedback suppression messages list
+        # Clear all expired messages from the feedback suppression messages dict
         if self._midi_feedback_suppression_enabled:
             curr_time = time.time()
-            for msg in self._midi_feedback_suppression_messages_list[:]:
-                if curr_time > msg.time:
-                    self._midi_feedback_suppression_messages_list.remove(msg)
+            for msg_bytes, expiry_time in list(self._midi_feedback_suppression_messages_dict.items()):
+                if curr_time > expiry_time:
+                    self._midi_feedback_suppression_messages_dict.pop(msg_bytes, None)
+
+    def close(self):
+        """
+        Stop the background threads, close the MIDI ports and close the
+        preset library. Call this when NymphesMIDI is no longer needed.
+        It can't be used after this.
+        :return:
+        """
+        # Stop watching the presets directory before the library is closed
+        if self._preset_library_watcher is not None:
+            self._preset_library_watcher.stop()
+            self._preset_library_watcher = None
+
+        self._midi_port_scanner.stop()
+
+        # Let a running preset conversion finish writing its files
+        if self._preset_conversion_thread is not None:
+            self._preset_conversion_thread.join()
+            self._preset_conversion_thread = None
+
+        # Let a running .syx file import finish writing its files
+        if self._syx_import_thread is not None:
+            self._syx_import_thread.join()
+            self._syx_import_thread = None
+
+        # Close MIDI ports, so input port callbacks stop
+        for port_name in self.connected_midi_inputs:
+            self.disconnect_midi_input(port_name)
+
+        for port_name in self.connected_midi_outputs:
+            self.disconnect_midi_output(port_name)
+
+        self.disconnect_nymphes()
+
+        if self._virtual_midi_input_port_object is not None:
+            self._virtual_midi_input_port_object.close()
+            self._virtual_midi_input_port_object = None
+
+        if self._virtual_midi_output_port_object is not None:
+            self._midi_output_schedulers_dict.pop(self._virtual_midi_output_port_object, None)
+            self._virtual_midi_output_port_object.close()
+            self._virtual_midi_output_port_object = None
+
+        # Save any changes to the preset matrix. It reads the
+        # library, so it can't be used once the library is closed.
+        if self._preset_matrix is not None:
+            self._preset_matrix.close()
+            self._preset_matrix = None
+
+        if self._preset_library is not None:
+            self._preset_library.close()
+            self._preset_library = None
+
+        self.logger.info('Closed NymphesMIDI')
 
     def connect_nymphes(self, input_port_name, output_port_name):
         """
@@ -638,7 +949,7 @@ class NymphesMIDI:
                 # Close the currently-connected output port
                 self._nymphes_midi_output_port_object.close()
                 self._nymphes_midi_output_port_object = None
-                self._nymphes_midi_message_send_queue = None
+                self._nymphes_midi_output_scheduler = None
                 self.logger.info(f'Disconnected Nymphes MIDI output port ({curr_output_port_name})')
         else:
             was_connected = False
@@ -658,14 +969,17 @@ class NymphesMIDI:
         try:
             self._nymphes_midi_output_port_object = mido.open_output(output_port_name)
 
-            # Create a MIDI message send queue for it
-            self._nymphes_midi_message_send_queue = Queue()
+            # Create a MIDI message scheduler for it
+            self._nymphes_midi_output_scheduler = self._create_midi_output_scheduler(
+                self._nymphes_midi_output_port_object,
+                is_nymphes=True
+            )
 
             self.logger.info(f'Connected Nymphes MIDI output port ({output_port_name})')
 
         except Exception as e:
             self._nymphes_midi_output_port_object = None
-            self._nymphes_midi_message_send_queue = None
+            self._nymphes_midi_output_scheduler = None
 
             self.logger.warning(f'Failed to connect Nymphes MIDI output port ({output_port_name}) ({e})')
 
@@ -699,6 +1013,7 @@ class NymphesMIDI:
             curr_output_port_name = self._nymphes_midi_output_port_object.name
             self._nymphes_midi_output_port_object.close()
             self._nymphes_midi_output_port_object = None
+            self._nymphes_midi_output_scheduler = None
             self.logger.info(f'Disconnected Nymphes MIDI output port {curr_output_port_name}')
 
         # Notify Client that we are no longer connected
@@ -722,8 +1037,9 @@ class NymphesMIDI:
             # The port is already connected
             return
 
-        # Connect the port
-        port = mido.open_input(port_name)
+        # Connect the port. Its messages are received by our callback
+        # on the port's own thread.
+        port = mido.open_input(port_name, callback=partial(self._on_midi_input_port_callback, port_name))
 
         # Store the port
         self._connected_midi_input_port_objects.append(port)
@@ -780,14 +1096,28 @@ class NymphesMIDI:
             MidiConnectionEvents.midi_feedback_suppression_enabled.value
         )
 
+    def enable_hybrid_float_params(self):
+        """
+        Send the nearest MIDI CC value when a float parameter is set,
+        followed by a preset snapshot with the exact value once the
+        changes have settled.
+        """
+        self._hybrid_float_params_enabled = True
+
+    def disable_hybrid_float_params(self):
+        """
+        Only send float parameter values in preset snapshots
+        """
+        self._hybrid_float_params_enabled = False
+
     def disable_midi_feedback_suppression(self):
         """
         Disable MIDI feedback suppression
         """
         self._midi_feedback_suppression_enabled = False
 
-        # Clear the feedback suppression messages list
-        self._midi_feedback_suppression_messages_list = []
+        # Clear the feedback suppression messages dict
+        self._midi_feedback_suppression_messages_dict = {}
 
         self.add_notification(
             MidiConnectionEvents.midi_feedback_suppression_disabled.value
@@ -817,8 +1147,12 @@ class NymphesMIDI:
 
         self.logger.info(f'Connected MIDI output port ({port_name})')
 
-        # Create a message send queue for the port
-        self._midi_message_send_queues_dict[port] = Queue()
+        # Create a message scheduler for the port
+        self._midi_output_schedulers_dict[port] = self._create_midi_output_scheduler(port)
+
+        # The new port doesn't have the current preset, so the
+        # next preset snapshot must be sent in full via SYSEX
+        self._reset_nymphes_preset_baseline()
 
         # Notify Client
         self.add_notification(
@@ -847,8 +1181,8 @@ class NymphesMIDI:
         if output_port is None:
             raise Exception(f'Failed to get port object for output port name: {port_name}')
 
-        # Delete the message send queue for the port
-        del(self._midi_message_send_queues_dict[port])
+        # Delete the message scheduler for the port
+        del(self._midi_output_schedulers_dict[port])
 
         # Remove the port from the collection of connected ports
         self._connected_midi_output_port_objects.remove(port)
@@ -1009,7 +1343,7 @@ class NymphesMIDI:
         """
         if self.nymphes_connected:
             # Load the preset file into a preset object
-            preset_object = NymphesPreset(filepath=filepath)
+            preset_object = self._preset_cache.load(filepath)
 
             # Generate a list of bytes in the MIDI SYSEX format used by Nymphes
             # for the preset_object
@@ -1040,7 +1374,7 @@ class NymphesMIDI:
         """
         if self.nymphes_connected:
             # Load the preset file as the current preset
-            self._curr_preset_object = NymphesPreset(filepath=filepath)
+            self._replace_curr_preset_object(self._preset_cache.load(filepath))
 
             # Reset the unsaved changes flag
             self._unsaved_changes = False
@@ -1055,119 +1389,172 @@ class NymphesMIDI:
             self.send_current_preset_notifications()
 
             # Send the preset to Nymphes and connected MIDI Output ports
-            self._preset_snapshot_needed = True
+            self._preset_snapshot_scheduler.request()
 
     def load_syx_file(self, filepath):
         """
         Load the .syx file at filepath.
-        If the syx file contains more than one Nymphes Preset, then a
+        If the syx file contains more than one Nymphes preset, then a
         folder will be created with the same name as the syx file, and
         preset files will be written to the folder.
         If the file contains only one preset then it will be written to
         the presets root folder with the same name as the syx file.
-        After writing the preset files, the first preset will be loaded.
+        The file is read and its preset files are written one preset at
+        a time on a background thread, so large archives don't need to fit
+        in memory and MIDI handling isn't slowed down.
+        syx_import_progress notifications are sent as it goes, and
+        syx_import_finished when all preset files have been written.
+        The first preset is then loaded by update().
+        Raises an Exception if a .syx file import is already running.
         :param filepath: A Path or string. The path to the syx file.
         :return:
         """
         if self.nymphes_connected:
-            #
-            # Load the file into a list of MIDI messages
-            #
-            try:
-                sysex_messages = mido.read_syx_file(filepath)
-            except Exception as e:
-                self.logger.warning(f'Failed to load .syx file at {filepath}: {e}')
-                return
+            if self.importing_syx_file:
+                raise Exception('A .syx file import is already running')
 
-            #
-            # Create a list of Nymphes Preset objects, one for each
-            # successfully parsed SYSEX message
-            #
-            nymphes_presets = []
-            for i in range(len(sysex_messages)):
+            def _run():
                 try:
-                    # Try creating a Nymphes Preset from the message
-                    msg = sysex_messages[i]
-                    new_preset = NymphesPreset(sysex_data=msg.data)
-                    nymphes_presets.append(new_preset)
+                    with SyxFileReader(filepath) as reader:
+                        first_preset_filepath, num_presets_written = self._write_preset_files_from_syx_file(reader, filepath)
+
                 except Exception as e:
-                    self.logger.warning(f'Failed to create Nymphes preset from message {i} in .syx file: {e}')
+                    self.logger.warning(f'Failed to load .syx file at {filepath}: {e}')
+                    first_preset_filepath, num_presets_written = None, 0
+
+                if num_presets_written > 0:
+                    self.refresh_preset_library()
+
+                self._syx_import_first_preset_filepath = first_preset_filepath
+
+                self.add_notification(
+                    PresetEvents.syx_import_finished.value,
+                    (str(filepath), num_presets_written, str(first_preset_filepath) if first_preset_filepath is not None else '')
+                )
+
+            self._syx_import_thread = threading.Thread(target=_run, daemon=True)
+            self._syx_import_thread.start()
+
+    @property
+    def importing_syx_file(self):
+        """
+        Returns True if a .syx file import started by load_syx_file() is running.
+        :return: bool
+        """
+        return self._syx_import_thread is not None and self._syx_import_thread.is_alive()
+
+    def _write_preset_files_from_syx_file(self, reader, filepath):
+        """
+        Write a preset file for each Nymphes preset in an open .syx file,
+        decoding and writing them one at a time. Sends syx_import_progress
+        notifications as it goes.
+        :param reader: An open SyxFileReader
+        :param filepath: A Path or string. The path to the syx file.
+        :return: A tuple: (the Path of the first preset file written or None,
+        the number of preset files written)
+        """
+        # Count the messages first, so we know how many digits the
+        # preset filenames need and can report progress
+        num_messages = reader.count()
+
+        if num_messages == 0:
+            self.logger.warning(f'No SYSEX messages found in .syx file at {filepath}')
+            return None, 0
 
+        # The preset files will end in a number, starting with 1.
+        # The numbers will be zero-padded so their filenames will
+        # sort correctly.
+        #
+        num_digits = len(str(num_messages))
+
+        # A file containing one preset is written to the presets folder
+        # with the same filename as the syx file. A file containing more
+        # is written to a folder. The file may contain other SYSEX messages
+        # too, which don't count. PresetConverter uses the same rule.
+        if reader.count_presets(max_count=2) > 1:
             #
-            # Write the presets to disk
+            # It contains more than one preset.
+            # Create a folder in the presets folder with
+            # the name of the original syx file.
             #
-            if len(nymphes_presets) == 1:
-                #
-                # The syx file contained only one preset. Write it
-                # to the presets folder with the same filename as
-                # the syx file.
-                #
-                nymphes_preset = nymphes_presets[0]
 
-                # Make sure we don't overwrite a preset file that already exists.
-                #
-                destination_filepath = self.presets_directory_path / (str(Path(filepath).stem) + '.txt')
-                file_suffix = 0
-                while destination_filepath.exists():
-                    file_suffix += 1
-                    destination_filepath = self.presets_directory_path / (str(Path(filepath).stem) + f'_{file_suffix}' + '.txt')
+            # Make sure we don't overwrite a folder or preset file that already exists
+            # in the same location.
+            #
+            destination_folder_path = self.presets_directory_path / (str(Path(filepath).stem))
+            path_suffix = 0
+            while destination_folder_path.exists():
+                path_suffix += 1
+                destination_folder_path = self.presets_directory_path / (str(Path(filepath).stem) + f'_{path_suffix}')
 
-                # Write the file to disk
-                #
-                try:
-                    nymphes_preset.save_preset_file(destination_filepath)
-                    self.logger.info(f'Created preset file from syx file: {destination_filepath}')
-                except Exception as e:
-                    self.logger.warning(f'Failed to store nymphes preset as a file: {destination_filepath}, {e}')
+            # Create the folder
+            destination_folder_path.mkdir()
+            self.logger.info(f'Created folder for presets: {destination_folder_path}')
 
-                # Load the new preset file
-                #
-                self.load_file(destination_filepath)
+        else:
+            destination_folder_path = None
 
-            elif len(nymphes_presets) > 1:
-                #
-                # It contained more than one preset.
-                # Create a folder in the presets folder with
-                # the name of the original syx file.
-                #
+        first_preset_filepath = None
+        num_presets_decoded = 0
+        num_presets_written = 0
+        last_progress_timestamp = 0
 
-                # Make sure we don't overwrite a folder or preset file that already exists
-                # in the same location.
-                #
-                destination_folder_path = self.presets_directory_path / (str(Path(filepath).stem))
-                path_suffix = 0
-                while destination_folder_path.exists():
-                    path_suffix += 1
-                    destination_folder_path = self.presets_directory_path / (str(Path(filepath).stem) + f'_{path_suffix}')
+        for i, sysex_data in enumerate(reader):
+            try:
+                # Try creating a Nymphes Preset from the message
+                nymphes_preset = NymphesPreset(sysex_data=sysex_data)
 
-                try:
-                    # Create the folder
-                    destination_folder_path.mkdir()
-                    self.logger.info(f'Created folder for presets: {destination_folder_path}')
+            except Exception as e:
+                self.logger.warning(f'Failed to create Nymphes preset from message {i} in .syx file: {e}')
+                nymphes_preset = None
+
+            if nymphes_preset is not None:
+                num_presets_decoded += 1
 
+                if destination_folder_path is not None:
+                    destination_filepath = destination_folder_path / f'{str(Path(filepath).stem)}_{str(num_presets_decoded).zfill(num_digits)}.txt'
+
+                else:
                     #
-                    # Write the presets to disk
+                    # The syx file contains only one preset. Write it
+                    # to the presets folder with the same filename as
+                    # the syx file.
                     #
 
-                    # The preset files will end in a number, starting with 1.
-                    # The numbers will be zero-padded so their filenames will
-                    # sort correctly.
+                    # Make sure we don't overwrite a preset file that already exists.
                     #
-                    num_digits = len(str(len(nymphes_presets)))
-                    for i in range(len(nymphes_presets)):
-                        nymphes_preset = nymphes_presets[i]
-                        try:
-                            destination_filepath = destination_folder_path / f'{str(Path(filepath).stem)}_{str(i+1).zfill(num_digits)}.txt'
-                            nymphes_preset.save_preset_file(destination_filepath)
-                            self.logger.info(f'Wrote preset file to disk: {destination_filepath}')
-                        except Exception as e1:
-                            self.logger.warning(f'Failed to store nymphes preset as a file: {destination_filepath}, {e}')
-
-                    # Load the first preset
-                    self.load_file(destination_folder_path / f'{str(Path(filepath).stem)}_01.txt')
+                    destination_filepath = self.presets_directory_path / (str(Path(filepath).stem) + '.txt')
+                    file_suffix = 0
+                    while destination_filepath.exists():
+                        file_suffix += 1
+                        destination_filepath = self.presets_directory_path / (str(Path(filepath).stem) + f'_{file_suffix}' + '.txt')
+
+                try:
+                    nymphes_preset.save_preset_file(destination_filepath)
+                    self.logger.debug(f'Wrote preset file to disk: {destination_filepath}')
+
+                    num_presets_written += 1
+                    if first_preset_filepath is None:
+                        first_preset_filepath = destination_filepath
 
                 except Exception as e:
-                    self.logger.warning(f'Failed to create folder for presets at {destination_folder_path}')
+                    self.logger.warning(f'Failed to store nymphes preset as a file: {destination_filepath}, {e}')
+
+            # Report progress, at most every progress_notification_interval_sec
+            if i + 1 == num_messages or time.time() - last_progress_timestamp >= self.progress_notification_interval_sec:
+                self.add_notification(
+                    PresetEvents.syx_import_progress.value,
+                    (str(filepath), i + 1, num_messages)
+                )
+                last_progress_timestamp = time.time()
+
+        self.logger.info(f'Created {num_presets_written} preset files from {num_messages} messages in syx file {filepath}')
+
+        if first_preset_filepath is None and destination_folder_path is not None:
+            # Don't leave an empty folder behind
+            destination_folder_path.rmdir()
+
+        return first_preset_filepath, num_presets_written
 
     def load_init_file(self):
         """
@@ -1177,7 +1564,7 @@ class NymphesMIDI:
         if self.nymphes_connected:
             self.logger.info(f'About to load init preset file at {self.init_preset_filepath}')
 
-            self._curr_preset_object = NymphesPreset(filepath=self.init_preset_filepath)
+            self._replace_curr_preset_object(self._preset_cache.load(self.init_preset_filepath))
 
             # Reset the unsaved changes flag
             self._unsaved_changes = False
@@ -1192,16 +1579,22 @@ class NymphesMIDI:
             self.send_current_preset_notifications()
 
             # Send the preset to Nymphes and connected MIDI Output ports
-            self._preset_snapshot_needed = True
+            self._preset_snapshot_scheduler.request()
 
-    def save_to_file(self, filepath):
+    def save_to_file(self, filepath, file_format=None):
         """
         Save to a preset file.
         :param filepath: Path or str
+        :param file_format: (str) 'v2.0.0' (CSV text) or 'v3.0.0' (binary).
+        If None, then it is chosen using the file's suffix.
         :return:
         """
-        # Save to a preset file at filepath
-        self._curr_preset_object.save_preset_file(filepath)
+        # Save to a preset file at filepath, unless it already
+        # contains the same preset
+        if not self._curr_preset_object.save_preset_file(filepath, skip_if_unchanged=True, file_format=file_format):
+            self.logger.info(f'{filepath} already contains the current preset. Skipped writing it.')
+        else:
+            self.refresh_preset_library()
 
         # Reset the unsaved changes flag
         self._unsaved_changes = False
@@ -1212,7 +1605,7 @@ class NymphesMIDI:
             str(filepath)
         )
 
-    def save_preset_to_file(self, filepath, preset_type, bank_name, preset_number):
+    def save_preset_to_file(self, filepath, preset_type, bank_name, preset_number, file_format=None):
         """
         Save the contents of a preset slot to a file.
         Raises an Exception if the all_presets dictionary does not
@@ -1221,6 +1614,8 @@ class NymphesMIDI:
         :param preset_type:
         :param bank_name:
         :param preset_number:
+        :param file_format: (str) 'v2.0.0' (CSV text) or 'v3.0.0' (binary).
+        If None, then it is chosen using the file's suffix.
         :return:
         """
         # Make sure we have a preset object for the specified memory slot
@@ -1231,8 +1626,11 @@ class NymphesMIDI:
         # Get the preset object
         preset_object = self._nymphes_memory_slots_dict[dict_key]
 
-        # Save to disk
-        preset_object.save_preset_file(filepath)
+        # Save to disk, unless the file already contains the same preset
+        if not preset_object.save_preset_file(filepath, skip_if_unchanged=True, file_format=file_format):
+            self.logger.info(f'{filepath} already contains the preset. Skipped writing it.')
+        else:
+            self.refresh_preset_library()
 
         # Send notification
         self.add_notification(
@@ -1240,6 +1638,204 @@ class NymphesMIDI:
             (str(filepath), preset_type, bank_name, preset_number)
         )
 
+    def refresh_preset_library(self):
+        """
+        Bring the preset library index up to date with the presets
+        directory on a background thread. Only new and modified files
+        are parsed. A preset_library_refreshed notification is sent
+        when it has finished.
+        :return:
+        """
+        if self._preset_library is None:
+            return
+
+        self._preset_library.refresh_in_background(self._on_preset_library_refreshed)
+
+    def list_presets(self, offset=0, limit=100, query=None):
+        """
+        Get a page of preset files from the preset library index,
+        sorted by path.
+        Raises an Exception if the preset library is not available.
+        :param offset: int. The index of the first preset to return
+        :param limit: int. The maximum number of presets to return
+        :param query: str or None. If supplied, then only presets whose
+        paths contain this string (ignoring case) are included.
+        :return: A tuple: (total_count, list of (path str, fingerprint str) tuples)
+        """
+        if self._preset_library is None:
+            raise Exception('The preset library is not available')
+
+        return self._preset_library.list_presets(offset=offset, limit=limit, query=query)
+
+    @property
+    def converting_presets(self):
+        """
+        Returns True if a preset conversion started by convert_presets() is running.
+        :return: bool
+        """
+        return self._preset_conversion_thread is not None and self._preset_conversion_thread.is_alive()
+
+    def convert_presets(self, input_path, output_directory_path, output_format, overwrite=False):
+        """
+        Convert preset files between the .txt, .nym and .syx formats on
+        a background thread, using a pool of worker processes so MIDI
+        handling isn't slowed down.
+        Sends preset_conversion_progress notifications as it goes,
+        preset_conversion_failed for each file that can't be converted,
+        and preset_conversion_finished at the end.
+        Raises an Exception if a conversion is already running or
+        output_format is invalid.
+        :param input_path: A Path or string. A preset file, .syx file or directory.
+        :param output_directory_path: A Path or string. Created if it doesn't exist.
+        :param output_format: str. 'txt', 'nym' or 'syx'
+        :param overwrite: bool. If False, then files that already exist are skipped.
+        :return:
+        """
+        if self.converting_presets:
+            raise Exception('A preset conversion is already running')
+
+        if output_format not in PresetConverter.output_formats:
+            raise Exception(f'Invalid output_format: {output_format} (should be one of {list(PresetConverter.output_formats)})')
+
+        def _run():
+            last_progress_timestamp = 0
+
+            def _on_progress(num_done, num_total):
+                nonlocal last_progress_timestamp
+                if num_done == num_total or time.time() - last_progress_timestamp >= self.progress_notification_interval_sec:
+                    self.add_notification(
+                        PresetEvents.preset_conversion_progress.value,
+                        (num_done, num_total)
+                    )
+                    last_progress_timestamp = time.time()
+
+            try:
+                result = PresetConverter().convert(
+                    [input_path],
+                    output_directory_path,
+                    output_format,
+                    overwrite=overwrite,
+                    progress_callback=_on_progress
+                )
+
+            except Exception as e:
+                self.logger.warning(f'Failed to convert presets at {input_path} ({e})')
+                result = {'converted': 0, 'skipped': 0, 'failed': [(str(input_path), str(e))]}
+
+            for source, error in result['failed'][:self.max_preset_conversion_failure_notifications]:
+                self.add_notification(
+                    PresetEvents.preset_conversion_failed.value,
+                    (source, error)
+                )
+
+            self.add_notification(
+                PresetEvents.preset_conversion_finished.value,
+                (result['converted'], result['skipped'], len(result['failed']))
+            )
+
+        self._preset_conversion_thread = threading.Thread(target=_run, daemon=True)
+        self._preset_conversion_thread.start()
+
+    def find_presets(self, ranges, limit=None):
+        """
+        Find the presets in the preset library whose parameter values
+        are all within the supplied ranges.
+        Float parameters use the same 0 to 127 range as NymphesPreset.get_float().
+        Raises an Exception if the preset library is not available, numpy
+        is not installed or a parameter name is invalid.
+        :param ranges: A dict. key: parameter name. value: a tuple (min, max).
+        Either may be None, meaning no limit. The limits are inclusive.
+        :param limit: int or None. The maximum number of paths to return.
+        :return: A tuple: (total_count, list of path strs sorted by path)
+        """
+        if self._preset_matrix is None:
+            raise Exception('The preset library is not available')
+
+        return self._preset_matrix.filter(ranges, limit=limit)
+
+    def find_similar_presets(self, filepath=None, count=20, metric='cosine'):
+        """
+        Find the presets in the preset library which are most similar
+        to the current preset, or to the preset in a file. Presets
+        identical to it are left out.
+        Raises an Exception if the preset library is not available, numpy
+        is not installed or the file can't be loaded.
+        :param filepath: A Path or string, or None to use the current preset
+        :param count: int. The maximum number of presets to return
+        :param metric: str. 'cosine' or 'l2'
+        :return: A list of (path str, distance float) tuples, nearest first
+        """
+        if self._preset_matrix is None:
+            raise Exception('The preset library is not available')
+
+        if filepath is not None:
+            preset_object = self._preset_cache.load(filepath)
+
+        elif self._curr_preset_object is not None:
+            preset_object = self._curr_preset_object
+
+        else:
+            raise Exception('There is no current preset')
+
+        return self._preset_matrix.nearest(
+            preset_object,
+            count=count,
+            metric=metric,
+            exclude_fingerprint=preset_object.fingerprint
+        )
+
+    def add_preset_library_changed_paths_callback(self, callback_function):
+        """
+        Register a function to be called with a list of absolute path
+        strs whenever files or directories in the presets directory
+        change. It is called on the preset library watcher's background
+        thread, before the changes are applied to the preset library.
+        :param callback_function: A function taking a list of strs
+        :return:
+        """
+        if self._preset_library_watcher is None:
+            return
+
+        self._preset_library_watcher.add_changed_paths_callback(callback_function)
+
+    def _on_preset_library_changed(self, changes):
+        # This is called on the preset library watcher's background thread.
+        # The notification queue is thread-safe.
+        # close() may set _preset_library to None meanwhile, so
+        # we use a local reference to it.
+        preset_library = self._preset_library
+        if preset_library is None:
+            return
+
+        if len(changes) > self.max_preset_library_change_notifications:
+            # Don't flood clients with notifications after a bulk
+            # copy or delete. They can list the presets again instead.
+            self.add_notification(
+                PresetEvents.preset_library_refreshed.value,
+                preset_library.num_presets
+            )
+            return
+
+        for change_type, path in changes:
+            self.add_notification(
+                PresetEvents.preset_library_changed.value,
+                (change_type, path)
+            )
+
+    def _on_preset_library_refreshed(self, result):
+        # This is called on the preset library's background thread.
+        # The notification queue is thread-safe.
+        # close() may set _preset_library to None meanwhile, so
+        # we use a local reference to it.
+        preset_library = self._preset_library
+        if preset_library is None:
+            return
+
+        self.add_notification(
+            PresetEvents.preset_library_refreshed.value,
+            preset_library.num_presets
+        )
+
     def request_preset_dump(self):
         """
         Send a full dump request message to Nymphes via SYSEX.
@@ -1293,7 +1889,7 @@ class NymphesMIDI:
             return
 
         # Make sure param_name is valid
-        if param_name not in NymphesPreset.all_param_names():
+        if not NymphesPreset.is_param_name(param_name):
             raise Exception(f'Invalid param_name: {param_name}')
 
         # Make sure a value has been supplied
@@ -1307,7 +1903,13 @@ class NymphesMIDI:
         # Keep track of whether this is a new value
         val_changed = False
 
-        if int_value is not None:
+        if param_name in self._param_gestures_dict:
+            #
+            # A client is touching this parameter's control
+            #
+            val_changed = self._set_param_during_gesture(param_name, int_value, float_value)
+
+        elif int_value is not None:
             #
             # The value has been supplied as an int.
             #
@@ -1323,42 +1925,7 @@ class NymphesMIDI:
                 #
                 # This parameter has an associated MIDI CC.
                 #
-
-                #
-                # Before sending MIDI Control Change Message, determine whether
-                # we need to first set the modulation source
-                #
-                mod_source = NymphesPreset.mod_source_for_param_name(param_name)
-                if mod_source is not None:
-                    mod_source_names = ['lfo2', 'mod_wheel', 'velocity', 'aftertouch']
-
-                    # Create a MIDI message to send
-                    msg = mido.Message('control_change',
-                                       channel=self.nymphes_midi_channel - 1,
-                                       control=30,
-                                       value=mod_source_names.index(mod_source))
-
-                    # Send to Nymphes
-                    self._send_to_nymphes(msg)
-
-                    # Send to connected MIDI Output ports
-                    self._send_to_all_connected_midi_output_ports(msg)
-
-                #
-                # Send the MIDI CC Message for the parameter itself
-                #
-
-                # Create a MIDI message
-                msg = mido.Message('control_change',
-                                   channel=self.nymphes_midi_channel - 1,
-                                   control=control,
-                                   value=int_value)
-
-                # Send to Nymphes
-                self._send_to_nymphes(msg)
-
-                # Send to connected MIDI Output ports
-                self._send_to_all_connected_midi_output_ports(msg)
+                self._send_param_cc(param_name, control, int_value)
 
             else:
                 #
@@ -1366,18 +1933,40 @@ class NymphesMIDI:
                 # so we need to send the entire updated preset as a
                 # SYSEX message
                 #
-                self._preset_snapshot_needed = True
+                self._preset_snapshot_scheduler.request()
 
         elif float_value is not None:
             #
             # The value has been supplied as a float
             #
 
-            # Update the parameter's value
-            val_changed = self._curr_preset_object.set_float(param_name, float_value)
+            control = NymphesPreset.midi_cc_for_param_name(param_name)
 
-            # We need to send the entire updated preset via SYSEX
-            self._preset_snapshot_needed = True
+            if self._hybrid_float_params_enabled and control is not None and \
+                    NymphesPreset.type_for_param_name(param_name) == float:
+                #
+                # Hybrid mode. Send the nearest MIDI CC value now so the
+                # change is heard straight away, and send the exact value
+                # in a preset snapshot once the changes have settled.
+                #
+                prev_cc_value = self._nearest_cc_value(param_name, self._curr_preset_object.get_float(param_name))
+
+                # Update the parameter's value
+                val_changed = self._curr_preset_object.set_float(param_name, float_value)
+
+                cc_value = self._nearest_cc_value(param_name, float_value)
+                if cc_value != prev_cc_value:
+                    self._send_rounded_float_cc(param_name, control, cc_value)
+
+                if val_changed:
+                    self._preset_snapshot_scheduler.request(settle=True)
+
+            else:
+                # Update the parameter's value
+                val_changed = self._curr_preset_object.set_float(param_name, float_value)
+
+                # We need to send the entire updated preset via SYSEX
+                self._preset_snapshot_scheduler.request()
 
         # If a parameter value was changed in this whole process
         # then send a notification that there are unsaved changes
@@ -1386,6 +1975,209 @@ class NymphesMIDI:
             self._unsaved_changes = True
             self.add_notification(PresetEvents.unsaved_changes.value)
 
+    def _send_param_cc(self, param_name, control, value):
+        """
+        Send a parameter's MIDI CC message to Nymphes and connected MIDI
+        Output ports. For modulation matrix parameters, a CC 30 message
+        selecting the modulation source is sent first.
+        :param param_name: str
+        :param control: int. The parameter's MIDI CC number
+        :param value: int
+        :return: A list of the mido messages sent
+        """
+        messages = []
+
+        #
+        # Before sending MIDI Control Change Message, determine whether
+        # we need to first set the modulation source
+        #
+        mod_source = NymphesPreset.mod_source_for_param_name(param_name)
+        if mod_source is not None:
+            # The output schedulers leave this out if the
+            # source is already selected
+            mod_source_names = ['lfo2', 'mod_wheel', 'velocity', 'aftertouch']
+
+            # Create a MIDI message to send
+            messages.append(mido.Message('control_change',
+                                         channel=self.nymphes_midi_channel - 1,
+                                         control=30,
+                                         value=mod_source_names.index(mod_source)))
+
+        #
+        # The MIDI CC Message for the parameter itself
+        #
+        messages.append(mido.Message('control_change',
+                                     channel=self.nymphes_midi_channel - 1,
+                                     control=control,
+                                     value=value))
+
+        for msg in messages:
+            # Send to Nymphes
+            self._send_to_nymphes(msg)
+
+            # Send to connected MIDI Output ports
+            self._send_to_all_connected_midi_output_ports(msg)
+
+        return messages
+
+    def _send_rounded_float_cc(self, param_name, control, cc_value):
+        """
+        Send the nearest MIDI CC value for a float parameter. Copies of
+        the messages arriving back on MIDI inputs are treated as feedback
+        until the exact value has been sent in a preset snapshot.
+        :param param_name: str
+        :param control: int. The parameter's MIDI CC number
+        :param cc_value: int
+        :return:
+        """
+        for msg in self._send_param_cc(param_name, control, cc_value):
+            self._rounded_float_cc_messages_bytes_set.add(tuple(msg.bytes()))
+
+    @staticmethod
+    def _nearest_cc_value(param_name, float_value):
+        """
+        Get the MIDI CC value closest to a float parameter value.
+        :param param_name: str
+        :param float_value: float
+        :return: int
+        """
+        return int(min(max(round(float_value), NymphesPreset.min_val_for_param_name(param_name)),
+                       NymphesPreset.max_val_for_param_name(param_name)))
+
+    def begin_param_gesture(self, param_name):
+        """
+        A client has started touching the control for a parameter.
+        Until end_param_gesture() is called, the parameter's value is
+        sent at most once every param_gesture_transmit_interval_sec.
+        Float parameters with a MIDI CC are sent as the nearest MIDI CC value.
+        Raises an Exception if param_name is invalid.
+        :param param_name: str
+        :return:
+        """
+        if not NymphesPreset.is_param_name(param_name):
+            raise Exception(f'Invalid param_name: {param_name}')
+
+        with self._param_gestures_lock:
+            if param_name not in self._param_gestures_dict:
+                self._param_gestures_dict[param_name] = {
+                    'last_transmit_timestamp': None,
+                    'transmit_pending': False,
+                    'changed': False,
+                    'cc_value': None
+                }
+
+        self.logger.debug('Began gesture for %s', param_name)
+
+    def end_param_gesture(self, param_name):
+        """
+        A client has stopped touching the control for a parameter.
+        If the value changed during the gesture then its exact value is
+        sent: a MIDI CC for int parameters with a MIDI CC, and a preset
+        snapshot otherwise.
+        Raises an Exception if param_name is invalid.
+        :param param_name: str
+        :return:
+        """
+        if not NymphesPreset.is_param_name(param_name):
+            raise Exception(f'Invalid param_name: {param_name}')
+
+        with self._param_gestures_lock:
+            gesture = self._param_gestures_dict.pop(param_name, None)
+
+            if gesture is None or not gesture['changed'] or self._curr_preset_object is None:
+                return
+
+            control = NymphesPreset.midi_cc_for_param_name(param_name)
+
+            if NymphesPreset.type_for_param_name(param_name) == float or control is None:
+                # The snapshot is sent as MIDI CCs if the value is a whole
+                # number and that takes fewer bytes
+                self._preset_snapshot_scheduler.request()
+
+            elif gesture['transmit_pending']:
+                self._send_param_cc(param_name, control, self._curr_preset_object.get_int(param_name))
+
+        self.logger.debug('Ended gesture for %s', param_name)
+
+    def _set_param_during_gesture(self, param_name, int_value, float_value):
+        """
+        Set a parameter whose control is being touched by a client.
+        The new value is sent now if the parameter hasn't been sent in the
+        last param_gesture_transmit_interval_sec. Otherwise update() sends it.
+        :param param_name: str
+        :param int_value: int or None
+        :param float_value: float or None
+        :return: bool. True if the value changed.
+        """
+        if int_value is not None:
+            val_changed = self._curr_preset_object.set_int(param_name, int_value)
+        else:
+            val_changed = self._curr_preset_object.set_float(param_name, float_value)
+
+        if not val_changed:
+            return False
+
+        with self._param_gestures_lock:
+            gesture = self._param_gestures_dict.get(param_name)
+
+            if gesture is None:
+                # The gesture has just ended
+                self._preset_snapshot_scheduler.request()
+                return True
+
+            gesture['changed'] = True
+
+            now = time.monotonic()
+            if gesture['last_transmit_timestamp'] is not None and \
+                    now - gesture['last_transmit_timestamp'] < self.param_gesture_transmit_interval_sec:
+                gesture['transmit_pending'] = True
+                return True
+
+            gesture['last_transmit_timestamp'] = now
+            gesture['transmit_pending'] = False
+            self._transmit_gesture_value(param_name, gesture)
+
+        return True
+
+    def _transmit_pending_gesture_values(self):
+        """
+        Send the values of parameters being touched by clients which
+        changed too soon after they were last sent.
+        :return:
+        """
+        now = time.monotonic()
+
+        with self._param_gestures_lock:
+            for param_name, gesture in self._param_gestures_dict.items():
+                if gesture['transmit_pending'] and \
+                        now - gesture['last_transmit_timestamp'] >= self.param_gesture_transmit_interval_sec:
+                    gesture['last_transmit_timestamp'] = now
+                    gesture['transmit_pending'] = False
+                    self._transmit_gesture_value(param_name, gesture)
+
+    def _transmit_gesture_value(self, param_name, gesture):
+        """
+        Send the current value of a parameter during a gesture.
+        The gestures lock must be held.
+        :param param_name: str
+        :param gesture: The parameter's dict in _param_gestures_dict
+        :return:
+        """
+        control = NymphesPreset.midi_cc_for_param_name(param_name)
+
+        if control is None:
+            # The preset snapshot scheduler limits how often this is sent
+            self._preset_snapshot_scheduler.request()
+
+        elif NymphesPreset.type_for_param_name(param_name) == float:
+            cc_value = self._nearest_cc_value(param_name, self._curr_preset_object.get_float(param_name))
+            if cc_value != gesture['cc_value']:
+                gesture['cc_value'] = cc_value
+                self._send_rounded_float_cc(param_name, control, cc_value)
+
+        else:
+            self._send_param_cc(param_name, control, self._curr_preset_object.get_int(param_name))
+
     def set_mod_wheel(self, value):
         """
         Send mod wheel MIDI Control Change message to Nymphes
@@ -1448,6 +2240,45 @@ class NymphesMIDI:
         # Send to connected MIDI Output ports
         self._send_to_all_connected_midi_output_ports(msg)
 
+    def set_midi_output_byte_rate(self, bytes_per_sec, port_name=None):
+        """
+        Set the byte rate budget for messages sent to Nymphes or to a MIDI output port.
+        The setting is kept if the port is disconnected and connected again.
+        Raises an Exception if bytes_per_sec is invalid.
+        :param bytes_per_sec: int or None. None or 0 means no limit.
+        :param port_name: str or None. The name of a MIDI output port, or None for Nymphes.
+        :return:
+        """
+        if bytes_per_sec is not None and (not isinstance(bytes_per_sec, int) or bytes_per_sec < 0):
+            raise Exception(f'bytes_per_sec should be None or an int of 0 or more: {bytes_per_sec}')
+
+        self._midi_output_byte_rates_dict[port_name] = bytes_per_sec
+
+        if port_name is None:
+            if self._nymphes_midi_output_scheduler is not None:
+                self._nymphes_midi_output_scheduler.set_byte_rate(bytes_per_sec)
+        else:
+            for port, scheduler in self._midi_output_schedulers_dict.items():
+                if port.name == port_name:
+                    scheduler.set_byte_rate(bytes_per_sec)
+
+    def _create_midi_output_scheduler(self, port, is_nymphes=False):
+        """
+        Create a MidiOutputScheduler for an output port, using the byte
+        rate budget set for it or the default budget.
+        :param port: A mido output port
+        :param is_nymphes: bool. True if this is the Nymphes output port
+        :return: MidiOutputScheduler
+        """
+        key = None if is_nymphes else port.name
+        bytes_per_sec = self._midi_output_byte_rates_dict.get(key, self._midi_output_bytes_per_sec)
+
+        return MidiOutputScheduler(
+            port,
+            bytes_per_sec=bytes_per_sec,
+            mod_matrix_control_numbers=self._mod_matrix_control_numbers
+        )
+
     def _send_to_nymphes(self, msg):
         """
         Add a MIDI message to the Nymphes queue.
@@ -1456,7 +2287,7 @@ class NymphesMIDI:
         :return:
         """
         if self.nymphes_connected:
-            self._nymphes_midi_message_send_queue.put(msg)
+            self._nymphes_midi_output_scheduler.put(msg)
 
     def _send_to_midi_output_port(self, msg, port_object):
         """
@@ -1468,10 +2299,10 @@ class NymphesMIDI:
         :return:
         """
         if port_object != self._virtual_midi_output_port_object and port_object not in self._connected_midi_output_port_objects:
-            raise Exception(f'Invalid MIDI output port object: {port_object} (There is no message send queue for this port)')
+            raise Exception(f'Invalid MIDI output port object: {port_object} (There is no message scheduler for this port)')
 
-        # Add the message to the queue for the port
-        self._midi_message_send_queues_dict[port_object].put(msg)
+        # Add the message to the scheduler for the port
+        self._midi_output_schedulers_dict[port_object].put(msg)
 
     def _send_to_all_connected_midi_output_ports(self, msg):
         """
@@ -1490,15 +2321,104 @@ class NymphesMIDI:
             self._send_to_midi_output_port(msg, port_object)
 
         # If feedback suppression is enabled, store the message in
-        # the recently-sent messages list with an expiry time
+        # the recently-sent messages dict with an expiry time
         #
         if self._midi_feedback_suppression_enabled:
             if msg.type != 'sysex':
-                msg.time = time.time() + self._midi_feedback_suppression_messages_list_retention_time_sec
+                expiry_time = time.time() + self._midi_feedback_suppression_messages_list_retention_time_sec
             else:
-                msg.time = time.time() + self._midi_feedback_suppression_messages_list_sysex_retention_time_sec
+                expiry_time = time.time() + self._midi_feedback_suppression_messages_list_sysex_retention_time_sec
+
+            self._midi_feedback_suppression_messages_dict[tuple(msg.bytes())] = expiry_time
+
+    def _is_midi_feedback(self, msg):
+        """
+        Check whether a message received from a MIDI input port is a copy
+        of one we recently sent to MIDI output ports.
+        May be called from any thread.
+        :param msg: A mido MIDI message
+        :return: bool
+        """
+        expiry_time = self._midi_feedback_suppression_messages_dict.get(tuple(msg.bytes()))
+        return expiry_time is not None and time.time() <= expiry_time
 
-            self._midi_feedback_suppression_messages_list.append(msg)
+    def _on_midi_input_port_callback(self, input_port_name, msg):
+        """
+        Called on a MIDI input port's thread for each message it receives.
+        The message is passed on to Nymphes here, so messages reach Nymphes
+        in the order they were played. Notes and performance controls (pitch
+        bend, aftertouch, mod wheel, sustain pedal, etc) are sent straight
+        away unless earlier messages from MIDI input ports are still waiting
+        to be sent, so playing through this program adds as little latency
+        as possible. Other messages are queued in order with Nymphes' scheduler.
+        The message is then queued for update() to interpret.
+        :param input_port_name: str
+        :param msg: A mido MIDI message
+        :return:
+        """
+        #
+        # MIDI Feedback Suppression (if enabled)
+        #
+
+        if self._midi_feedback_suppression_enabled:
+            if self._is_midi_feedback(msg):
+                #
+                # This is a message we recently sent to MIDI outputs,
+                # so feedback is occurring.
+                #
+                self.add_notification(
+                    MidiConnectionEvents.midi_feedback_detected.value
+                )
+
+                self.logger.debug('MIDI Feedback Detected. Ignoring message: %s', msg)
+                return
+
+            if msg.type == 'control_change' and tuple(msg.bytes()) in self._rounded_float_cc_messages_bytes_set:
+                #
+                # This is a copy of a MIDI CC we sent for a float parameter
+                # in hybrid mode. The current preset has the exact value.
+                #
+                self.add_notification(
+                    MidiConnectionEvents.midi_feedback_detected.value
+                )
+
+                self.logger.debug('MIDI Feedback Detected. Ignoring message: %s', msg)
+                return
+
+        #
+        # Send the message to Nymphes
+        #
+
+        # Program changes for presets that Nymphes doesn't have are not sent
+        invalid_program_change = msg.type == 'program_change' and \
+            msg.channel == self._nymphes_midi_channel - 1 and msg.program > 97
+
+        # The scheduler is deleted when Nymphes is disconnected,
+        # which may happen on another thread
+        scheduler = self._nymphes_midi_output_scheduler
+
+        if scheduler is not None and not invalid_program_change:
+            if msg.type in MidiOutputScheduler.performance_message_types or \
+                    (msg.type == 'control_change' and msg.control in MidiOutputScheduler.performance_control_numbers):
+                try:
+                    scheduler.send_now(msg)
+                except rtmidi.SystemError as e:
+                    self.logger.error(f'Failed to send MIDI message to Nymphes ({e})')
+
+            else:
+                scheduler.put_in_order(msg)
+
+        self._midi_input_queue.put((msg, input_port_name))
+
+    def _forget_nymphes_mod_source(self):
+        """
+        Tell Nymphes' scheduler that Nymphes' modulation source is unknown,
+        ie: because Nymphes has loaded a preset, so the next CC 30 message
+        we send is not left out.
+        :return:
+        """
+        if self._nymphes_midi_output_scheduler is not None:
+            self._nymphes_midi_output_scheduler.set_mod_source(self._nymphes_midi_channel - 1, None)
 
     def _on_message_from_nymphes(self, msg):
         """
@@ -1513,7 +2433,7 @@ class NymphesMIDI:
         if msg.type == 'sysex':
             # Try to interpret this SYSEX message as a Nymphes preset
             try:
-                preset_import_type, preset_key = self._handle_sysex_message(msg)
+                preset_import_type, preset_key, previous_preset_object = self._handle_sysex_message(msg)
 
                 if preset_import_type == 'non-persistent':
                     #
@@ -1531,18 +2451,11 @@ class NymphesMIDI:
                     # precision than Control Change messages allow.
                     self._start_ignoring_control_change_messages_from_nymphes()
 
-                    # Send notifications for all preset parameters
-                    for param_name in NymphesPreset.all_param_names():
-                        self.add_curr_preset_param_notification(param_name)
-
-                        # Log the parameters
-                        param_type = NymphesPreset.type_for_param_name(param_name)
-
-                        if param_type == float:
-                            self.logger.debug(f'{param_name}: {self._curr_preset_object.get_float(param_name)}')
+                    # The preset may have changed the modulation source
+                    self._forget_nymphes_mod_source()
 
-                        elif param_type == int:
-                            self.logger.debug(f'{param_name}: {self._curr_preset_object.get_int(param_name)}')
+                    # Send notifications for the preset parameters that changed
+                    self._send_preset_replaced_notifications(previous_preset_object)
 
                     # Reset the unsaved changes flag
                     self._unsaved_changes = False
@@ -1564,6 +2477,13 @@ class NymphesMIDI:
                 self.logger.warning(f'Failed to handle SYSEX message from Nymphes ({e})')
 
         elif msg.is_cc():
+            # Nymphes' scheduler needs to know the modulation source, so it
+            # doesn't leave out the next CC 30 message we send. This is kept
+            # up to date even while other Control Change messages are ignored.
+            if msg.control == 30 and msg.channel == self._nymphes_midi_channel - 1:
+                if self._nymphes_midi_output_scheduler is not None:
+                    self._nymphes_midi_output_scheduler.set_mod_source(msg.channel, msg.value)
+
             if not self._ignore_control_change_messages_from_nymphes:
                 # Make sure the message was received on the Nymphes MIDI Channel
                 if msg.channel != self._nymphes_midi_channel - 1:
@@ -1605,7 +2525,7 @@ class NymphesMIDI:
                         self.add_notification('mod_source', msg.value)
 
                         # Log the message
-                        self.logger.debug(f'mod_source: {msg.value}')
+                        self.logger.debug('mod_source: %s', msg.value)
 
                     else:
                         #
@@ -1651,7 +2571,7 @@ class NymphesMIDI:
                                     self.add_notification('int_param', (param_names_for_this_cc[0], msg.value))
 
                                     # Log the message
-                                    self.logger.debug(f'{param_names_for_this_cc[0]}: {msg.value}')
+                                    self.logger.debug('%s: %s', param_names_for_this_cc[0], msg.value)
 
                             except Exception as e:
                                 self.logger.warning(f'Invalid value received from Nymphes for {param_names_for_this_cc[0]}: {msg.value} ({e})')
@@ -1693,7 +2613,7 @@ class NymphesMIDI:
                                             self.add_notification('int_param', (param_name, msg.value))
 
                                             # Log the message
-                                            self.logger.debug(f'{param_name}: {msg.value}')
+                                            self.logger.debug('%s: %s', param_name, msg.value)
 
                                     except Exception as e:
                                         self.logger.warning(f'Invalid value received from Nymphes for {param_name}: {msg.value} ({e})')
@@ -1714,8 +2634,11 @@ class NymphesMIDI:
                 # Store them
                 self._curr_preset_bank_and_number = bank_name, preset_number
 
+                # The preset may have changed the modulation source
+                self._forget_nymphes_mod_source()
+
                 self.logger.debug(
-                    f'Received Program Change Message from Nymphes (Bank {bank_name}, Preset {preset_number})')
+                    'Received Program Change Message from Nymphes (Bank %s, Preset %s)', bank_name, preset_number)
 
                 # Send a notification that Nymphes has loaded a preset
                 self.add_notification(
@@ -1747,7 +2670,8 @@ class NymphesMIDI:
         MIDI input port. Interpret it. If it affects the
         current preset's values, then notify the software
         client.
-        We always send a copy of the message to Nymphes.
+        The message has already been sent to Nymphes, and
+        feedback has been ignored, by _on_midi_input_port_callback().
         :param msg: A mido MIDI Message object
         :param input_port_name: (str) The name of the mido MIDI Input
         port that received the message
@@ -1762,35 +2686,16 @@ class NymphesMIDI:
             if input_port_name == self._virtual_midi_input_port_object.name:
                 input_port_name = 'Virtual Input Port'
 
-        #
-        # MIDI Feedback Suppression (if enabled)
-        #
-
-        if self._midi_feedback_suppression_enabled:
-            num_messages = len(self._midi_feedback_suppression_messages_list)
-            for recent_msg in self._midi_feedback_suppression_messages_list:
-                if msg.bytes() == recent_msg.bytes():
-                    #
-                    # This is a message we recently sent to MIDI outputs,
-                    # so feedback is occurring.
-                    #
-                    self.add_notification(
-                        MidiConnectionEvents.midi_feedback_detected.value
-                    )
-
-                    self.logger.debug(f'MIDI Feedback Detected. Ignoring message: {msg}')
-                    return
-
         #
         # Handle the message
         #
 
-        self.logger.debug(f'Received from MIDI Input Port {input_port_name}: {str(msg)}')
+        self.logger.debug('Received from MIDI Input Port %s: %s', input_port_name, msg)
 
         if msg.type == 'sysex':
             # Try to interpret this SYSEX message as a Nymphes preset
             try:
-                preset_import_type, preset_key = self._handle_sysex_message(msg)
+                preset_import_type, preset_key, previous_preset_object = self._handle_sysex_message(msg)
 
                 if preset_import_type == 'non-persistent':
                     #
@@ -1806,18 +2711,8 @@ class NymphesMIDI:
                         (input_port_name, *preset_key)
                     )
 
-                    # Send notifications for all preset parameters
-                    for param_name in NymphesPreset.all_param_names():
-                        self.add_curr_preset_param_notification(param_name)
-
-                        # Log the parameters
-                        param_type = NymphesPreset.type_for_param_name(param_name)
-
-                        if param_type == float:
-                            self.logger.debug(f'{param_name}: {self._curr_preset_object.get_float(param_name)}')
-
-                        elif param_type == int:
-                            self.logger.debug(f'{param_name}: {self._curr_preset_object.get_int(param_name)}')
+                    # Send notifications for the preset parameters that changed
+                    self._send_preset_replaced_notifications(previous_preset_object)
 
                 elif preset_import_type == 'persistent':
                     #
@@ -1847,11 +2742,11 @@ class NymphesMIDI:
 
                     if msg.value == 0:
                         self._curr_preset_type = 'user'
-                        self.logger.debug(f'Received Bank MSB 0 (User Bank) from {input_port_name}')
+                        self.logger.debug('Received Bank MSB 0 (User Bank) from %s', input_port_name)
 
                     elif msg.value == 1:
                         self._curr_preset_type = 'factory'
-                        self.logger.debug(f'Received Bank MSB 1 (Factory Bank) from {input_port_name}')
+                        self.logger.debug('Received Bank MSB 1 (Factory Bank) from %s', input_port_name)
 
                     else:
                         self._curr_preset_type = None
@@ -1866,7 +2761,7 @@ class NymphesMIDI:
                     self.add_notification('mod_wheel', msg.value)
 
                     # Log the message
-                    self.logger.debug(f'{input_port_name}: mod_wheel: {msg.value}')
+                    self.logger.debug('%s: mod_wheel: %s', input_port_name, msg.value)
 
                 elif msg.control == 30:
                     #
@@ -1880,7 +2775,7 @@ class NymphesMIDI:
                     self.add_notification('mod_source', msg.value)
 
                     # Log the message
-                    self.logger.debug(f'{input_port_name}: mod_source: {msg.value}')
+                    self.logger.debug('%s: mod_source: %s', input_port_name, msg.value)
 
                 elif msg.control == 64:
                     #
@@ -1891,7 +2786,7 @@ class NymphesMIDI:
                     self.add_notification('sustain_pedal', msg.value)
 
                     # Log the message
-                    self.logger.debug(f'{input_port_name}: sustain_pedal: {msg.value}')
+                    self.logger.debug('%s: sustain_pedal: %s', input_port_name, msg.value)
 
                 else:
                     #
@@ -1940,7 +2835,7 @@ class NymphesMIDI:
                                         self.add_curr_preset_param_notification(param_names_for_this_cc[0])
 
                                         # Log the message
-                                        self.logger.debug(f'{input_port_name}: {param_names_for_this_cc[0]}: {msg.value}')
+                                        self.logger.debug('%s: %s: %s', input_port_name, param_names_for_this_cc[0], msg.value)
 
                                 except Exception as e:
                                     self.logger.warning(
@@ -1969,7 +2864,7 @@ class NymphesMIDI:
                                     self.add_curr_preset_param_notification(param_names_for_this_cc[0])
 
                                     # Log the message
-                                    self.logger.debug(f'{input_port_name}: {param_names_for_this_cc[0]}: {msg.value}')
+                                    self.logger.debug('%s: %s: %s', input_port_name, param_names_for_this_cc[0], msg.value)
 
                             except Exception as e:
                                 self.logger.warning(f'Invalid value received from {input_port_name} for {param_names_for_this_cc[0]}: {msg.value} ({e})')
@@ -2007,7 +2902,7 @@ class NymphesMIDI:
                                         self.add_curr_preset_param_notification(param_name)
 
                                         # Log the message
-                                        self.logger.debug(f'{input_port_name}: {param_name}: {msg.value}')
+                                        self.logger.debug('%s: %s: %s', input_port_name, param_name, msg.value)
 
                                 except Exception as e:
                                     self.logger.warning(f'Invalid value received from {input_port_name} for {param_name}: {msg.value} ({e})')
@@ -2030,7 +2925,7 @@ class NymphesMIDI:
                 self._curr_preset_bank_and_number = bank_name, preset_number
 
                 self.logger.debug(
-                    f'Received Program Change Message from {input_port_name} (Bank {bank_name}, Preset {preset_number})')
+                    'Received Program Change Message from %s (Bank %s, Preset %s)', input_port_name, bank_name, preset_number)
 
                 # Send a notification that Nymphes has loaded a preset
                 self.add_notification(
@@ -2054,24 +2949,182 @@ class NymphesMIDI:
                 self.add_notification('velocity', msg.velocity)
 
                 # Log the message
-                self.logger.debug(f'{input_port_name}: velocity: {msg.velocity}')
+                self.logger.debug('%s: velocity: %s', input_port_name, msg.velocity)
 
         elif msg.type == 'aftertouch':
             # Send aftertouch to clients so they can display it to the user
             self.add_notification('aftertouch', msg.value)
 
             # Log the message
-            self.logger.debug(f'{input_port_name}: aftertouch: {msg.value}')
+            self.logger.debug('%s: aftertouch: %s', input_port_name, msg.value)
 
         elif msg.type == 'polytouch':
             # Send poly aftertouch to clients so they can display it to the user
             self.add_notification('poly_aftertouch', (msg.channel+1, msg.value))
 
             # Log the message
-            self.logger.debug(f'{input_port_name}: poly_aftertouch: {msg.channel+1}, {msg.value}')
+            self.logger.debug('%s: poly_aftertouch: %s, %s', input_port_name, msg.channel+1, msg.value)
 
-        # Send a copy of the message to Nymphes
-        self._send_to_nymphes(msg)
+    def _replace_curr_preset_object(self, preset_object):
+        """
+        Use preset_object as the current preset, keeping track of
+        the parameters that differ from the old current preset so
+        the next preset snapshot includes them.
+        :param preset_object: NymphesPreset
+        :return:
+        """
+        if self._nymphes_preset_baseline is not None and self._curr_preset_object is not None:
+            self._preset_transition_pending_param_names.update(
+                self._curr_preset_object.diff(preset_object)
+            )
+
+        self._curr_preset_object = preset_object
+
+    def _reset_nymphes_preset_baseline(self, preset_object=None):
+        """
+        Store a copy of the preset that Nymphes and connected MIDI output
+        ports now have. Use None if we don't know what they have.
+        :param preset_object: NymphesPreset or None
+        :return:
+        """
+        self._nymphes_preset_baseline = preset_object.clone() if preset_object is not None else None
+        self._preset_transition_pending_param_names = set()
+
+    def _send_curr_preset_snapshot(self):
+        """
+        Send the current preset to Nymphes and connected MIDI output ports.
+        If we know what Nymphes currently has, then the parameters that
+        have changed are sent as MIDI CCs when that takes fewer bytes
+        than a SYSEX message. Otherwise the whole preset is sent via SYSEX.
+        :return:
+        """
+        # Generate a list of bytes in the MIDI SYSEX format used by Nymphes
+        sysex_data = self._curr_preset_object.generate_sysex_data(
+            preset_import_type='non-persistent',
+            preset_type='user',
+            bank_name='A',
+            preset_number=1
+        )
+
+        # SYSEX messages have start and end bytes in addition to the data
+        sysex_num_bytes = len(sysex_data) + 2
+
+        cc_messages = None
+        if self._nymphes_preset_baseline is not None:
+            # Find the parameters which may differ on Nymphes
+            changed_param_names = set(self._nymphes_preset_baseline.diff(self._curr_preset_object))
+            changed_param_names.update(self._preset_transition_pending_param_names)
+
+            cc_messages = self._cc_messages_for_params(changed_param_names)
+
+        if cc_messages is not None and sum(len(msg.bytes()) for msg in cc_messages) < sysex_num_bytes:
+            #
+            # Send MIDI CCs
+            #
+            cc_num_bytes = sum(len(msg.bytes()) for msg in cc_messages)
+
+            for msg in cc_messages:
+                self._send_to_nymphes(msg)
+                self._send_to_all_connected_midi_output_ports(msg)
+
+            self._preset_transition_stats['preset_transitions_cc'] += 1
+            self._preset_transition_stats['preset_transition_bytes_sent'] += cc_num_bytes
+            self._preset_transition_stats['preset_transition_bytes_saved'] += sysex_num_bytes - cc_num_bytes
+
+            self.logger.info(f'Sent {len(cc_messages)} MIDI CC messages to Nymphes and connected MIDI Output ports instead of SYSEX ({cc_num_bytes} bytes instead of {sysex_num_bytes})')
+
+        else:
+            #
+            # Send SYSEX
+            #
+
+            # Create a mido MIDI SYSEX message
+            msg = mido.Message('sysex', data=sysex_data)
+
+            # Add it to the message send queue for Nymphes
+            self._send_to_nymphes(msg)
+
+            # Add it to the queues for all connected MIDI output ports
+            self._send_to_all_connected_midi_output_ports(msg)
+
+            self._preset_transition_stats['preset_transitions_sysex'] += 1
+            self._preset_transition_stats['preset_transition_bytes_sent'] += sysex_num_bytes
+
+            self.logger.info('Sent current preset to Nymphes and connected MIDI Output ports via SYSEX')
+
+        # Nymphes now has the current preset
+        self._reset_nymphes_preset_baseline(self._curr_preset_object)
+
+        # The exact values have now been sent, and copies of the snapshot
+        # are caught by the feedback suppression messages list
+        self._rounded_float_cc_messages_bytes_set.clear()
+
+    def _cc_messages_for_params(self, param_names):
+        """
+        Create MIDI Control Change messages that set the supplied
+        parameters to their values in the current preset.
+        Modulation matrix parameters are grouped by modulation source,
+        with each group preceded by a CC 30 message selecting the source.
+        Returns None if any of the parameters cannot be set exactly using
+        MIDI CC (ie: chord settings, or float values between two ints).
+        :param param_names: An iterable of parameter names
+        :return: A list of mido messages, or None
+        """
+        mod_source_names = ['lfo2', 'mod_wheel', 'velocity', 'aftertouch']
+
+        # Messages for parameters without a mod source
+        messages = []
+
+        # Messages for modulation matrix parameters.
+        # key: mod source name, value: a list of messages
+        mod_source_messages_dict = {}
+
+        # Go through the parameters in a consistent order
+        for param_name in NymphesPreset.all_param_names():
+            if param_name not in param_names:
+                continue
+
+            control = NymphesPreset.midi_cc_for_param_name(param_name)
+            if control is None:
+                return None
+
+            if param_name == 'osc.legato.value':
+                # Legato's preset value is only 0 to 1, while Nymphes
+                # uses MIDI values of 0 or 127.
+                value = 127 if self._curr_preset_object.get_int(param_name) == 1 else 0
+
+            elif NymphesPreset.type_for_param_name(param_name) == int:
+                value = self._curr_preset_object.get_int(param_name)
+
+            else:
+                # A float value can only be sent using MIDI CC if
+                # it is a whole number
+                float_value = self._curr_preset_object.get_float(param_name)
+                value = int(round(float_value))
+                if not NymphesPreset.float_equals(float_value, value):
+                    return None
+
+            msg = mido.Message('control_change',
+                               channel=self.nymphes_midi_channel - 1,
+                               control=control,
+                               value=value)
+
+            mod_source = NymphesPreset.mod_source_for_param_name(param_name)
+            if mod_source is None:
+                messages.append(msg)
+            else:
+                mod_source_messages_dict.setdefault(mod_source, []).append(msg)
+
+        for mod_source, mod_source_messages in mod_source_messages_dict.items():
+            # Select the mod source
+            messages.append(mido.Message('control_change',
+                                         channel=self.nymphes_midi_channel - 1,
+                                         control=30,
+                                         value=mod_source_names.index(mod_source)))
+
+            messages.extend(mod_source_messages)
+
+        return messages
 
     def _handle_sysex_message(self, msg):
         """
@@ -2080,11 +3133,15 @@ class NymphesMIDI:
         store its contents.
         Raise an Exception if the message is invalid.
         :param msg: A mido MIDI message
-        :return: A tuple: (preset_import_type, preset_key)
+        :return: A tuple: (preset_import_type, preset_key, previous_preset_object).
+        previous_preset_object is the current preset object that was replaced,
+        or None if the current preset was not replaced.
         """
         try:
             p = NymphesPreset(sysex_data=msg.data)
 
+            previous_preset_object = None
+
             # Construct a dictionary key from the preset's type, bank and number
             preset_key = (p.preset_type, p.bank_name, p.preset_number)
 
@@ -2104,21 +3161,28 @@ class NymphesMIDI:
                 #
 
                 # This is now the current preset.
-                # Store a copy of it.
-                self._curr_preset_object = copy.deepcopy(p)
+                # p was decoded just now and isn't shared with
+                # anything else, so there is no need to copy it.
+                previous_preset_object = self._curr_preset_object
+                self._curr_preset_object = p
+
+                # Nymphes has this preset now
+                self._reset_nymphes_preset_baseline(p)
 
                 # Store the key to the current preset
                 self._curr_preset_dict_key = preset_key
 
-            # Log the message
-            status_message = 'Nymphes preset received via SYSEX ('
-            status_message += f'Bank {p.bank_name}, '
-            status_message += f'{p.preset_type.capitalize()} Preset {p.preset_number}, '
-            status_message += f'{p.preset_import_type.capitalize()} Import'
-            status_message += ')'
-            self.logger.info(status_message)
+            # Log the message. Nymphes sends many of these during a
+            # preset dump, so the message is only formatted if it is logged.
+            self.logger.info(
+                'Nymphes preset received via SYSEX (Bank %s, %s Preset %s, %s Import)',
+                p.bank_name,
+                p.preset_type.capitalize(),
+                p.preset_number,
+                p.preset_import_type.capitalize()
+            )
 
-            return preset_import_type,  preset_key
+            return preset_import_type, preset_key, previous_preset_object
 
         except Exception as e:
             pass
@@ -2158,6 +3222,9 @@ class NymphesMIDI:
             self.nymphes_midi_ports
         )
 
+        # We don't know what preset Nymphes has
+        self._reset_nymphes_preset_baseline()
+
         # Schedule the sending of the init preset
         self._send_initial_preset_timestamp = time.time() + self._send_initial_preset_wait_time_sec
 
@@ -2172,6 +3239,8 @@ class NymphesMIDI:
         self._curr_preset_dict_key = None
         self._nymphes_memory_slots_dict = {}
 
+        self._reset_nymphes_preset_baseline()
+
         # Notify client
         self.add_notification(
             MidiConnectionEvents.nymphes_disconnected.value
@@ -2278,175 +3347,145 @@ class NymphesMIDI:
         if port_name in self.connected_midi_outputs:
             self.disconnect_midi_output(port_name)
 
-    def _detect_midi_input_ports(self):
+    def _detect_midi_input_ports(self, port_names):
         """
-        Detect MIDI input ports.
+        Handle MIDI input ports which have been detected or are no longer detected.
+        :param port_names: A list of the names of all MIDI input ports, from the MidiPortScanner
         """
-        # Sometimes getting port names causes an Exception...
-        try:
-            #
-            # Get a list of all MIDI input ports
-            #
-            port_names = mido.get_input_names()
+        # Remove the virtual input port if it exists
+        port_names = list(port_names)
+        if self._virtual_midi_input_port_object is not None:
+            if self._virtual_midi_input_port_object.name in port_names:
+                port_names.remove(self._virtual_midi_input_port_object.name)
 
-            # Remove None if it is in the list of port names.
-            # A recently-disconnected port may be added as None.
-            # Perhaps this is a bug in mido.
-            port_names = [port_name for port_name in port_names if port_name is not None]
+        #
+        # Create separate lists of nymphes
+        # and non-nymphes port names
+        #
+        nymphes_port_names = []
+        non_nymphes_port_names = []
 
-            # Remove the virtual input port if it exists
-            if self._virtual_midi_input_port_object is not None:
-                if self._virtual_midi_input_port_object.name in port_names:
-                    port_names.remove(self._virtual_midi_input_port_object.name)
+        for port_name in port_names:
+            if 'nymphes' in port_name.lower():
+                nymphes_port_names.append(port_name)
+            else:
+                non_nymphes_port_names.append(port_name)
 
+        #
+        # Nymphes Ports
+        #
+        if set(nymphes_port_names) != set(self._detected_nymphes_midi_inputs):
             #
-            # Create separate lists of nymphes
-            # and non-nymphes port names
+            # Handle ports that are no longer detected
             #
-            nymphes_port_names = []
-            non_nymphes_port_names = []
-
-            for port_name in port_names:
-                if 'nymphes' in port_name.lower():
-                    nymphes_port_names.append(port_name)
-                else:
-                    non_nymphes_port_names.append(port_name)
+            for port_name in self._detected_nymphes_midi_inputs:
+                if port_name not in nymphes_port_names:
+                    self._detected_nymphes_midi_inputs.remove(port_name)
+                    self._on_nymphes_input_no_longer_detected(port_name)
 
             #
-            # Nymphes Ports
+            # Handle newly-detected ports
             #
-            if set(nymphes_port_names) != set(self._detected_nymphes_midi_inputs):
-                #
-                # Handle ports that are no longer detected
-                #
-                for port_name in self._detected_nymphes_midi_inputs:
-                    if port_name not in nymphes_port_names:
-                        self._detected_nymphes_midi_inputs.remove(port_name)
-                        self._on_nymphes_input_no_longer_detected(port_name)
-
-                #
-                # Handle newly-detected ports
-                #
-                for port_name in nymphes_port_names:
-                    if port_name not in self._detected_nymphes_midi_inputs:
-                        self._detected_nymphes_midi_inputs.append(port_name)
-                        self._on_nymphes_input_detected(port_name)
+            for port_name in nymphes_port_names:
+                if port_name not in self._detected_nymphes_midi_inputs:
+                    self._detected_nymphes_midi_inputs.append(port_name)
+                    self._on_nymphes_input_detected(port_name)
 
+        #
+        # Non-Nymphes Ports
+        #
+        if set(non_nymphes_port_names) != set(self._detected_midi_inputs):
             #
-            # Non-Nymphes Ports
+            # Handle ports that are no longer detected
             #
-            if set(non_nymphes_port_names) != set(self._detected_midi_inputs):
-                #
-                # Handle ports that are no longer detected
-                #
-                for port_name in self._detected_midi_inputs:
-                    if port_name not in non_nymphes_port_names:
-                        # This port is no longer detected.
-                        self._detected_midi_inputs.remove(port_name)
-
-                        # Call the event handler
-                        self._on_midi_input_port_no_longer_detected(port_name)
+            for port_name in self._detected_midi_inputs:
+                if port_name not in non_nymphes_port_names:
+                    # This port is no longer detected.
+                    self._detected_midi_inputs.remove(port_name)
 
-                #
-                # Handle newly-detected MIDI ports
-                #
-                for port_name in non_nymphes_port_names:
-                    if port_name not in self._detected_midi_inputs:
-                        # This port has just been detected.
-                        self._detected_midi_inputs.append(port_name)
+                    # Call the event handler
+                    self._on_midi_input_port_no_longer_detected(port_name)
 
-                        # Call the event handler
-                        self._on_midi_input_port_detected(port_name)
+            #
+            # Handle newly-detected MIDI ports
+            #
+            for port_name in non_nymphes_port_names:
+                if port_name not in self._detected_midi_inputs:
+                    # This port has just been detected.
+                    self._detected_midi_inputs.append(port_name)
 
-        except InvalidPortError:
-            # Sometimes an exception is thrown when trying to get port names.
-            # Do nothing
-            pass
+                    # Call the event handler
+                    self._on_midi_input_port_detected(port_name)
 
-    def _detect_midi_output_ports(self):
+    def _detect_midi_output_ports(self, port_names):
         """
-        Detect MIDI output ports.
+        Handle MIDI output ports which have been detected or are no longer detected.
+        :param port_names: A list of the names of all MIDI output ports, from the MidiPortScanner
         """
-        # Sometimes getting port names causes an Exception...
-        try:
-            #
-            # Get a list of all MIDI output ports
-            #
-            port_names = mido.get_output_names()
+        # Remove the virtual output port if it exists
+        port_names = list(port_names)
+        if self._virtual_midi_output_port_object is not None:
+            if self._virtual_midi_output_port_object.name in port_names:
+                port_names.remove(self._virtual_midi_output_port_object.name)
 
-            # Remove None if it is in the list of port names.
-            # A recently-disconnected port may be added as None.
-            # Perhaps this is a bug in mido.
-            port_names = [port_name for port_name in port_names if port_name is not None]
+        #
+        # Create separate lists of nymphes
+        # and non-nymphes port names
+        #
+        nymphes_port_names = []
+        non_nymphes_port_names = []
 
-            # Remove the virtual output port if it exists
-            if self._virtual_midi_output_port_object is not None:
-                if self._virtual_midi_output_port_object.name in port_names:
-                    port_names.remove(self._virtual_midi_output_port_object.name)
+        for port_name in port_names:
+            if 'nymphes' in port_name.lower():
+                nymphes_port_names.append(port_name)
+            else:
+                non_nymphes_port_names.append(port_name)
 
+        #
+        # Nymphes Ports
+        #
+        if set(nymphes_port_names) != set(self._detected_nymphes_midi_outputs):
             #
-            # Create separate lists of nymphes
-            # and non-nymphes port names
+            # Handle ports that are no longer detected
             #
-            nymphes_port_names = []
-            non_nymphes_port_names = []
-
-            for port_name in port_names:
-                if 'nymphes' in port_name.lower():
-                    nymphes_port_names.append(port_name)
-                else:
-                    non_nymphes_port_names.append(port_name)
+            for port_name in self._detected_nymphes_midi_outputs:
+                if port_name not in nymphes_port_names:
+                    self._detected_nymphes_midi_outputs.remove(port_name)
+                    self._on_nymphes_output_no_longer_detected(port_name)
 
             #
-            # Nymphes Ports
+            # Handle newly-detected ports
             #
-            if set(nymphes_port_names) != set(self._detected_nymphes_midi_outputs):
-                #
-                # Handle ports that are no longer detected
-                #
-                for port_name in self._detected_nymphes_midi_outputs:
-                    if port_name not in nymphes_port_names:
-                        self._detected_nymphes_midi_outputs.remove(port_name)
-                        self._on_nymphes_output_no_longer_detected(port_name)
-
-                #
-                # Handle newly-detected ports
-                #
-                for port_name in nymphes_port_names:
-                    if port_name not in self._detected_nymphes_midi_outputs:
-                        self._detected_nymphes_midi_outputs.append(port_name)
-                        self._on_nymphes_output_detected(port_name)
+            for port_name in nymphes_port_names:
+                if port_name not in self._detected_nymphes_midi_outputs:
+                    self._detected_nymphes_midi_outputs.append(port_name)
+                    self._on_nymphes_output_detected(port_name)
 
+        #
+        # Non-Nymphes Ports
+        #
+        if set(non_nymphes_port_names) != set(self._detected_midi_outputs):
             #
-            # Non-Nymphes Ports
+            # Handle ports that are no longer detected
             #
-            if set(non_nymphes_port_names) != set(self._detected_midi_outputs):
-                #
-                # Handle ports that are no longer detected
-                #
-                for port_name in self._detected_midi_outputs:
-                    if port_name not in non_nymphes_port_names:
-                        # This port is no longer detected.
-                        self._detected_midi_outputs.remove(port_name)
+            for port_name in self._detected_midi_outputs:
+                if port_name not in non_nymphes_port_names:
+                    # This port is no longer detected.
+                    self._detected_midi_outputs.remove(port_name)
 
-                        # Call the event handler
-                        self._on_midi_output_port_no_longer_detected(port_name)
-
-                #
-                # Handle newly-detected MIDI ports
-                #
-                for port_name in non_nymphes_port_names:
-                    if port_name not in self._detected_midi_outputs:
-                        # This port has just been detected.
-                        self._detected_midi_outputs.append(port_name)
+                    # Call the event handler
+                    self._on_midi_output_port_no_longer_detected(port_name)
 
-                        # Call the event handler
-                        self._on_midi_output_port_detected(port_name)
+            #
+            # Handle newly-detected MIDI ports
+            #
+            for port_name in non_nymphes_port_names:
+                if port_name not in self._detected_midi_outputs:
+                    # This port has just been detected.
+                    self._detected_midi_outputs.append(port_name)
 
-        except InvalidPortError:
-            # Sometimes an exception is thrown when trying to get port names.
-            # Do nothing
-            pass
+                    # Call the event handler
+                    self._on_midi_output_port_detected(port_name)
 
     def _start_ignoring_control_change_messages_from_nymphes(self):
         # Set the flag to True
@@ -2469,6 +3508,10 @@ class NymphesMIDI:
         # Set the flag to True
         self._waiting_for_preset_data_from_nymphes = True
 
+        # Nymphes is loading a preset, so we no longer know
+        # what it has until we receive the preset data
+        self._reset_nymphes_preset_baseline()
+
         # Set the time when we stop waiting for preset data
         self._waiting_for_preset_data_from_nymphes_until_timestamp = \
             time.time() + \
@@ -2482,6 +3525,41 @@ class NymphesMIDI:
 
         self.logger.debug('No longer waiting for preset data from Nymphes')
 
+    def _send_preset_replaced_notifications(self, previous_preset_object):
+        """
+        The current preset has been replaced by a preset received via SYSEX.
+        Send notifications only for the parameters whose values changed,
+        followed by a single preset_replaced notification with the
+        fingerprints of the previous and new presets. Clients can use these
+        to check that their copy of the preset matches ours, and request
+        all parameters if it doesn't.
+        If there was no previous preset then all parameters are sent.
+        :param previous_preset_object: NymphesPreset or None
+        :return:
+        """
+        if previous_preset_object is None:
+            param_names = NymphesPreset.all_param_names()
+        else:
+            param_names = previous_preset_object.diff(self._curr_preset_object)
+
+        # Only build the log messages if they will be used
+        log_params = self.logger.isEnabledFor(logging.DEBUG)
+
+        for param_name in param_names:
+            self.add_curr_preset_param_notification(param_name)
+
+            if log_params:
+                self.logger.debug('%s: %s', param_name, self._curr_preset_object.get_value(param_name))
+
+        self.add_notification(
+            PresetEvents.preset_replaced.value,
+            (
+                previous_preset_object.fingerprint if previous_preset_object is not None else '',
+                self._curr_preset_object.fingerprint,
+                len(param_names)
+            )
+        )
+
     def send_current_preset_notifications(self):
         """
         Send notifications for all parameters in the current preset.
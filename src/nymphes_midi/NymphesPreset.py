@@ -1,6 +1,9 @@
 from nymphes_midi.protobuf.preset_pb2 import preset, lfo_speed_mode, lfo_sync_mode, voice_mode
+from nymphes_midi.PresetCodec import PresetCodec
 from pathlib import Path
 import csv
+import hashlib
+import struct
 
 
 class NymphesPreset:
@@ -13,6 +16,31 @@ class NymphesPreset:
     _curr_version_csv_header_string = list(_csv_header_strings_version_map.keys())[-1]
     float_precision_num_decimals = 1
 
+    # Preset file formats that can be used when saving.
+    # v2.0.0 is a CSV text file. v3.0.0 is a binary file.
+    _file_formats = ['v2.0.0', 'v3.0.0']
+
+    # Files with these suffixes are saved in the binary format
+    # unless a file format is specified.
+    _binary_file_suffixes = ['.nym', '.NYM']
+
+    # A binary (v3.0.0) preset file is a header followed by the encoded
+    # protobuf preset.
+    # The header contains:
+    # - Magic bytes identifying the file
+    # - The file format major version (uint16)
+    # - A checksum of the encoded protobuf preset (16-byte BLAKE2b hash)
+    # - The length of the encoded protobuf preset (uint32)
+    _binary_file_magic = b'NYMP'
+    _binary_file_version = 3
+    _binary_file_header_struct = struct.Struct('<4sH16sI')
+
+    # The codec used to convert protobuf preset objects to and from bytes.
+    # 'protobuf' uses the protobuf runtime (whichever backend is installed).
+    # 'fast' uses the hand-written PresetCodec.
+    _codec_names = ['protobuf', 'fast']
+    _codec_name = 'protobuf'
+
     _preset_params_map = {
         #
         # Oscillator Section
@@ -2223,6 +2251,23 @@ class NymphesPreset:
 
     }
 
+    #
+    # Lookups derived from _preset_params_map, built once so
+    # they don't have to be recreated for each call.
+    #
+
+    # key: protobuf preset name, value: parameter name
+    _param_names_for_preset_names_map = {
+        param_data['preset_name']: param_name for param_name, param_data in _preset_params_map.items()
+    }
+
+    # key: protobuf preset name, value: a tuple of the name's components.
+    # ie: 'main.wave' becomes ('main', 'wave')
+    _protobuf_preset_name_components_map = {
+        param_data['preset_name']: tuple(param_data['preset_name'].split('.'))
+        for param_data in _preset_params_map.values()
+    }
+
     def __init__(self, sysex_data=None, filepath=None, print_logs_enabled=False):
         """
         If sysex_data is not None, then try to decode the data
@@ -2245,6 +2290,20 @@ class NymphesPreset:
         #
         self._protobuf_preset = None
 
+        # True if _protobuf_preset may be shared with a clone of this
+        # preset. It gets copied before we make any changes to it.
+        self._protobuf_preset_shared = False
+
+        # The encoded protobuf preset and its fingerprint. These are
+        # calculated when first needed and cleared when a value changes.
+        self._encoded_protobuf_preset = None
+        self._fingerprint = None
+
+        # The part of our SYSEX data which doesn't depend on the import
+        # type or preset slot. This is also calculated when first needed
+        # and cleared when a value changes.
+        self._sysex_payload = None
+
         if sysex_data is not None:
             # Use the supplied SYSEX data for our parameter values
             #
@@ -2269,6 +2328,34 @@ class NymphesPreset:
 
             self._log_message('Using default preset values')
 
+    def clone(self):
+        """
+        Returns a copy of this preset.
+        The underlying protobuf preset object is shared between the
+        two presets until one of them is changed, so this is cheap
+        even when the copy is never modified.
+        :return: NymphesPreset
+        """
+        p = NymphesPreset.__new__(NymphesPreset)
+        p._print_logs_enabled = self._print_logs_enabled
+        p._preset_import_type = self._preset_import_type
+        p._preset_type = self._preset_type
+        p._bank_name = self._bank_name
+        p._preset_number = self._preset_number
+        p._protobuf_preset = self._protobuf_preset
+        p._encoded_protobuf_preset = self._encoded_protobuf_preset
+        p._fingerprint = self._fingerprint
+        p._sysex_payload = self._sysex_payload
+
+        # Neither preset owns the protobuf preset object now
+        p._protobuf_preset_shared = True
+        self._protobuf_preset_shared = True
+
+        return p
+
+    def __deepcopy__(self, memo):
+        return self.clone()
+
     @property
     def print_logs_enabled(self):
         return self._print_logs_enabled
@@ -2319,6 +2406,84 @@ class NymphesPreset:
         """
         return self._preset_number
 
+    def diff(self, other):
+        """
+        Compare this preset's parameter values with those of another preset.
+        Float values are compared using float_precision_num_decimals.
+        :param other: NymphesPreset
+        :return: A list of the names of parameters whose values differ
+        """
+        # Clones which haven't been changed share their protobuf preset object
+        if self._protobuf_preset is other._protobuf_preset:
+            return []
+
+        changed_param_names = []
+
+        for param_name in NymphesPreset.all_param_names():
+            protobuf_preset_name = NymphesPreset._protobuf_preset_name_for_param_name(param_name)
+            value = NymphesPreset._get_protobuf_preset_value(self._protobuf_preset, protobuf_preset_name)
+            other_value = NymphesPreset._get_protobuf_preset_value(other._protobuf_preset, protobuf_preset_name)
+
+            if NymphesPreset.type_for_param_name(param_name) == float:
+                if not NymphesPreset.float_equals(value * 127.0, other_value * 127.0):
+                    changed_param_names.append(param_name)
+
+            elif value != other_value:
+                changed_param_names.append(param_name)
+
+        return changed_param_names
+
+    @property
+    def fingerprint(self):
+        """
+        A hash of the preset's parameter values. Float values are rounded
+        to float_precision_num_decimals, as they are when saved to a CSV
+        preset file and compared by diff(), so presets which diff() finds
+        equal have the same fingerprint. Metadata like preset_type,
+        bank_name, preset_number and preset_import_type is not included,
+        so the same preset stored in two different slots has the same
+        fingerprint.
+        It is cached until a parameter value changes.
+        :return: str. A hexadecimal string
+        """
+        if self._fingerprint is None:
+            values = []
+
+            for param_name in NymphesPreset.all_param_names():
+                protobuf_preset_name = NymphesPreset._protobuf_preset_name_for_param_name(param_name)
+                value = NymphesPreset._get_protobuf_preset_value(self._protobuf_preset, protobuf_preset_name)
+
+                if NymphesPreset.type_for_param_name(param_name) == float:
+                    # The same rounding as float_equals()
+                    value = int(round(value * 127.0, NymphesPreset.float_precision_num_decimals) *
+                                pow(10, NymphesPreset.float_precision_num_decimals))
+
+                values.append(str(int(value)))
+
+            self._fingerprint = hashlib.blake2b(','.join(values).encode(), digest_size=16).hexdigest()
+
+        return self._fingerprint
+
+    def _encoded_bytes(self):
+        """
+        Returns the encoded protobuf preset, which is cached until
+        a parameter value changes.
+        :return: bytes
+        """
+        if self._encoded_protobuf_preset is None:
+            self._encoded_protobuf_preset = self._protobuf_preset_to_bytes(self._protobuf_preset)
+
+        return self._encoded_protobuf_preset
+
+    def _on_value_changed(self):
+        """
+        Clear values calculated from the protobuf preset
+        :return:
+        """
+        self._encoded_protobuf_preset = None
+        self._fingerprint = None
+        self._sysex_payload = None
+
     def all_params_dict(self):
         """
         Return a dictionary of all parameters, including metadata,
@@ -2452,15 +2617,11 @@ class NymphesPreset:
         :param preset_name: str
         :return: str
         """
-        # Create a dict of preset names
-        preset_names_dict = {NymphesPreset._preset_params_map[param_name]['preset_name']: param_name for param_name in
-                             NymphesPreset._preset_params_map.keys()}
-
         # Make sure preset_name is valid
-        if preset_name not in preset_names_dict:
+        if preset_name not in NymphesPreset._param_names_for_preset_names_map:
             raise Exception(f'Invalid preset name: {preset_name}')
 
-        return preset_names_dict[preset_name]
+        return NymphesPreset._param_names_for_preset_names_map[preset_name]
 
     @staticmethod
     def param_names_for_midi_cc(midi_cc):
@@ -2488,6 +2649,16 @@ class NymphesPreset:
         """
         return list(NymphesPreset._preset_params_map.keys())
 
+    @staticmethod
+    def is_param_name(name):
+        """
+        Check whether name is a valid parameter name.
+        This is faster than checking membership in all_param_names().
+        :param name: str
+        :return: bool
+        """
+        return name in NymphesPreset._preset_params_map
+
     @staticmethod
     def all_section_names():
         """
@@ -2659,7 +2830,7 @@ class NymphesPreset:
         for the parameter. False if it was the same.
         """
         # Make sure param_name is valid
-        if param_name not in self.all_param_names():
+        if param_name not in NymphesPreset._preset_params_map:
             raise Exception(f'Invalid param_name: {param_name}')
 
         # Make sure this ia a float parameter
@@ -2681,7 +2852,12 @@ class NymphesPreset:
         value /= 127.0
 
         # Set the value in the preset
-        return self._set_protobuf_preset_value(self._protobuf_preset, preset_param_name, value)
+        val_changed = self._set_protobuf_preset_value(self._writable_protobuf_preset(), preset_param_name, value)
+
+        if val_changed:
+            self._on_value_changed()
+
+        return val_changed
 
     def set_int(self, param_name, value):
         """
@@ -2695,7 +2871,7 @@ class NymphesPreset:
         """
 
         # Make sure param_name is valid
-        if param_name not in self.all_param_names():
+        if param_name not in NymphesPreset._preset_params_map:
             raise Exception(f'Invalid param_name: {param_name}')
 
         # Convert the value to float if this is actually
@@ -2725,7 +2901,12 @@ class NymphesPreset:
                 value = 3
 
         # Set the value in the preset
-        return self._set_protobuf_preset_value(self._protobuf_preset, preset_preset_name, value)
+        val_changed = self._set_protobuf_preset_value(self._writable_protobuf_preset(), preset_preset_name, value)
+
+        if val_changed:
+            self._on_value_changed()
+
+        return val_changed
 
     def get_float(self, param_name):
         """
@@ -2736,7 +2917,7 @@ class NymphesPreset:
         :return: float
         """
         # Make sure param_name is valid
-        if param_name not in self.all_param_names():
+        if param_name not in NymphesPreset._preset_params_map:
             raise Exception(f'Invalid param_name: {param_name}')
 
         # Get the parameter type
@@ -2765,7 +2946,7 @@ class NymphesPreset:
         :return: int
         """
         # Make sure param_name is valid
-        if param_name not in self.all_param_names():
+        if param_name not in NymphesPreset._preset_params_map:
             raise Exception(f'Invalid param_name: {param_name}')
         
         # Get the name used in the protobuf preset
@@ -2816,13 +2997,102 @@ class NymphesPreset:
         v2 = int(round(second_value, NymphesPreset.float_precision_num_decimals) * pow(10, NymphesPreset.float_precision_num_decimals))
         return v1 == v2
 
-    def save_preset_file(self, filepath):
+    @staticmethod
+    def codec_name():
+        """
+        Returns the name of the codec currently used to encode and
+        decode preset data.
+        :return: str. 'protobuf' or 'fast'
+        """
+        return NymphesPreset._codec_name
+
+    @staticmethod
+    def set_codec(codec_name):
+        """
+        Choose the codec used to encode and decode preset data for
+        all NymphesPreset objects.
+        Before switching to 'fast', PresetCodec is checked against the
+        protobuf runtime, and an Exception is raised if they disagree.
+        Raises an Exception if codec_name is invalid.
+        :param codec_name: str. 'protobuf' or 'fast'
+        :return:
+        """
+        if codec_name not in NymphesPreset._codec_names:
+            raise Exception(f'Invalid codec_name: {codec_name} (should be one of {NymphesPreset._codec_names})')
+
+        if codec_name == 'fast':
+            # Verify the codec using a default preset, and a preset with
+            # non-default values in every field, including negative chord
+            # values and the optional reverb modulation fields
+            default_protobuf_preset = NymphesPreset._create_default_protobuf_preset()
+            test_protobuf_preset = NymphesPreset._create_default_protobuf_preset()
+
+            for i, protobuf_preset_name in enumerate(NymphesPreset._all_protobuf_preset_param_names()):
+                param_name = NymphesPreset.param_name_for_preset_name(protobuf_preset_name)
+                min_val = NymphesPreset.min_val_for_param_name(param_name)
+                max_val = NymphesPreset.max_val_for_param_name(param_name)
+
+                if NymphesPreset.type_for_param_name(param_name) == float:
+                    value = (i % 127) / 127.0
+                elif max_val <= 5:
+                    # Enums, legato and voice mode
+                    value = i % 2
+                else:
+                    value = min_val + (i % (max_val - min_val))
+
+                NymphesPreset._set_protobuf_preset_value(test_protobuf_preset, protobuf_preset_name, value)
+
+            test_protobuf_preset.extra_lfo_2.reverb_mix = 0.25
+            test_protobuf_preset.extra_after.reverb_size = 0.5
+
+            for protobuf_preset in [default_protobuf_preset, test_protobuf_preset]:
+                if not PresetCodec.verify(protobuf_preset):
+                    raise Exception('PresetCodec output does not match the protobuf runtime')
+
+        NymphesPreset._codec_name = codec_name
+
+    @staticmethod
+    def _protobuf_preset_to_bytes(protobuf_preset):
+        """
+        Serialize a protobuf preset object using the current codec.
+        :param protobuf_preset: A protobuf preset object
+        :return: bytes
+        """
+        if NymphesPreset._codec_name == 'fast':
+            return PresetCodec.encode(protobuf_preset)
+
+        return protobuf_preset.SerializeToString()
+
+    @staticmethod
+    def _protobuf_preset_from_bytes(data):
+        """
+        Parse serialized preset data using the current codec.
+        PresetCodec only accepts fields that are in the schema, so
+        if it rejects the data we let the protobuf runtime try.
+        Raises an Exception if the data is invalid.
+        :param data: bytes
+        :return: A protobuf preset object
+        """
+        if NymphesPreset._codec_name == 'fast':
+            try:
+                return PresetCodec.decode(data)
+            except Exception:
+                pass
+
+        return preset.FromString(bytes(data))
+
+    def save_preset_file(self, filepath, skip_if_unchanged=False, file_format=None):
         """
-        Store all parameters in a CSV text file.
+        Store all parameters in a preset file.
         This can be later loaded back into a NymphesPreset.
-        Raises an Exception if filepath is invalid.
+        Raises an Exception if filepath or file_format is invalid.
         :param filepath: Path or str
-        :return:
+        :param skip_if_unchanged: If True, and there is already a preset
+        file at filepath with the same fingerprint, then don't write it.
+        :param file_format: (str) 'v2.0.0' for a CSV text file, or 'v3.0.0'
+        for a binary file. If None, then v3.0.0 is used if filepath's suffix
+        is .nym, and v2.0.0 is used otherwise.
+        :return: True if the file was written. False if it was skipped.
         """
         # Validate file_path
         #
@@ -2833,6 +3103,38 @@ class NymphesPreset:
         if not isinstance(filepath, Path):
             raise Exception(f'file_path is neither a Path nor a string ({filepath})')
 
+        # Choose the file format
+        if file_format is None:
+            file_format = 'v3.0.0' if filepath.suffix in NymphesPreset._binary_file_suffixes else 'v2.0.0'
+
+        if file_format not in NymphesPreset._file_formats:
+            raise Exception(f'Invalid file_format: {file_format} (should be one of {NymphesPreset._file_formats})')
+
+        if skip_if_unchanged and filepath.exists():
+            try:
+                if NymphesPreset(filepath=filepath).fingerprint == self.fingerprint:
+                    return False
+            except Exception:
+                # The existing file isn't a valid preset file,
+                # so we will overwrite it
+                pass
+
+        if file_format == 'v3.0.0':
+            # Write the header and encoded protobuf preset to a binary file
+            #
+            data = self._encoded_bytes()
+            header = NymphesPreset._binary_file_header_struct.pack(
+                NymphesPreset._binary_file_magic,
+                NymphesPreset._binary_file_version,
+                hashlib.blake2b(data, digest_size=16).digest(),
+                len(data)
+            )
+
+            with open(filepath, 'wb') as file:
+                file.write(header + data)
+
+            return True
+
         # Write all preset parameters to a CSV text file
         #
         with open(filepath, 'w') as file:
@@ -2841,9 +3143,11 @@ class NymphesPreset:
 
             # Write parameters to the file
             for name, value in self.all_params_dict().items():
-                if name in NymphesPreset.all_param_names():
+                if name in NymphesPreset._preset_params_map:
                     file.write(f'{name}, {value}' + '\n')
 
+        return True
+
     def generate_sysex_data(self, preset_import_type, preset_type, bank_name, preset_number):
         """
         Generates MIDI SYSEX data that can be used to send a full preset
@@ -2903,25 +3207,50 @@ class NymphesPreset:
         # An int between 1 and 7
         sysex_data.append(preset_number)
 
-        # Serialize the self._preset to a list of protobuf bytes
-        protobuf_data = list(self._protobuf_preset.SerializeToString())
+        # CRC and nibblized protobuf data
+        sysex_data.extend(self._generate_sysex_payload())
 
-        # CRC
-        #
-        # Calculate CRC from the protobuf bytes
-        crc_byte = self._calculate_crc8(protobuf_data)
+        return sysex_data
 
-        # Get nibble from the CRC
-        crc_ms, crc_ls = self._nibble_from_byte(crc_byte)
+    def _generate_sysex_payload(self):
+        """
+        Returns the CRC and nibblized protobuf data which follow the
+        header in our SYSEX data. This is cached until a parameter
+        value changes.
+        :return: A tuple of ints
+        """
+        if self._sysex_payload is None:
+            # Serialize the self._preset to a list of protobuf bytes
+            protobuf_data = list(self._encoded_bytes())
+
+            # CRC
+            #
+            # Calculate CRC from the protobuf bytes
+            crc_byte = self._calculate_crc8(protobuf_data)
 
-        sysex_data.extend([crc_ls, crc_ms])
+            # Get nibble from the CRC
+            crc_ms, crc_ls = self._nibble_from_byte(crc_byte)
 
-        # Get nibblized version of protobuf_data
-        protobuf_nibbles = self._nibbles_from_bytes(protobuf_data)
+            # Get nibblized version of protobuf_data
+            protobuf_nibbles = self._nibbles_from_bytes(protobuf_data)
 
-        sysex_data.extend(protobuf_nibbles)
+            self._sysex_payload = tuple([crc_ls, crc_ms] + protobuf_nibbles)
 
-        return sysex_data
+        return self._sysex_payload
+
+    def _writable_protobuf_preset(self):
+        """
+        Returns the protobuf preset object, first copying it if
+        it may be shared with a clone of this preset.
+        :return: A protobuf preset object
+        """
+        if self._protobuf_preset_shared:
+            p = preset()
+            p.CopyFrom(self._protobuf_preset)
+            self._protobuf_preset = p
+            self._protobuf_preset_shared = False
+
+        return self._protobuf_preset
 
     @staticmethod
     def _set_protobuf_preset_value(protobuf_preset_object, protobuf_preset_name, value):
@@ -2936,16 +3265,18 @@ class NymphesPreset:
         """
 
         # Make sure preset_param_name is valid
-        if protobuf_preset_name not in NymphesPreset._all_protobuf_preset_param_names():
+        if protobuf_preset_name not in NymphesPreset._param_names_for_preset_names_map:
             raise Exception(f'Invalid preset_param_name: {protobuf_preset_name}')
 
-        # Get the parameter name for this preset name
-        param_name = NymphesPreset.param_name_for_preset_name(protobuf_preset_name)
+        # Get the parameter's data
+        param_data = NymphesPreset._preset_params_map[
+            NymphesPreset._param_names_for_preset_names_map[protobuf_preset_name]
+        ]
 
         # Make sure the value is within the correct range
         #
-        min_val = NymphesPreset.min_val_for_param_name(param_name)
-        max_val = NymphesPreset.max_val_for_param_name(param_name)
+        min_val = param_data['min']
+        max_val = param_data['max']
         if value < min_val or value > max_val:
             raise Exception(
                 f'Invalid value for {protobuf_preset_name}: {value} (should be between {min_val} and {max_val}')
@@ -2959,7 +3290,7 @@ class NymphesPreset:
             protobuf_preset_name
         )
 
-        param_type = NymphesPreset.type_for_param_name(param_name)
+        param_type = param_data['type']
         if param_type == int:
             if value == curr_value:
                 return False
@@ -2975,8 +3306,8 @@ class NymphesPreset:
         # Set the parameter's value
         #
 
-        # Break the protobuf preset name into its components
-        *components, val_name = protobuf_preset_name.split('.')
+        # Get the protobuf preset name's components
+        *components, val_name = NymphesPreset._protobuf_preset_name_components_map[protobuf_preset_name]
 
         # Get the object specified by the name,
         # digging down in the preset object one level per
@@ -3000,11 +3331,11 @@ class NymphesPreset:
         :return: int or float
         """
         # Make sure preset_param_name is valid
-        if protobuf_preset_param_name not in NymphesPreset._all_protobuf_preset_param_names():
+        if protobuf_preset_param_name not in NymphesPreset._protobuf_preset_name_components_map:
             raise Exception(f'Invalid protobuf_preset_param_name: {protobuf_preset_param_name}')
 
-        # Break the name into components separated by periods
-        name_components = protobuf_preset_param_name.split('.')
+        # Get the name's components
+        name_components = NymphesPreset._protobuf_preset_name_components_map[protobuf_preset_param_name]
 
         # Get the object specified by the name,
         # digging down in the preset one level per
@@ -3347,7 +3678,7 @@ class NymphesPreset:
                 f'CRC failed: (sysex {sysex_crc_ms_nibble}:{sysex_crc_ls_nibble}, calculated from protobuf: {protobuf_crc_ms_nibble}, {protobuf_crc_ls_nibble})')
 
         # Convert protobuf data to a preset
-        p = preset.FromString(bytes(protobuf_data))
+        p = cls._protobuf_preset_from_bytes(bytes(protobuf_data))
 
         # Get the preset import type
         preset_import_type = 'persistent' if sysex_data[5] == 0x01 else 'non-persistent'
@@ -3449,9 +3780,12 @@ class NymphesPreset:
     @staticmethod
     def _protobuf_preset_from_file(file_path):
         """
-        Determine the version of the NymphesPreset in the CSV
-        file at file_path, load its contents and return a protobuf
-        preset object with the parameter values from the file.
+        Determine the version of the NymphesPreset file at file_path
+        (a v1.0.0 or v2.0.0 CSV file, or a v3.0.0 binary file), load
+        its contents and return a protobuf preset object with the
+        parameter values from the file.
+        The file is read once, and its values are written straight
+        into the protobuf preset object.
         Raises an Exception if the file is invalid.
         file_path is a Path or a string
         """
@@ -3465,203 +3799,120 @@ class NymphesPreset:
         if not isinstance(file_path, Path):
             raise Exception(f'file_path is neither a Path nor a string ({file_path})')
 
-        # Create a dict to contain the values found in the preset file
-        params_dict = {}
+        # Read the whole file
+        with open(file_path, 'rb') as file:
+            file_data = file.read()
 
-        header_string = ''
+        if file_data.startswith(NymphesPreset._binary_file_magic):
+            return NymphesPreset._protobuf_preset_from_binary_file_data(file_data, file_path)
 
-        # Read from the file
-        with open(file_path) as file:
-            # Create a CSV reader
-            csv_reader = csv.reader(file)
+        try:
+            rows = list(csv.reader(file_data.decode('utf-8').splitlines()))
+        except UnicodeDecodeError:
+            raise Exception(f'Preset file at {file_path} is invalid (not a text file)')
 
-            #
-            # Check the header row to make sure this is a
-            # Nymphes preset, and to get its version
-            #
-            header_string = next(csv_reader, None)[0]
-            if header_string not in NymphesPreset._csv_header_strings_version_map.keys():
-                raise Exception(f'Preset file at {file_path} is invalid (unrecognized header string: {header_string})')
+        #
+        # Check the header row to make sure this is a
+        # Nymphes preset, and to get its version
+        #
+        header_string = rows[0][0] if len(rows) > 0 and len(rows[0]) > 0 else None
+        if header_string not in NymphesPreset._csv_header_strings_version_map.keys():
+            raise Exception(f'Preset file at {file_path} is invalid (unrecognized header string: {header_string})')
 
-        # Load the preset using the correct function for
-        # the file version
         version_string = NymphesPreset._csv_header_strings_version_map[header_string]
-        if version_string == 'v1.0.0':
-            return NymphesPreset._protobuf_preset_from_file_v1_0_0(file_path)
-
-        elif version_string == 'v2.0.0':
-            return NymphesPreset._protobuf_preset_from_file_v2_0_0(file_path)
-
-
-    @staticmethod
-    def _protobuf_preset_from_file_v1_0_0(file_path):
-        """
-        Read the v1.0.0 CSV file at file_path and return a protobuf
-        preset object with the parameter values from the file.
-        Raises an Exception if the file is invalid, or if it is
-        the wrong version.
-        file_path is a Path or a string
-        """
-        # Create a dict to contain the values found in the preset file
-        params_dict = {}
 
-        # The version supported by this function
-        supported_version_string = 'v1.0.0'
+        # v1.0.0 files may use None for parameters that had no value.
+        # These parameters keep their default values.
+        none_values_allowed = version_string == 'v1.0.0'
 
-        with open(file_path) as file:
-            # Create a CSV reader
-            csv_reader = csv.reader(file)
-
-            #
-            # Make sure the header is valid, and correct for this version
-            # of Nymphes Preset file
-            #
-            header_string = next(csv_reader, None)[0]
-            if header_string not in NymphesPreset._csv_header_strings_version_map.keys():
-                raise Exception(f'Preset file at {file_path} is invalid (unrecognized header string: {header_string})')
-
-            # Get the version string for this header
-            version_string = NymphesPreset._csv_header_strings_version_map[header_string]
-            if version_string != supported_version_string:
-                raise Exception(f'Preset file at {file_path} is not {supported_version_string}. It is {version_string}')
-
-            # Read rows of the file into the params dict
-            for row in csv_reader:
-                name, value = row
-
-                # Remove leading and trailing whitespace
-                name = name.strip()
-                value = value.strip()
-
-                if name in NymphesPreset.all_param_names():
-                    if value == 'None':
-                        params_dict[name] = None
-
-                    else:
-                        # Get the type for this parameter
-                        param_type = NymphesPreset.type_for_param_name(name)
-
-                        if param_type == float:
-                            value = float(value) / 127.0
+        # Create a protobuf preset object with default values
+        p = NymphesPreset._create_default_protobuf_preset()
 
-                        elif param_type == int:
-                            value = int(value)
+        # Populate it with the parameters from the file
+        for row in rows[1:]:
+            name, value = row
 
-                        # Store the value
-                        params_dict[name] = value
+            # Remove leading and trailing whitespace
+            name = name.strip()
+            value = value.strip()
 
-                else:
-                    # This isn't an actual parameter.
-                    # Ignore it.
-                    pass
+            param_data = NymphesPreset._preset_params_map.get(name)
+            if param_data is None:
+                # This isn't an actual parameter.
+                # Ignore it.
+                continue
 
-        # Create empty protobuf preset object
-        p = NymphesPreset._create_default_protobuf_preset()
+            if none_values_allowed and value == 'None':
+                continue
 
-        # Populate it with the parameters from the file
-        for param_name, value in params_dict.items():
-            # Get the protobuf preset name for this parameter
-            protobuf_preset_name = NymphesPreset._protobuf_preset_name_for_param_name(param_name)
+            protobuf_preset_name = param_data['preset_name']
+            param_type = param_data['type']
 
-            if protobuf_preset_name == 'voice_mode':
-                #
-                # In the protobuf definition, voice modes 3 and 4 are swapped
-                # compared to the MIDI CC mapping and Nymphes front panel.
-                # We will convert from the protobuf mapping here.
-                #
-                if value == 3:
-                    value = 4
-                elif value == 4:
-                    value = 3
+            if param_type == float:
+                value = float(value) / 127.0
 
-            # Set the value
-            NymphesPreset._set_protobuf_preset_value(p, protobuf_preset_name, value)
+            else:
+                value = int(value)
+
+                if protobuf_preset_name == 'voice_mode':
+                    #
+                    # In the protobuf definition, voice modes 3 and 4 are swapped
+                    # compared to the MIDI CC mapping and Nymphes front panel.
+                    # We will convert from the protobuf mapping here.
+                    #
+                    if value == 3:
+                        value = 4
+                    elif value == 4:
+                        value = 3
+
+            # Make sure the value is within the correct range
+            if value < param_data['min'] or value > param_data['max']:
+                raise Exception(
+                    f'Invalid value for {protobuf_preset_name}: {value} (should be between {param_data["min"]} and {param_data["max"]}')
+
+            # Get the object containing the value
+            *components, val_name = NymphesPreset._protobuf_preset_name_components_map[protobuf_preset_name]
+            obj = p
+            for component in components:
+                obj = getattr(obj, component)
+
+            # Keep the default value if the file's value is the same
+            # at our float precision
+            if param_type == float and NymphesPreset.float_equals(value * 127.0, getattr(obj, val_name) * 127.0):
+                continue
+
+            setattr(obj, val_name, value)
 
         # Return the protobuf preset
         return p
 
     @staticmethod
-    def _protobuf_preset_from_file_v2_0_0(file_path):
+    def _protobuf_preset_from_binary_file_data(file_data, file_path):
         """
-        Read the v2.0.0 CSV file at file_path and return a protobuf
-        preset object with the parameter values from the file.
-        Raises an Exception if the file is invalid, or if it is
-        the wrong version.
-        file_path is a Path or a string
+        Decode the contents of a v3.0.0 binary preset file and return
+        a protobuf preset object.
+        Raises an Exception if the data is invalid.
+        :param file_data: bytes. The entire contents of the file
+        :param file_path: Path or str. Used in error messages
+        :return: A protobuf preset object
         """
-        # Create a dict to contain the values found in the preset file
-        params_dict = {}
+        header_size = NymphesPreset._binary_file_header_struct.size
+        if len(file_data) < header_size:
+            raise Exception(f'Preset file at {file_path} is invalid (truncated header)')
 
-        # The version supported by this function
-        supported_version_string = 'v2.0.0'
+        magic, version, checksum, data_length = NymphesPreset._binary_file_header_struct.unpack_from(file_data)
 
-        with open(file_path) as file:
-            # Create a CSV reader
-            csv_reader = csv.reader(file)
+        if version != NymphesPreset._binary_file_version:
+            raise Exception(f'Preset file at {file_path} has an unsupported version: {version}')
 
-            #
-            # Make sure the header is valid, and correct for this version
-            # of Nymphes Preset file
-            #
-            header_string = next(csv_reader, None)[0]
-            if header_string not in NymphesPreset._csv_header_strings_version_map.keys():
-                raise Exception(f'Preset file at {file_path} is invalid (unrecognized header string: {header_string})')
-
-            # Get the version string for this header
-            version_string = NymphesPreset._csv_header_strings_version_map[header_string]
-            if version_string != supported_version_string:
-                raise Exception(f'Preset file at {file_path} is not {supported_version_string}. It is {version_string}')
-
-            # Read rows of the file into the params dict
-            for row in csv_reader:
-                name, value = row
-
-                # Remove leading and trailing whitespace
-                name = name.strip()
-                value = value.strip()
+        data = file_data[header_size:]
+        if len(data) != data_length:
+            raise Exception(f'Preset file at {file_path} is invalid (expected {data_length} bytes of preset data, found {len(data)})')
 
-                if name in NymphesPreset.all_param_names():
-                    # Get the type for this parameter
-                    param_type = NymphesPreset.type_for_param_name(name)
-
-                    if param_type == float:
-                        value = float(value) / 127.0
-
-                    elif param_type == int:
-                        value = int(value)
-
-                    # Store the value
-                    params_dict[name] = value
-
-                else:
-                    # This isn't an actual parameter.
-                    # Ignore it.
-                    pass
+        if hashlib.blake2b(data, digest_size=16).digest() != checksum:
+            raise Exception(f'Preset file at {file_path} is invalid (checksum does not match)')
 
-        # Create empty protobuf preset object
-        p = NymphesPreset._create_default_protobuf_preset()
-
-        # Populate it with the parameters from the file
-        for param_name, value in params_dict.items():
-            # Get the protobuf preset name for this parameter
-            protobuf_preset_name = NymphesPreset._protobuf_preset_name_for_param_name(param_name)
-
-            if protobuf_preset_name == 'voice_mode':
-                #
-                # In the protobuf definition, voice modes 3 and 4 are swapped
-                # compared to the MIDI CC mapping and Nymphes front panel.
-                # We will convert from the protobuf mapping here.
-                #
-                if value == 3:
-                    value = 4
-                elif value == 4:
-                    value = 3
-
-            # Set the value
-            NymphesPreset._set_protobuf_preset_value(p, protobuf_preset_name, value)
-
-        # Return the protobuf preset
-        return p
+        return NymphesPreset._protobuf_preset_from_bytes(data)
 
     @staticmethod
     def _all_protobuf_preset_param_names():
@@ -3669,4 +3920,4 @@ class NymphesPreset:
         Returns a list of all names in a preset object
         :return: A list of strings
         """
-        return [NymphesPreset._preset_params_map[param_name]['preset_name'] for param_name in NymphesPreset._preset_params_map.keys()]
+        return list(NymphesPreset._param_names_for_preset_names_map.keys())
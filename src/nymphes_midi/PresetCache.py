@@ -0,0 +1,117 @@
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from nymphes_midi.NymphesPreset import NymphesPreset
+
+
+class PresetCache:
+    """
+    A bounded, least-recently-used cache of parsed preset files.
+    Each entry is validated against the file's modification time and
+    size, so a file that has changed on disk is parsed again. Entries
+    keep the preset's encoded SYSEX data too, so loading a cached
+    preset doesn't read, parse or encode anything.
+    All methods are thread-safe.
+    """
+
+    def __init__(self, capacity=32):
+        """
+        :param capacity: int. The maximum number of presets to keep.
+        0 disables the cache.
+        """
+        if not isinstance(capacity, int) or capacity < 0:
+            raise Exception(f'capacity should be an int of 0 or more: {capacity}')
+
+        self._capacity = capacity
+
+        # key: absolute path str
+        # value: A tuple: (mtime_ns, size, NymphesPreset)
+        self._entries = OrderedDict()
+
+        # Used for all access to _entries, as entries may be invalidated
+        # from the preset library watcher's thread
+        self._lock = threading.Lock()
+
+        self._hits = 0
+        self._misses = 0
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    @property
+    def stats(self):
+        """
+        Returns a dict of the cache's counters.
+        :return: dict
+        """
+        with self._lock:
+            return {
+                'preset_cache_hits': self._hits,
+                'preset_cache_misses': self._misses,
+                'preset_cache_size': len(self._entries)
+            }
+
+    def load(self, filepath):
+        """
+        Get the preset in the file at filepath, parsing the file only
+        if it isn't in the cache or has changed since it was cached.
+        Raises an Exception if the file can't be loaded.
+        :param filepath: A Path or string. The path to the preset file.
+        :return: NymphesPreset. A clone, so the caller may change it.
+        """
+        key = str(Path(filepath).absolute())
+
+        stat_result = os.stat(key)
+
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is not None and entry[0] == stat_result.st_mtime_ns and entry[1] == stat_result.st_size:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry[2].clone()
+
+            self._misses += 1
+
+        preset_object = NymphesPreset(filepath=key)
+
+        if self._capacity == 0:
+            return preset_object
+
+        # Encode the SYSEX data now, so it is shared by every clone
+        preset_object._generate_sysex_payload()
+
+        with self._lock:
+            self._entries[key] = (stat_result.st_mtime_ns, stat_result.st_size, preset_object)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self._capacity:
+                self._entries.popitem(last=False)
+
+        return preset_object.clone()
+
+    def invalidate(self, filepaths):
+        """
+        Remove the entries for the supplied paths. Paths of directories
+        remove the entries for all files inside them.
+        :param filepaths: An iterable of Paths or strs
+        :return:
+        """
+        prefixes = [str(Path(filepath).absolute()) for filepath in filepaths]
+
+        with self._lock:
+            for key in list(self._entries):
+                for prefix in prefixes:
+                    if key == prefix or key.startswith(prefix + os.sep):
+                        del self._entries[key]
+                        break
+
+    def clear(self):
+        """
+        Remove all entries.
+        :return:
+        """
+        with self._lock:
+            self._entries.clear()
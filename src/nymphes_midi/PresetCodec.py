@@ -0,0 +1,267 @@
+import struct
+from nymphes_midi.protobuf.preset_pb2 import preset
+
+
+class PresetCodec:
+    """
+    A hand-written encoder and decoder for the Nymphes preset protobuf
+    schema (protobuf/preset.proto).
+    The schema is fixed, so instead of going through the generic protobuf
+    runtime we walk a table of its fields and use struct to read and write
+    the wire format directly. The bytes produced are identical to those
+    produced by the protobuf runtime's SerializeToString().
+    """
+
+    #
+    # Wire Types
+    #
+    _wire_type_varint = 0
+    _wire_type_length_delimited = 2
+    _wire_type_fixed32 = 5
+
+    #
+    # Message Schemas
+    #
+    # Each schema is a tuple of fields in field number order:
+    # (field_number, field_name, kind, required, sub_schema)
+    # kind is 'float', 'int' (int32, enum and bool) or 'message'
+    #
+
+    _basic_inputs_schema = tuple(
+        (i + 1, name, 'float', True, None) for i, name in enumerate([
+            'wave', 'lvl', 'sub', 'noise', 'osc_lfo', 'cut', 'reson', 'cut_eg',
+            'a1', 'd1', 's1', 'r1', 'lfo_rate', 'lfo_wave', 'pw', 'glide',
+            'dtune', 'chord', 'osc_eg', 'hpf', 'track', 'cut_lfo', 'a2', 'd2',
+            's2', 'r2', 'lfo_delay', 'lfo_fade'
+        ])
+    )
+
+    _reverb_inputs_schema = tuple(
+        (i + 1, name, 'float', True, None) for i, name in enumerate([
+            'size', 'decay', 'filter', 'mix'
+        ])
+    )
+
+    _lfo_settings_schema = tuple(
+        (i + 1, name, 'int', True, None) for i, name in enumerate([
+            'lfo_1_speed_mode', 'lfo_1_sync_mode', 'lfo_2_speed_mode', 'lfo_2_sync_mode'
+        ])
+    )
+
+    _chord_info_schema = tuple(
+        (i + 1, name, 'int', True, None) for i, name in enumerate([
+            'root', 'semi_1', 'semi_2', 'semi_3', 'semi_4', 'semi_5'
+        ])
+    )
+
+    _extra_lfo_2_parameters_schema = tuple(
+        (i + 1, name, 'float', i < 8, None) for i, name in enumerate([
+            'lfo_1_rate', 'lfo_1_wave', 'lfo_1_delay', 'lfo_1_fade',
+            'lfo_2_rate', 'lfo_2_wave', 'lfo_2_delay', 'lfo_2_fade',
+            'reverb_size', 'reverb_decay', 'reverb_filter', 'reverb_mix'
+        ])
+    )
+
+    _extra_modulation_parameters_schema = tuple(
+        (i + 1, name, 'float', i < 4, None) for i, name in enumerate([
+            'lfo_2_rate', 'lfo_2_wave', 'lfo_2_delay', 'lfo_2_fade',
+            'reverb_size', 'reverb_decay', 'reverb_filter', 'reverb_mix'
+        ])
+    )
+
+    _preset_schema = (
+        (1, 'main', 'message', True, _basic_inputs_schema),
+        (2, 'reverb', 'message', True, _reverb_inputs_schema),
+        (3, 'lfo_2', 'message', True, _basic_inputs_schema),
+        (4, 'mod_w', 'message', True, _basic_inputs_schema),
+        (5, 'velo', 'message', True, _basic_inputs_schema),
+        (6, 'after', 'message', True, _basic_inputs_schema),
+        (7, 'lfo_settings', 'message', True, _lfo_settings_schema),
+        (8, 'legato', 'int', True, None),
+        (9, 'voice_mode', 'int', True, None),
+        (10, 'chord_1', 'message', True, _chord_info_schema),
+        (11, 'chord_2', 'message', True, _chord_info_schema),
+        (12, 'chord_3', 'message', True, _chord_info_schema),
+        (13, 'chord_4', 'message', True, _chord_info_schema),
+        (14, 'chord_5', 'message', True, _chord_info_schema),
+        (15, 'chord_6', 'message', True, _chord_info_schema),
+        (16, 'chord_7', 'message', True, _chord_info_schema),
+        (17, 'chord_8', 'message', True, _chord_info_schema),
+        (18, 'extra_lfo_2', 'message', True, _extra_lfo_2_parameters_schema),
+        (19, 'extra_mod_w', 'message', True, _extra_modulation_parameters_schema),
+        (20, 'extra_velo', 'message', True, _extra_modulation_parameters_schema),
+        (21, 'extra_after', 'message', True, _extra_modulation_parameters_schema),
+        (22, 'amp_level', 'float', True, None),
+    )
+
+    _float_struct = struct.Struct('<f')
+
+    # Field lookup dicts for each schema, keyed by field number
+    _fields_dicts = {
+        id(schema): {field[0]: field for field in schema}
+        for schema in [_basic_inputs_schema, _reverb_inputs_schema, _lfo_settings_schema,
+                       _chord_info_schema, _extra_lfo_2_parameters_schema,
+                       _extra_modulation_parameters_schema, _preset_schema]
+    }
+
+    @classmethod
+    def encode(cls, protobuf_preset):
+        """
+        Serialize a protobuf preset object to bytes.
+        The result is byte-identical to protobuf_preset.SerializeToString().
+        :param protobuf_preset: A protobuf preset object
+        :return: bytes
+        """
+        return bytes(cls._encode_message(protobuf_preset, cls._preset_schema))
+
+    @classmethod
+    def decode(cls, data):
+        """
+        Parse bytes produced by a protobuf preset serializer and return
+        a new protobuf preset object.
+        Raises an Exception if the data is not a valid preset, including
+        when it contains fields that are not part of the schema.
+        :param data: bytes, bytearray or a list of ints
+        :return: A protobuf preset object
+        """
+        data = bytes(data)
+        p = preset()
+        cls._decode_message(data, 0, len(data), p, cls._preset_schema)
+        return p
+
+    @classmethod
+    def verify(cls, protobuf_preset):
+        """
+        Check that encoding and decoding protobuf_preset with this codec
+        gives the same bytes as the protobuf runtime.
+        :param protobuf_preset: A protobuf preset object
+        :return: True if both paths agree. False if not.
+        """
+        protobuf_bytes = protobuf_preset.SerializeToString()
+
+        if cls.encode(protobuf_preset) != protobuf_bytes:
+            return False
+
+        if cls.decode(protobuf_bytes).SerializeToString() != protobuf_bytes:
+            return False
+
+        return True
+
+    @classmethod
+    def _encode_message(cls, message, schema):
+        out = bytearray()
+
+        for field_number, field_name, kind, required, sub_schema in schema:
+            if not required and not message.HasField(field_name):
+                # Unset optional fields are not serialized
+                continue
+
+            value = getattr(message, field_name)
+
+            if kind == 'float':
+                out += cls._encode_varint((field_number << 3) | cls._wire_type_fixed32)
+                out += cls._float_struct.pack(value)
+
+            elif kind == 'int':
+                out += cls._encode_varint((field_number << 3) | cls._wire_type_varint)
+                out += cls._encode_varint(int(value))
+
+            elif kind == 'message':
+                body = cls._encode_message(value, sub_schema)
+                out += cls._encode_varint((field_number << 3) | cls._wire_type_length_delimited)
+                out += cls._encode_varint(len(body))
+                out += body
+
+        return out
+
+    @classmethod
+    def _decode_message(cls, data, pos, end, message, schema):
+        fields_dict = cls._fields_dicts[id(schema)]
+        fields_found = set()
+
+        while pos < end:
+            tag, pos = cls._decode_varint(data, pos)
+            field_number = tag >> 3
+            wire_type = tag & 0x07
+
+            if field_number not in fields_dict:
+                raise Exception(f'Unknown field number in preset data: {field_number}')
+
+            _, field_name, kind, _, sub_schema = fields_dict[field_number]
+
+            if kind == 'float':
+                if wire_type != cls._wire_type_fixed32:
+                    raise Exception(f'Invalid wire type for {field_name}: {wire_type}')
+
+                setattr(message, field_name, cls._float_struct.unpack_from(data, pos)[0])
+                pos += 4
+
+            elif kind == 'int':
+                if wire_type != cls._wire_type_varint:
+                    raise Exception(f'Invalid wire type for {field_name}: {wire_type}')
+
+                value, pos = cls._decode_varint(data, pos)
+
+                # int32 and enum values are sign-extended to 64 bits
+                if value >= (1 << 63):
+                    value -= (1 << 64)
+
+                setattr(message, field_name, value)
+
+            elif kind == 'message':
+                if wire_type != cls._wire_type_length_delimited:
+                    raise Exception(f'Invalid wire type for {field_name}: {wire_type}')
+
+                length, pos = cls._decode_varint(data, pos)
+                if pos + length > end:
+                    raise Exception(f'Truncated preset data in {field_name}')
+
+                # Repeated occurrences of a message field are merged,
+                # which is what happens here as we decode into the
+                # existing sub-message
+                cls._decode_message(data, pos, pos + length, getattr(message, field_name), sub_schema)
+                pos += length
+
+            fields_found.add(field_number)
+
+        if pos != end:
+            raise Exception('Truncated preset data')
+
+        # Make sure all required fields were present
+        for field_number, field_name, _, required, _ in schema:
+            if required and field_number not in fields_found:
+                raise Exception(f'Required field missing from preset data: {field_name}')
+
+    @staticmethod
+    def _encode_varint(value):
+        # Negative values are encoded as 64-bit two's complement
+        if value < 0:
+            value += (1 << 64)
+
+        out = bytearray()
+        while value > 0x7f:
+            out.append((value & 0x7f) | 0x80)
+            value >>= 7
+        out.append(value)
+
+        return out
+
+    @staticmethod
+    def _decode_varint(data, pos):
+        value = 0
+        shift = 0
+
+        while True:
+            if pos >= len(data):
+                raise Exception('Truncated varint in preset data')
+
+            byte = data[pos]
+            pos += 1
+
+            value |= (byte & 0x7f) << shift
+            if not byte & 0x80:
+                return value, pos
+
+            shift += 7
+            if shift >= 64:
+                raise Exception('Invalid varint in preset data')
@@ -0,0 +1,406 @@
+import argparse
+import itertools
+import logging
+import os
+import sys
+from pathlib import Path
+from nymphes_midi.NymphesPreset import NymphesPreset
+from nymphes_midi.SyxFileReader import SyxFileReader
+from nymphes_midi.convert_arguments import add_convert_arguments
+
+
+class PresetConverter:
+    """
+    Converts preset files between the v2.0.0 text format (.txt), the
+    v3.0.0 binary format (.nym) and SYSEX (.syx), using a pool of
+    worker processes so large collections convert quickly without
+    holding the GIL of the calling process.
+    Inputs may be preset files, .syx files containing any number of
+    presets, or directories of these. Work is sent to the workers in
+    chunks, and each output file is written to a temporary file first
+    and then renamed, so a failed or interrupted conversion never
+    leaves a partly written file behind.
+    """
+
+    # The output formats, and the file suffix used for each
+    output_formats = {
+        'txt': '.txt',
+        'nym': '.nym',
+        'syx': '.syx'
+    }
+
+    # Files with these suffixes are converted when a directory is supplied
+    input_file_suffixes = ['.txt', '.nym', '.syx']
+
+    def __init__(self, max_workers=None, chunk_size=64):
+        """
+        :param max_workers: int or None. The number of worker processes.
+        If None, then the number of CPUs is used.
+        :param chunk_size: int. The number of presets sent to a worker at once.
+        """
+        # Get logger
+        self.logger = logging.getLogger('nymphes-osc.preset_converter')
+
+        self._max_workers = max_workers or os.cpu_count() or 1
+        self._chunk_size = chunk_size
+
+    def convert(self, input_paths, output_directory_path, output_format, overwrite=False, progress_callback=None):
+        """
+        Convert preset files.
+        Each input file is written to output_directory_path with the new
+        suffix. Files found inside an input directory keep their paths
+        relative to it. A .syx file containing more than one preset is
+        written to a folder with the same name as the .syx file. Other
+        SYSEX messages in a .syx file are reported as failures.
+        Presets written to .syx files use a non-persistent import, so
+        loading one on Nymphes doesn't overwrite a preset slot.
+        Raises an Exception if output_format is invalid. Failures to
+        convert individual files are reported in the return value.
+        :param input_paths: An iterable of Paths or strs. Files or directories.
+        :param output_directory_path: Path or str. Created if it doesn't exist.
+        :param output_format: str. 'txt', 'nym' or 'syx'
+        :param overwrite: bool. If False, then files that already exist are skipped.
+        :param progress_callback: Optional. Called with (num_done, num_total) as presets are converted.
+        :return: A dict with keys:
+        'converted': int, the number of files written
+        'skipped': int, the number of files which already existed
+        'failed': a list of (source str, error message str) tuples
+        """
+        if output_format not in self.output_formats:
+            raise Exception(f'Invalid output_format: {output_format} (should be one of {list(self.output_formats)})')
+
+        result = self._process(
+            self._input_files(input_paths, Path(output_directory_path)),
+            output_format,
+            overwrite,
+            progress_callback
+        )
+
+        self.logger.info(f'Converted {result["converted"]} presets to {output_format} '
+                         f'({result["skipped"]} skipped, {len(result["failed"])} failed)')
+
+        return result
+
+    def validate(self, input_paths, progress_callback=None):
+        """
+        Check that preset files can be loaded, without writing anything.
+        Each preset in a .syx file is checked separately.
+        :param input_paths: An iterable of Paths or strs. Files or directories.
+        :param progress_callback: Optional. Called with (num_done, num_total) as presets are checked.
+        :return: A dict with keys:
+        'valid': int, the number of valid presets
+        'failed': a list of (source str, error message str) tuples
+        """
+        result = self._process(
+            self._input_files(input_paths, None),
+            None,
+            False,
+            progress_callback
+        )
+
+        self.logger.info(f'Validated {result["converted"]} presets ({len(result["failed"])} failed)')
+
+        return {'valid': result['converted'], 'failed': result['failed']}
+
+    def _input_files(self, input_paths, output_directory_path):
+        """
+        Make a list of the input files, and where their output should go.
+        :param input_paths: An iterable of Paths or strs. Files or directories.
+        :param output_directory_path: Path, or None when validating
+        :return: A list of (input filepath, output filepath without suffix or None) tuples
+        """
+        input_files = []
+
+        for input_path in input_paths:
+            input_path = Path(input_path)
+
+            if input_path.is_dir():
+                for directory_path, directory_names, filenames in os.walk(input_path):
+                    for filename in sorted(filenames):
+                        filepath = Path(directory_path) / filename
+                        if filepath.suffix.lower() in self.input_file_suffixes:
+                            relative_path = filepath.relative_to(input_path)
+                            input_files.append((
+                                filepath,
+                                output_directory_path / relative_path.with_suffix('') if output_directory_path is not None else None
+                            ))
+
+            else:
+                input_files.append((
+                    input_path,
+                    output_directory_path / input_path.stem if output_directory_path is not None else None
+                ))
+
+        return input_files
+
+    def _process(self, input_files, output_format, overwrite, progress_callback):
+        """
+        Convert or validate the presets in input_files.
+        :param input_files: A list returned by _input_files()
+        :param output_format: str, or None to only validate
+        :param overwrite: bool
+        :param progress_callback: A function or None
+        :return: A dict with keys 'converted', 'skipped' and 'failed'
+        """
+        result = {'converted': 0, 'skipped': 0, 'failed': []}
+
+        # Count the presets, so progress can be reported
+        num_total = 0
+        for input_filepath, _ in input_files:
+            if input_filepath.suffix.lower() == '.syx':
+                try:
+                    with SyxFileReader(input_filepath) as reader:
+                        num_total += reader.count()
+                except Exception as e:
+                    result['failed'].append((str(input_filepath), str(e)))
+            else:
+                num_total += 1
+
+        num_done = 0
+        if progress_callback is not None:
+            progress_callback(num_done, num_total)
+
+        chunks = self._chunks(input_files, output_format, overwrite, result)
+
+        if num_total <= self._chunk_size:
+            # Starting worker processes would take longer than
+            # doing the work here
+            for chunk in chunks:
+                num_done += self._collect_results([_convert_chunk(chunk, output_format)], result)
+
+            if progress_callback is not None:
+                progress_callback(num_done + result['skipped'], num_total)
+
+            return result
+
+        # These are only imported when worker processes are used
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+        # Worker processes are started with spawn rather than fork, as
+        # the calling process may have other threads running
+        with ProcessPoolExecutor(
+                max_workers=self._max_workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(NymphesPreset.codec_name(),)
+        ) as executor:
+
+            # Limit the number of chunks waiting to be converted, so
+            # memory use doesn't depend on the number of presets
+            pending_futures = set()
+            max_pending_futures = self._max_workers * 2
+
+            for chunk in chunks:
+                if len(pending_futures) >= max_pending_futures:
+                    done_futures, pending_futures = wait(pending_futures, return_when=FIRST_COMPLETED)
+                    num_done += self._collect_results([future.result() for future in done_futures], result)
+
+                    if progress_callback is not None:
+                        progress_callback(num_done + result['skipped'], num_total)
+
+                pending_futures.add(executor.submit(_convert_chunk, chunk, output_format))
+
+            while len(pending_futures) > 0:
+                done_futures, pending_futures = wait(pending_futures, return_when=FIRST_COMPLETED)
+                num_done += self._collect_results([future.result() for future in done_futures], result)
+
+                if progress_callback is not None:
+                    progress_callback(num_done + result['skipped'], num_total)
+
+        return result
+
+    def _chunks(self, input_files, output_format, overwrite, result):
+        """
+        Yields lists of tasks of at most chunk_size.
+        Each task is a tuple: (source description, input, output filepath str or None).
+        The input is a filepath str, or the bytes of a SYSEX message.
+        Skipped files are counted in result.
+        """
+        suffix = self.output_formats[output_format] if output_format is not None else None
+
+        def output_filepath_for(output_filepath):
+            # Returns the output filepath str, or None if the file
+            # should be skipped
+            if output_filepath is None:
+                return None
+
+            output_filepath = output_filepath.with_name(output_filepath.name + suffix)
+
+            if not overwrite and output_filepath.exists():
+                result['skipped'] += 1
+                return False
+
+            return str(output_filepath)
+
+        def tasks():
+            for input_filepath, output_filepath in input_files:
+                if input_filepath.suffix.lower() != '.syx':
+                    task_output_filepath = output_filepath_for(output_filepath)
+                    if task_output_filepath is not False:
+                        yield str(input_filepath), str(input_filepath), task_output_filepath
+
+                    continue
+
+                #
+                # Each message in a .syx file is a separate task.
+                # Files with more than one preset get a folder, as
+                # NymphesMIDI.load_syx_file() does. Other SYSEX
+                # messages in the file don't count.
+                #
+                try:
+                    with SyxFileReader(input_filepath) as reader:
+                        num_messages = reader.count()
+                        num_digits = len(str(num_messages))
+
+                        use_folder = output_filepath is not None and reader.count_presets(max_count=2) > 1
+
+                        if not use_folder:
+                            # Only one message can be written, to the same
+                            # filepath, so this is checked once
+                            single_output_filepath = output_filepath_for(output_filepath)
+                            if single_output_filepath is False:
+                                continue
+
+                        for i, sysex_data in enumerate(reader):
+                            if use_folder:
+                                task_output_filepath = output_filepath_for(
+                                    output_filepath / f'{output_filepath.name}_{str(i + 1).zfill(num_digits)}'
+                                )
+                            else:
+                                task_output_filepath = single_output_filepath
+
+                            if task_output_filepath is not False:
+                                yield f'{input_filepath} message {i + 1}', bytes(sysex_data), task_output_filepath
+
+                except Exception as e:
+                    # The failure was already recorded when counting the presets
+                    self.logger.debug(f'Failed to read {input_filepath} ({e})')
+
+        tasks_iterator = tasks()
+        while True:
+            chunk = list(itertools.islice(tasks_iterator, self._chunk_size))
+            if len(chunk) == 0:
+                return
+
+            yield chunk
+
+    @staticmethod
+    def _collect_results(chunk_results, result):
+        """
+        Add the results of finished chunks to result.
+        :param chunk_results: A list of values returned by _convert_chunk()
+        :return: int. The number of tasks in the chunks.
+        """
+        num_tasks = 0
+
+        for chunk_result in chunk_results:
+            for source, error in chunk_result:
+                num_tasks += 1
+
+                if error is None:
+                    result['converted'] += 1
+                else:
+                    result['failed'].append((source, error))
+
+        return num_tasks
+
+
+def _init_worker(codec_name):
+    # Use the same preset codec as the calling process
+    NymphesPreset.set_codec(codec_name)
+
+
+def _convert_chunk(chunk, output_format):
+    """
+    Convert a chunk of presets. This usually runs in a worker process.
+    :param chunk: A list of (source description, input, output filepath str or None) tuples
+    :param output_format: str. 'txt', 'nym' or 'syx', or None to only check that the presets load
+    :return: A list of (source description, error message str or None) tuples
+    """
+    results = []
+
+    for source, preset_input, output_filepath in chunk:
+        temp_filepath = None
+
+        try:
+            if isinstance(preset_input, bytes):
+                p = NymphesPreset(sysex_data=preset_input)
+            else:
+                p = NymphesPreset(filepath=preset_input)
+
+            if output_format is None:
+                results.append((source, None))
+                continue
+
+            output_filepath = Path(output_filepath)
+            temp_filepath = output_filepath.with_name(f'.{output_filepath.name}.tmp')
+
+            output_filepath.parent.mkdir(parents=True, exist_ok=True)
+
+            if output_format == 'syx':
+                sysex_data = p.generate_sysex_data('non-persistent', 'user', 'A', 1)
+                with open(temp_filepath, 'wb') as file:
+                    file.write(bytes([0xf0] + sysex_data + [0xf7]))
+
+            else:
+                p.save_preset_file(temp_filepath, file_format='v3.0.0' if output_format == 'nym' else 'v2.0.0')
+
+            # Replace the output file in one step
+            os.replace(temp_filepath, output_filepath)
+
+            results.append((source, None))
+
+        except Exception as e:
+            if temp_filepath is not None:
+                try:
+                    os.remove(temp_filepath)
+                except OSError:
+                    pass
+
+            results.append((source, str(e)))
+
+    return results
+
+
+def run_convert(args):
+    """
+    Convert preset files using command-line arguments added by add_convert_arguments().
+    :param args: argparse.Namespace
+    :return: int. The exit status: 0 if all presets were converted, 1 if any failed.
+    """
+    result = PresetConverter(max_workers=args.workers).convert(
+        args.input_paths,
+        args.output_directory,
+        args.format,
+        overwrite=args.overwrite,
+        progress_callback=_print_progress
+    )
+    print(file=sys.stderr)
+
+    for source, error in result['failed']:
+        print(f'Failed: {source}: {error}', file=sys.stderr)
+
+    print(f'Converted {result["converted"]}, skipped {result["skipped"]}, failed {len(result["failed"])}')
+
+    return 1 if len(result['failed']) > 0 else 0
+
+
+def _print_progress(num_done, num_total):
+    print(f'\r{num_done}/{num_total}', end='', file=sys.stderr, flush=True)
+
+
+def main(argv=None):
+    """
+    Convert preset files from the command line.
+    :param argv: A list of argument strs, or None to use sys.argv
+    :return: int. The exit status: 0 if all presets were converted, 1 if any failed.
+    """
+    parser = argparse.ArgumentParser(description='Convert Nymphes preset files between .txt, .nym and .syx')
+    add_convert_arguments(parser)
+
+    return run_convert(parser.parse_args(argv))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
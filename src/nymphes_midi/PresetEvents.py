@@ -21,6 +21,18 @@ class PresetEvents(Enum):
     saved_preset_dump_from_midi_input_port_to_preset = 'saved_preset_dump_from_midi_input_port_to_preset'
     loaded_preset_dump_from_midi_input_port = 'loaded_preset_dump_from_midi_input_port'
     unsaved_changes = 'unsaved_changes'
+    preset_replaced = 'preset_replaced'
+    syx_import_progress = 'syx_import_progress'
+    syx_import_finished = 'syx_import_finished'
+
+    # Preset Library
+    preset_library_refreshed = 'preset_library_refreshed'
+    preset_library_changed = 'preset_library_changed'
+
+    # Preset Conversion
+    preset_conversion_progress = 'preset_conversion_progress'
+    preset_conversion_failed = 'preset_conversion_failed'
+    preset_conversion_finished = 'preset_conversion_finished'
 
     @staticmethod
     def all_values():
@@ -43,5 +55,15 @@ class PresetEvents(Enum):
             PresetEvents.requested_preset_dump.value,
             PresetEvents.received_preset_dump_from_nymphes.value,
             PresetEvents.saved_preset_dump_from_midi_input_port_to_preset.value,
-            PresetEvents.unsaved_changes.value
+            PresetEvents.unsaved_changes.value,
+            PresetEvents.preset_replaced.value,
+            PresetEvents.syx_import_progress.value,
+            PresetEvents.syx_import_finished.value,
+
+            PresetEvents.preset_library_refreshed.value,
+            PresetEvents.preset_library_changed.value,
+
+            PresetEvents.preset_conversion_progress.value,
+            PresetEvents.preset_conversion_failed.value,
+            PresetEvents.preset_conversion_finished.value
         ]
@@ -0,0 +1,508 @@
+import logging
+import os
+import sqlite3
+import threading
+from array import array
+from pathlib import Path
+from nymphes_midi.NymphesPreset import NymphesPreset
+
+
+class PresetLibrary:
+    """
+    An index of the preset files in a presets directory, stored in an
+    SQLite database.
+    For each preset file we store its path (relative to the presets
+    directory), modification time, size, fingerprint and parameter values.
+    refresh() only parses files which are new or whose modification
+    time or size has changed, so listing and searching presets doesn't
+    require walking and parsing the whole directory.
+    All methods are thread-safe.
+    """
+
+    # Files with these suffixes are treated as preset files
+    preset_file_suffixes = ['.txt', '.nym']
+
+    # Increase this when the database layout changes.
+    # The index is rebuilt if it doesn't match.
+    _database_version = 2
+
+    def __init__(self, presets_directory_path, database_filepath):
+        """
+        Open (or create) the index database.
+        Raises an Exception if the database can't be opened.
+        :param presets_directory_path: Path or str. The directory to index
+        :param database_filepath: Path or str. The SQLite database file
+        """
+        # Get logger
+        self.logger = logging.getLogger('nymphes-osc.preset_library')
+
+        # Paths in the index are stored relative to this, and paths
+        # returned to callers are absolute, so they don't depend
+        # on the current working directory
+        self._presets_directory_path = Path(presets_directory_path).resolve()
+        self._database_filepath = Path(database_filepath)
+
+        # Used for all database access, as the connection is shared
+        # with the background refresh thread
+        self._lock = threading.Lock()
+
+        # The background refresh thread, if one has been started
+        self._refresh_thread = None
+
+        # Protects _refresh_running and _refresh_again, so a request made
+        # just as the background refresh thread finishes isn't lost
+        self._refresh_state_lock = threading.Lock()
+
+        # True from when a background refresh is started until its
+        # thread has decided to finish
+        self._refresh_running = False
+
+        # Set when a refresh is requested while the background
+        # refresh thread is running
+        self._refresh_again = False
+
+        # Increased each time the index changes, so users of the
+        # index can tell when it needs to be read again
+        self._change_count = 0
+
+        self._connection = sqlite3.connect(str(self._database_filepath), check_same_thread=False)
+        self._create_tables()
+
+    @property
+    def presets_directory_path(self):
+        return self._presets_directory_path
+
+    @property
+    def num_presets(self):
+        """
+        Returns the number of valid preset files in the index.
+        :return: int
+        """
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT COUNT(*) FROM presets WHERE fingerprint IS NOT NULL'
+            ).fetchone()
+
+        return row[0]
+
+    @property
+    def change_count(self):
+        """
+        Returns a number which increases each time presets are
+        added to, modified in or removed from the index.
+        :return: int
+        """
+        return self._change_count
+
+    @property
+    def refreshing(self):
+        """
+        Returns True if a background refresh is running.
+        :return: bool
+        """
+        return self._refresh_running
+
+    def refresh(self, executor=None):
+        """
+        Bring the index up to date with the presets directory.
+        Files that are new, or whose modification time or size have
+        changed, are parsed. Files that no longer exist are removed.
+        :param executor: Optional. A concurrent.futures Executor used to parse files in parallel.
+        :return: A tuple of ints: (num_added, num_updated, num_removed, num_failed).
+        Files which could not be parsed are counted in num_failed, and not in num_added or num_updated.
+        """
+        changes, failed_filepaths = self._apply_changes([self._presets_directory_path], executor=executor)
+
+        failed_filepaths = set(failed_filepaths)
+        change_types = [change_type for change_type, path in changes if path not in failed_filepaths]
+        num_added = change_types.count('added')
+        num_updated = change_types.count('modified')
+        num_removed = change_types.count('removed')
+        num_failed = len(failed_filepaths)
+
+        self.logger.info(f'Refreshed preset library ({num_added} added, {num_updated} updated, '
+                         f'{num_removed} removed, {num_failed} failed)')
+
+        return num_added, num_updated, num_removed, num_failed
+
+    def apply_changes(self, filepaths, executor=None):
+        """
+        Update the index for the supplied paths, which may be files or
+        directories that have been created, modified, moved or deleted.
+        Directories are handled recursively. Files are only parsed if
+        they are new or their modification time or size has changed.
+        All changes are written in one transaction.
+        :param filepaths: An iterable of absolute Paths or strs inside the presets directory
+        :param executor: Optional. A concurrent.futures Executor used to parse files in parallel.
+        :return: A list of tuples: (change_type, absolute path str).
+        change_type is 'added', 'modified' or 'removed'.
+        """
+        changes, failed_filepaths = self._apply_changes(filepaths, executor=executor)
+
+        return changes
+
+    def _apply_changes(self, filepaths, executor=None):
+        """
+        Does the work for apply_changes().
+        :return: A tuple: (list of changes as returned by apply_changes(),
+        list of absolute path strs of files which could not be parsed)
+        """
+        # Get the modification time and size of every file we have indexed
+        with self._lock:
+            indexed_files_dict = {
+                path: (mtime_ns, size) for path, mtime_ns, size in
+                self._connection.execute('SELECT path, mtime_ns, size FROM presets')
+            }
+
+        # Files to parse: (filepath, relative path, stat_result)
+        files_to_parse = []
+
+        # Relative paths of files to remove from the database
+        removed_paths = set()
+
+        changes = []
+
+        for filepath in filepaths:
+            filepath = Path(filepath)
+
+            try:
+                path = self._relative_path(filepath)
+            except ValueError:
+                # This isn't inside the presets directory
+                continue
+
+            if filepath.is_dir():
+                # Check all preset files in the directory, and remove
+                # indexed files in it that no longer exist
+                preset_filepaths = list(self._preset_filepaths(filepath))
+                found_paths = set(self._relative_path(preset_filepath) for preset_filepath in preset_filepaths)
+
+                prefix = '' if path == '.' else path + '/'
+                for indexed_path in indexed_files_dict:
+                    if indexed_path.startswith(prefix) and indexed_path not in found_paths:
+                        removed_paths.add(indexed_path)
+
+            elif filepath.is_file():
+                if filepath.suffix.lower() not in self.preset_file_suffixes:
+                    continue
+
+                preset_filepaths = [filepath]
+
+            else:
+                # The file or directory no longer exists
+                for indexed_path in indexed_files_dict:
+                    if indexed_path == path or indexed_path.startswith(path + '/'):
+                        removed_paths.add(indexed_path)
+
+                continue
+
+            for preset_filepath in preset_filepaths:
+                try:
+                    stat_result = preset_filepath.stat()
+                except OSError:
+                    # The file was removed while we were scanning
+                    continue
+
+                preset_path = self._relative_path(preset_filepath)
+
+                if indexed_files_dict.get(preset_path) == (stat_result.st_mtime_ns, stat_result.st_size):
+                    # The file hasn't changed
+                    continue
+
+                files_to_parse.append((preset_filepath, preset_path, stat_result))
+
+                changes.append((
+                    'modified' if preset_path in indexed_files_dict else 'added',
+                    str(preset_filepath)
+                ))
+
+                # Don't process the same file twice in this batch
+                indexed_files_dict[preset_path] = (stat_result.st_mtime_ns, stat_result.st_size)
+
+        for path in sorted(removed_paths):
+            changes.append(('removed', str(self._presets_directory_path / path)))
+
+        # Parse the files
+        filepath_strs = [str(filepath) for filepath, _, _ in files_to_parse]
+        if executor is not None:
+            parse_results = executor.map(_parse_preset_file, filepath_strs, chunksize=32)
+        else:
+            parse_results = map(_parse_preset_file, filepath_strs)
+
+        # Rows to write to the database
+        rows = []
+        failed_filepaths = []
+        for (filepath, path, stat_result), (fingerprint, param_values, error) in zip(files_to_parse, parse_results):
+            if error is not None:
+                self.logger.debug(f'Failed to index preset file {filepath} ({error})')
+                failed_filepaths.append(str(filepath))
+
+            rows.append((path, stat_result.st_mtime_ns, stat_result.st_size, fingerprint, param_values))
+
+        # Apply all changes in one transaction
+        with self._lock:
+            with self._connection:
+                self._connection.executemany(
+                    'INSERT OR REPLACE INTO presets (path, mtime_ns, size, fingerprint, param_values) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    rows
+                )
+                self._connection.executemany(
+                    'DELETE FROM presets WHERE path = ?',
+                    [(path,) for path in removed_paths]
+                )
+
+            if len(changes) > 0:
+                self._change_count += 1
+
+        return changes, failed_filepaths
+
+    def refresh_in_background(self, callback_function=None):
+        """
+        Run refresh() on a background thread.
+        If a background refresh is already running, then another
+        refresh is run when it has finished, so changes made
+        during the current refresh are not missed.
+        :param callback_function: Optional. Called on the background thread
+        with refresh()'s return value each time a refresh has finished.
+        :return: True if a new thread was started. False if a refresh was already running.
+        """
+        with self._refresh_state_lock:
+            if self._refresh_running:
+                self._refresh_again = True
+                return False
+
+            self._refresh_running = True
+            self._refresh_again = False
+
+        def _run():
+            while True:
+                try:
+                    result = self.refresh()
+
+                    if callback_function is not None:
+                        callback_function(result)
+
+                except Exception as e:
+                    self.logger.warning(f'Failed to refresh preset library ({e})')
+
+                # Finish, unless another refresh was requested meanwhile
+                with self._refresh_state_lock:
+                    if not self._refresh_again:
+                        self._refresh_running = False
+                        return
+
+                    self._refresh_again = False
+
+        self._refresh_thread = threading.Thread(target=_run, daemon=True)
+        self._refresh_thread.start()
+
+        return True
+
+    def list_presets(self, offset=0, limit=100, query=None):
+        """
+        Get a page of valid preset files in the index, sorted by path.
+        :param offset: int. The index of the first preset to return
+        :param limit: int. The maximum number of presets to return
+        :param query: str or None. If supplied, then only presets whose
+        paths contain this string (ignoring case) are included.
+        :return: A tuple: (total_count, list of (absolute path str, fingerprint str) tuples)
+        """
+        where_clause = 'WHERE fingerprint IS NOT NULL'
+        params = []
+
+        if query:
+            # Escape LIKE wildcards in the query
+            escaped_query = query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            where_clause += " AND path LIKE ? ESCAPE '\\'"
+            params.append(f'%{escaped_query}%')
+
+        with self._lock:
+            total_count = self._connection.execute(
+                f'SELECT COUNT(*) FROM presets {where_clause}',
+                params
+            ).fetchone()[0]
+
+            rows = self._connection.execute(
+                f'SELECT path, fingerprint FROM presets {where_clause} ORDER BY path LIMIT ? OFFSET ?',
+                params + [limit, offset]
+            ).fetchall()
+
+        return total_count, [(str(self._presets_directory_path / path), fingerprint) for path, fingerprint in rows]
+
+    def paths_for_fingerprint(self, fingerprint):
+        """
+        Get the absolute paths of all indexed preset files with the
+        supplied fingerprint.
+        :param fingerprint: str
+        :return: A list of strings
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT path FROM presets WHERE fingerprint = ? ORDER BY path',
+                (fingerprint,)
+            ).fetchall()
+
+        return [str(self._presets_directory_path / row[0]) for row in rows]
+
+    def fingerprints(self):
+        """
+        Get the path and fingerprint of every valid preset file in
+        the index, sorted by path.
+        :return: A list of (absolute path str, fingerprint str) tuples
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT path, fingerprint FROM presets WHERE fingerprint IS NOT NULL ORDER BY path'
+            ).fetchall()
+
+        return [(str(self._presets_directory_path / path), fingerprint) for path, fingerprint in rows]
+
+    def param_values_bytes(self, filepaths):
+        """
+        Get the indexed parameter values for several preset files, as
+        stored in the index: float32 values in NymphesPreset.all_param_names()
+        order, in native byte order.
+        :param filepaths: An iterable of Paths or strs. Absolute, or relative to the presets directory
+        :return: A dict. key: the filepath as supplied, value: bytes.
+        Files which are not in the index are left out.
+        """
+        paths_dict = {self._relative_path(filepath): filepath for filepath in filepaths}
+        paths = list(paths_dict)
+
+        values_dict = {}
+
+        with self._lock:
+            # SQLite limits the number of parameters in a query
+            for i in range(0, len(paths), 500):
+                chunk = paths[i:i + 500]
+                rows = self._connection.execute(
+                    f'SELECT path, param_values FROM presets '
+                    f'WHERE fingerprint IS NOT NULL AND path IN ({",".join("?" * len(chunk))})',
+                    chunk
+                ).fetchall()
+
+                for path, param_values in rows:
+                    values_dict[paths_dict[path]] = param_values
+
+        return values_dict
+
+    def param_values(self, filepath):
+        """
+        Get the indexed parameter values for a preset file.
+        Float parameters use the same 0 to 127 range as NymphesPreset.get_float().
+        :param filepath: Path or str. Absolute, or relative to the presets directory
+        :return: A dict with parameter names as keys, or None if the file
+        is not in the index.
+        """
+        path = self._relative_path(filepath)
+
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT param_values FROM presets WHERE path = ? AND fingerprint IS NOT NULL',
+                (path,)
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        values = array('f')
+        values.frombytes(row[0])
+
+        return dict(zip(NymphesPreset.all_param_names(), values))
+
+    def close(self):
+        """
+        Close the database. The library can't be used after this.
+        :return:
+        """
+        if self._refresh_thread is not None:
+            self._refresh_thread.join()
+
+        with self._lock:
+            self._connection.close()
+
+    def _create_tables(self):
+        with self._lock:
+            with self._connection:
+                self._connection.execute(
+                    'CREATE TABLE IF NOT EXISTS library_info (key TEXT PRIMARY KEY, value TEXT)'
+                )
+
+                # The stored parameter values depend on the database layout
+                # and the list of parameter names, so rebuild the index
+                # if either of these has changed
+                schema_string = f'{self._database_version}:' + ','.join(NymphesPreset.all_param_names())
+
+                row = self._connection.execute(
+                    "SELECT value FROM library_info WHERE key = 'schema'"
+                ).fetchone()
+
+                if row is None or row[0] != schema_string:
+                    self._connection.execute('DROP TABLE IF EXISTS presets')
+                    self._connection.execute(
+                        "INSERT OR REPLACE INTO library_info (key, value) VALUES ('schema', ?)",
+                        (schema_string,)
+                    )
+
+                # fingerprint and param_values are NULL for files that
+                # could not be parsed, so we don't keep trying to parse them
+                self._connection.execute(
+                    'CREATE TABLE IF NOT EXISTS presets ('
+                    'path TEXT PRIMARY KEY, '
+                    'mtime_ns INTEGER NOT NULL, '
+                    'size INTEGER NOT NULL, '
+                    'fingerprint TEXT, '
+                    'param_values BLOB)'
+                )
+                self._connection.execute(
+                    'CREATE INDEX IF NOT EXISTS presets_fingerprint ON presets (fingerprint)'
+                )
+
+    def _preset_filepaths(self, directory_path):
+        """
+        Yields the Path of every preset file in directory_path
+        and its subdirectories.
+        """
+        for directory_path, directory_names, filenames in os.walk(directory_path):
+            for filename in filenames:
+                if os.path.splitext(filename)[1].lower() in self.preset_file_suffixes:
+                    yield Path(directory_path) / filename
+
+    def _relative_path(self, filepath):
+        """
+        Returns filepath relative to the presets directory, as it
+        is stored in the database.
+        Raises a ValueError if filepath is not inside the presets directory.
+        :param filepath: Path or str. Absolute, or relative to the presets directory
+        :return: str
+        """
+        filepath = self._presets_directory_path / filepath
+
+        # Resolve the directory the file is in, so paths given relative to
+        # the current working directory or through a symlinked directory
+        # match the presets directory. The file itself isn't resolved, as
+        # a preset file may be a symlink to a file outside the directory.
+        if filepath != self._presets_directory_path:
+            filepath = filepath.parent.resolve() / filepath.name
+
+        return filepath.relative_to(self._presets_directory_path).as_posix()
+
+
+def _parse_preset_file(filepath):
+    """
+    Parse a preset file for the index.
+    This is a module-level function so it can run in a worker process.
+    :param filepath: str. The absolute path to the file
+    :return: A tuple: (fingerprint, param_values bytes, error message).
+    fingerprint and param_values are None if the file could not be parsed.
+    """
+    try:
+        p = NymphesPreset(filepath=filepath)
+
+    except Exception as e:
+        return None, None, str(e)
+
+    values = array('f', [p.get_value(param_name) for param_name in NymphesPreset.all_param_names()])
+
+    return p.fingerprint, values.tobytes(), None
@@ -0,0 +1,366 @@
+import ctypes
+import ctypes.util
+import logging
+import os
+import platform
+import select
+import struct
+import threading
+import time
+from pathlib import Path
+
+
+class _Inotify:
+    """
+    A minimal ctypes wrapper around the Linux inotify API.
+    Raises an Exception on creation if inotify is not available.
+    """
+
+    # Event masks (from sys/inotify.h)
+    IN_MODIFY = 0x00000002
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_MOVE_SELF = 0x00000800
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ONLYDIR = 0x01000000
+    IN_ISDIR = 0x40000000
+
+    # Flags for inotify_init1
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+
+    # struct inotify_event: int wd; uint32_t mask; uint32_t cookie; uint32_t len; char name[]
+    _event_header_struct = struct.Struct('iIII')
+
+    def __init__(self):
+        if platform.system() != 'Linux':
+            raise Exception('inotify is only available on Linux')
+
+        libc_name = ctypes.util.find_library('c') or 'libc.so.6'
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+
+        self._libc.inotify_init1.argtypes = [ctypes.c_int]
+        self._libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+
+        self.fd = self._libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), f'inotify_init1 failed: {os.strerror(ctypes.get_errno())}')
+
+    def add_watch(self, path, mask):
+        """
+        Watch the directory at path.
+        Raises an OSError if it fails.
+        :param path: Path or str
+        :param mask: int
+        :return: int. The watch descriptor
+        """
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(str(path)), mask)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f'inotify_add_watch failed for {path}: {os.strerror(ctypes.get_errno())}')
+
+        return wd
+
+    def read_events(self, timeout_sec):
+        """
+        Wait up to timeout_sec for events and return them.
+        :param timeout_sec: float
+        :return: A list of tuples: (wd, mask, cookie, name str)
+        """
+        readable, _, _ = select.select([self.fd], [], [], timeout_sec)
+        if not readable:
+            return []
+
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        events = []
+        pos = 0
+        while pos + self._event_header_struct.size <= len(data):
+            wd, mask, cookie, name_length = self._event_header_struct.unpack_from(data, pos)
+            pos += self._event_header_struct.size
+
+            # The name is padded with null bytes
+            name = os.fsdecode(data[pos:pos + name_length].rstrip(b'\0'))
+            pos += name_length
+
+            events.append((wd, mask, cookie, name))
+
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PresetLibraryWatcher:
+    """
+    Watches a PresetLibrary's presets directory and its subdirectories
+    on a background thread, applying changes to the library's index as
+    files are created, modified, moved and deleted.
+    On Linux, inotify is used. Elsewhere, or if inotify can't be used,
+    the directory is polled.
+    Changes are debounced, so a bulk copy of many files is applied to
+    the index in a few batched transactions.
+    """
+
+    # Events we watch for in each directory
+    _inotify_mask = (
+        _Inotify.IN_CLOSE_WRITE |
+        _Inotify.IN_MOVED_FROM |
+        _Inotify.IN_MOVED_TO |
+        _Inotify.IN_CREATE |
+        _Inotify.IN_DELETE |
+        _Inotify.IN_DELETE_SELF |
+        _Inotify.IN_ONLYDIR
+    )
+
+    def __init__(self, preset_library, changes_callback_function=None,
+                 debounce_sec=0.25, max_batch_delay_sec=2.0, poll_interval_sec=5.0):
+        """
+        :param preset_library: The PresetLibrary to keep up to date
+        :param changes_callback_function: Optional. Called on the watcher thread
+        with the list of (change_type, path) tuples returned by
+        PresetLibrary.apply_changes() after each batch is applied.
+        :param debounce_sec: Apply a batch once no events have arrived for this long
+        :param max_batch_delay_sec: Apply a batch once its first event is this old,
+        even if events are still arriving
+        :param poll_interval_sec: How often to scan the directory when polling
+        """
+        # Get logger
+        self.logger = logging.getLogger('nymphes-osc.preset_library')
+
+        self._preset_library = preset_library
+        self._changes_callback_function = changes_callback_function
+        self._debounce_sec = debounce_sec
+        self._max_batch_delay_sec = max_batch_delay_sec
+        self._poll_interval_sec = poll_interval_sec
+
+        self._thread = None
+        self._stop_event = threading.Event()
+
+        # Set by the background thread once it is watching the directory
+        self._started_event = threading.Event()
+
+        # Functions called with each list of changed paths,
+        # before they are applied to the index
+        self._changed_paths_callback_functions = []
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def add_changed_paths_callback(self, callback_function):
+        """
+        Register a function to be called on the watcher thread with a
+        list of absolute path strings each time a batch of changes is
+        detected, before the batch is applied to the index. The paths
+        may be files or directories. This can be used to invalidate
+        caches of parsed preset files.
+        :param callback_function: A function taking a list of strs
+        :return:
+        """
+        self._changed_paths_callback_functions.append(callback_function)
+
+    def start(self):
+        """
+        Start watching on a background thread.
+        Returns once the directory is being watched, so changes
+        made after this are not missed.
+        :return:
+        """
+        if self.running:
+            return
+
+        self._stop_event.clear()
+        self._started_event.clear()
+
+        try:
+            inotify = _Inotify()
+        except Exception as e:
+            self.logger.info(f'Using polling to watch the presets directory ({e})')
+            inotify = None
+
+        if inotify is not None:
+            self._thread = threading.Thread(target=self._run_inotify, args=(inotify,), daemon=True)
+        else:
+            self._thread = threading.Thread(target=self._run_polling, daemon=True)
+
+        self._thread.start()
+        self._started_event.wait()
+
+    def stop(self):
+        """
+        Stop watching, and wait for the background thread to finish.
+        :return:
+        """
+        self._stop_event.set()
+
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _apply_batch(self, changed_paths):
+        """
+        Apply a batch of changed paths to the index.
+        :param changed_paths: A set of absolute path strings
+        :return:
+        """
+        if len(changed_paths) == 0:
+            return
+
+        changed_paths = sorted(changed_paths)
+
+        for callback_function in self._changed_paths_callback_functions:
+            try:
+                callback_function(changed_paths)
+            except Exception as e:
+                self.logger.warning(f'Preset library changed paths callback failed ({e})')
+
+        try:
+            changes = self._preset_library.apply_changes(changed_paths)
+        except Exception as e:
+            self.logger.warning(f'Failed to apply changes to preset library ({e})')
+            return
+
+        self.logger.debug(f'Applied {len(changes)} changes to preset library')
+
+        if len(changes) > 0 and self._changes_callback_function is not None:
+            self._changes_callback_function(changes)
+
+    #
+    # inotify
+    #
+
+    def _run_inotify(self, inotify):
+        # key: watch descriptor, value: the directory's Path
+        watched_directories_dict = {}
+
+        def add_watches(directory_path):
+            # Watch directory_path and all of its subdirectories
+            for path, directory_names, filenames in os.walk(directory_path):
+                try:
+                    wd = inotify.add_watch(path, self._inotify_mask)
+                    watched_directories_dict[wd] = Path(path)
+                except OSError as e:
+                    self.logger.warning(f'Failed to watch {path} ({e})')
+
+        try:
+            add_watches(self._preset_library.presets_directory_path)
+        finally:
+            self._started_event.set()
+
+        # Changed paths waiting to be applied
+        changed_paths = set()
+        batch_start_timestamp = None
+        last_event_timestamp = None
+
+        try:
+            while not self._stop_event.is_set():
+                events = inotify.read_events(timeout_sec=min(self._debounce_sec, 0.5))
+
+                for wd, mask, cookie, name in events:
+                    if mask & _Inotify.IN_Q_OVERFLOW:
+                        # Some events were lost, so check everything
+                        self.logger.warning('inotify event queue overflowed. Rescanning the presets directory.')
+                        changed_paths.add(str(self._preset_library.presets_directory_path))
+                        continue
+
+                    directory_path = watched_directories_dict.get(wd)
+                    if directory_path is None:
+                        continue
+
+                    if mask & _Inotify.IN_IGNORED:
+                        # The watch was removed, because the directory was deleted
+                        del watched_directories_dict[wd]
+                        continue
+
+                    if mask & _Inotify.IN_DELETE_SELF:
+                        # The directory's parent gets its own event for this
+                        continue
+
+                    path = directory_path / name
+
+                    if mask & _Inotify.IN_ISDIR and mask & (_Inotify.IN_CREATE | _Inotify.IN_MOVED_TO):
+                        # Watch the new directory. Files may already have been
+                        # created in it, so it is checked when the batch is applied.
+                        add_watches(path)
+
+                    elif mask & _Inotify.IN_CREATE:
+                        # We wait for IN_CLOSE_WRITE before reading new files
+                        continue
+
+                    changed_paths.add(str(path))
+
+                if len(events) > 0:
+                    last_event_timestamp = time.time()
+                    if batch_start_timestamp is None:
+                        batch_start_timestamp = last_event_timestamp
+
+                # Apply the batch once events have stopped arriving, or if
+                # it has been waiting too long
+                if len(changed_paths) > 0 and (
+                        time.time() - last_event_timestamp >= self._debounce_sec or
+                        time.time() - batch_start_timestamp >= self._max_batch_delay_sec):
+
+                    self._apply_batch(changed_paths)
+                    changed_paths = set()
+                    batch_start_timestamp = None
+
+        finally:
+            inotify.close()
+
+    #
+    # Polling
+    #
+
+    def _run_polling(self):
+        # key: absolute path str, value: (mtime_ns, size)
+        try:
+            files_dict = self._scan()
+        finally:
+            self._started_event.set()
+
+        while not self._stop_event.wait(self._poll_interval_sec):
+            new_files_dict = self._scan()
+
+            changed_paths = set()
+            for path, file_info in new_files_dict.items():
+                if files_dict.get(path) != file_info:
+                    changed_paths.add(path)
+
+            for path in files_dict:
+                if path not in new_files_dict:
+                    changed_paths.add(path)
+
+            files_dict = new_files_dict
+
+            self._apply_batch(changed_paths)
+
+    def _scan(self):
+        """
+        Get the modification time and size of all preset files.
+        :return: A dict. key: absolute path str, value: (mtime_ns, size)
+        """
+        files_dict = {}
+
+        for directory_path, directory_names, filenames in os.walk(self._preset_library.presets_directory_path):
+            for filename in filenames:
+                if os.path.splitext(filename)[1].lower() not in self._preset_library.preset_file_suffixes:
+                    continue
+
+                path = os.path.join(directory_path, filename)
+                try:
+                    stat_result = os.stat(path)
+                except OSError:
+                    continue
+
+                files_dict[path] = (stat_result.st_mtime_ns, stat_result.st_size)
+
+        return files_dict
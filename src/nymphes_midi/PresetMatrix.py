@@ -0,0 +1,399 @@
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from nymphes_midi.NymphesPreset import NymphesPreset
+
+
+def _import_numpy():
+    """
+    Import numpy, which is an optional dependency.
+    Raises an Exception if it is not installed.
+    :return: The numpy module
+    """
+    try:
+        import numpy
+    except ImportError:
+        raise Exception('numpy is required for preset searches. Install it with: pip install nymphes-osc[matrix]')
+
+    return numpy
+
+
+class PresetMatrix:
+    """
+    The parameter values of every preset in a PresetLibrary, held as an
+    N x P float32 matrix (one row per preset file, one column per
+    parameter in NymphesPreset.all_param_names() order) so that range
+    filters and similarity searches are a few vectorized operations.
+    The matrix is saved as a .npy file and memory-mapped, with a JSON
+    sidecar file listing the path and fingerprint of each row. When the
+    library changes, only rows for new or modified presets are read
+    from the library's index, and the matrix is updated in memory. The
+    files are saved on a background thread once the library has stopped
+    changing for save_delay_sec, so editing presets doesn't rewrite them
+    each time. close() saves any changes that haven't been saved.
+    numpy is imported when the matrix is first used, so it is only
+    needed by applications that search presets.
+    All methods are thread-safe.
+    """
+
+    # Similarity metrics supported by nearest()
+    metrics = ['cosine', 'l2']
+
+    # How long to wait after the matrix changes before saving it
+    save_delay_sec = 5.0
+
+    def __init__(self, preset_library, matrix_filepath):
+        """
+        :param preset_library: The PresetLibrary to read preset values from
+        :param matrix_filepath: Path or str. The .npy file for the matrix.
+        The sidecar file is saved next to it, with a .json suffix.
+        """
+        # Get logger
+        self.logger = logging.getLogger('nymphes-osc.preset_library')
+
+        self._preset_library = preset_library
+        self._matrix_filepath = Path(matrix_filepath)
+        self._sidecar_filepath = self._matrix_filepath.with_suffix('.json')
+
+        self._lock = threading.Lock()
+
+        # The library's change_count when the matrix was last updated
+        self._library_change_count = None
+
+        # The matrix and the path and fingerprint of each of its rows
+        self._matrix = None
+        self._rows = []
+
+        # Each parameter is divided by its range before distances are
+        # calculated, so that parameters with large ranges don't dominate
+        self._param_scales = None
+
+        # The squared length of each scaled row
+        self._scaled_row_norms_squared = None
+
+        # Saves the matrix on a background thread once save_delay_sec
+        # has passed, or None if there are no changes to save
+        self._save_timer = None
+
+        # Held while the files are being written
+        self._save_lock = threading.Lock()
+
+    @property
+    def num_presets(self):
+        """
+        Returns the number of presets in the matrix, bringing it up to date first.
+        :return: int
+        """
+        with self._lock:
+            self._update()
+            return len(self._rows)
+
+    def update(self):
+        """
+        Bring the matrix up to date with the preset library.
+        This is also done automatically before each query.
+        :return:
+        """
+        with self._lock:
+            self._update()
+
+    def close(self):
+        """
+        Save the matrix now if it has changes that haven't been saved.
+        :return:
+        """
+        with self._lock:
+            if self._save_timer is None:
+                return
+
+            self._save_timer.cancel()
+            self._save_timer = None
+            matrix, rows = self._matrix, self._rows
+
+        self._save_files(matrix, rows)
+
+    def filter(self, ranges, limit=None):
+        """
+        Find the presets whose parameter values are all within the supplied ranges.
+        Float parameters use the same 0 to 127 range as NymphesPreset.get_float().
+        Raises an Exception if a parameter name is invalid.
+        :param ranges: A dict. key: parameter name. value: a tuple (min, max).
+        Either may be None, meaning no limit. The limits are inclusive.
+        :param limit: int or None. The maximum number of paths to return.
+        :return: A tuple: (total_count, list of absolute path strs sorted by path)
+        """
+        np = _import_numpy()
+
+        columns = []
+        for param_name, (min_value, max_value) in ranges.items():
+            if not NymphesPreset.is_param_name(param_name):
+                raise Exception(f'Invalid parameter name: {param_name}')
+
+            columns.append((self._param_index(param_name), min_value, max_value))
+
+        with self._lock:
+            self._update()
+
+            mask = np.ones(len(self._rows), dtype=bool)
+
+            for column, min_value, max_value in columns:
+                values = self._matrix[:, column]
+                if min_value is not None:
+                    mask &= values >= min_value
+                if max_value is not None:
+                    mask &= values <= max_value
+
+            indices = np.flatnonzero(mask)
+            rows = self._rows
+
+        total_count = len(indices)
+
+        if limit is not None:
+            indices = indices[:limit]
+
+        return total_count, [rows[i][0] for i in indices]
+
+    def nearest(self, preset_object, count=20, metric='cosine', exclude_fingerprint=None):
+        """
+        Find the presets most similar to preset_object.
+        Each parameter is scaled by its range, so all parameters
+        contribute equally.
+        :param preset_object: NymphesPreset
+        :param count: int. The maximum number of presets to return
+        :param metric: str. 'cosine' (1 - cosine similarity) or 'l2' (euclidean distance)
+        :param exclude_fingerprint: str or None. Presets with this fingerprint
+        are left out. Use preset_object.fingerprint to leave out identical presets.
+        :return: A list of (absolute path str, distance float) tuples, nearest first
+        """
+        np = _import_numpy()
+
+        if metric not in self.metrics:
+            raise Exception(f'Invalid metric: {metric} (should be one of {self.metrics})')
+
+        if not isinstance(count, int) or count < 1:
+            raise Exception(f'count should be an int of 1 or more: {count}')
+
+        values = np.array(
+            [preset_object.get_value(param_name) for param_name in NymphesPreset.all_param_names()],
+            dtype=np.float32
+        )
+
+        with self._lock:
+            self._update()
+
+            if len(self._rows) == 0:
+                return []
+
+            scaled_values = values * self._param_scales
+            weights = scaled_values * self._param_scales
+
+            # Dot products of the scaled rows with the scaled values
+            dots = self._matrix @ weights
+
+            if metric == 'cosine':
+                norms = np.sqrt(self._scaled_row_norms_squared) * np.sqrt(scaled_values @ scaled_values)
+                distances = 1.0 - dots / np.maximum(norms, 1e-12)
+            else:
+                distances = np.sqrt(np.maximum(
+                    self._scaled_row_norms_squared - 2.0 * dots + scaled_values @ scaled_values,
+                    0.0
+                ))
+
+            rows = self._rows
+
+        if exclude_fingerprint is not None:
+            excluded = np.array([fingerprint == exclude_fingerprint for path, fingerprint in rows], dtype=bool)
+            distances = np.where(excluded, np.inf, distances)
+
+        # Find the nearest rows without sorting the whole array
+        count = min(count, len(rows))
+        indices = np.argpartition(distances, count - 1)[:count]
+        indices = indices[np.argsort(distances[indices], kind='stable')]
+
+        return [(rows[i][0], float(distances[i])) for i in indices if np.isfinite(distances[i])]
+
+    def _update(self):
+        """
+        Bring the matrix up to date with the preset library.
+        Must be called with self._lock held.
+        :return:
+        """
+        np = _import_numpy()
+
+        change_count = self._preset_library.change_count
+        if self._matrix is not None and change_count == self._library_change_count:
+            return
+
+        rows = self._preset_library.fingerprints()
+        param_names = NymphesPreset.all_param_names()
+
+        if self._matrix is None:
+            # Try using the matrix saved last time
+            self._load_files(np, param_names)
+
+        if self._matrix is None or rows != self._rows:
+            self._build(np, rows, param_names)
+
+        self._library_change_count = change_count
+
+    def _load_files(self, np, param_names):
+        """
+        Load the saved matrix and sidecar files, if they exist and
+        match the current parameter names.
+        :return:
+        """
+        try:
+            with open(self._sidecar_filepath, 'r') as file:
+                sidecar = json.load(file)
+
+            if sidecar['param_names'] != param_names:
+                return
+
+            rows = [tuple(row) for row in sidecar['rows']]
+
+            if len(rows) == 0:
+                matrix = np.zeros((0, len(param_names)), dtype=np.float32)
+            else:
+                matrix = np.load(self._matrix_filepath, mmap_mode='r')
+
+            if matrix.shape != (len(rows), len(param_names)) or matrix.dtype != np.float32:
+                return
+
+        except Exception as e:
+            self.logger.debug(f'Not using saved preset matrix ({e})')
+            return
+
+        self._set_matrix(np, matrix, rows)
+
+    def _build(self, np, rows, param_names):
+        """
+        Build a new matrix for rows in memory, reusing the values of rows
+        that haven't changed, and schedule saving it.
+        :param rows: A list of (absolute path str, fingerprint str) tuples
+        :return:
+        """
+        # key: (path, fingerprint) value: index of the row in the current matrix
+        existing_rows_dict = {row: i for i, row in enumerate(self._rows)} if self._matrix is not None else {}
+
+        matrix = np.empty((len(rows), len(param_names)), dtype=np.float32)
+        norms_squared = np.empty(len(rows), dtype=np.float32)
+
+        new_row_indices = []
+        existing_row_indices = []
+        existing_matrix_indices = []
+        for i, row in enumerate(rows):
+            existing_index = existing_rows_dict.get(row)
+            if existing_index is not None:
+                existing_row_indices.append(i)
+                existing_matrix_indices.append(existing_index)
+            else:
+                new_row_indices.append(i)
+
+        if len(existing_row_indices) > 0:
+            matrix[existing_row_indices] = self._matrix[existing_matrix_indices]
+            norms_squared[existing_row_indices] = self._scaled_row_norms_squared[existing_matrix_indices]
+
+        values_dict = self._preset_library.param_values_bytes([rows[i][0] for i in new_row_indices])
+
+        # Rows which were removed from the library while we were reading it
+        missing_row_indices = []
+
+        for i in new_row_indices:
+            values_bytes = values_dict.get(rows[i][0])
+            if values_bytes is None:
+                missing_row_indices.append(i)
+            else:
+                matrix[i] = np.frombuffer(values_bytes, dtype=np.float32)
+
+        self._set_param_scales(np)
+
+        if len(new_row_indices) > 0:
+            norms_squared[new_row_indices] = (matrix[new_row_indices] ** 2) @ (self._param_scales ** 2)
+
+        if len(missing_row_indices) > 0:
+            matrix = np.delete(matrix, missing_row_indices, axis=0)
+            norms_squared = np.delete(norms_squared, missing_row_indices)
+            missing_row_indices = set(missing_row_indices)
+            rows = [row for i, row in enumerate(rows) if i not in missing_row_indices]
+
+        self.logger.info(f'Updated preset matrix ({len(rows)} presets, {len(new_row_indices)} read from the library)')
+
+        self._matrix = matrix
+        self._rows = rows
+        self._scaled_row_norms_squared = norms_squared
+
+        # Save the files once the library has stopped changing
+        if self._save_timer is not None:
+            self._save_timer.cancel()
+
+        self._save_timer = threading.Timer(self.save_delay_sec, self._on_save_timer)
+        self._save_timer.daemon = True
+        self._save_timer.start()
+
+    def _on_save_timer(self):
+        """
+        Called on the save timer's thread.
+        :return:
+        """
+        with self._lock:
+            if self._save_timer is None or threading.current_thread() is not self._save_timer:
+                # The matrix changed again, so a newer timer will save it
+                return
+
+            self._save_timer = None
+            matrix, rows = self._matrix, self._rows
+
+        self._save_files(matrix, rows)
+
+    def _save_files(self, matrix, rows):
+        """
+        Save the matrix and sidecar, replacing the old files only once
+        the new ones have been written. Must be called without self._lock
+        held. matrix must not be changed while it is being saved.
+        :param matrix: The matrix
+        :param rows: A list of (absolute path str, fingerprint str) tuples
+        :return:
+        """
+        np = _import_numpy()
+
+        with self._save_lock:
+            try:
+                if len(rows) > 0:
+                    temp_filepath = self._matrix_filepath.with_name(self._matrix_filepath.name + '.tmp')
+                    with open(temp_filepath, 'wb') as file:
+                        np.save(file, matrix)
+                    os.replace(temp_filepath, self._matrix_filepath)
+
+                temp_filepath = self._sidecar_filepath.with_name(self._sidecar_filepath.name + '.tmp')
+                with open(temp_filepath, 'w') as file:
+                    json.dump({'param_names': NymphesPreset.all_param_names(), 'rows': rows}, file)
+                os.replace(temp_filepath, self._sidecar_filepath)
+
+                self.logger.debug(f'Saved preset matrix ({len(rows)} presets)')
+
+            except Exception as e:
+                # We can still use the matrix in memory
+                self.logger.warning(f'Failed to save preset matrix ({e})')
+
+    def _set_matrix(self, np, matrix, rows):
+        self._matrix = matrix
+        self._rows = rows
+
+        self._set_param_scales(np)
+
+        self._scaled_row_norms_squared = (np.asarray(matrix) ** 2) @ (self._param_scales ** 2)
+
+    def _set_param_scales(self, np):
+        if self._param_scales is None:
+            param_names = NymphesPreset.all_param_names()
+            self._param_scales = np.array(
+                [1.0 / (NymphesPreset.max_val_for_param_name(param_name) - NymphesPreset.min_val_for_param_name(param_name))
+                 for param_name in param_names],
+                dtype=np.float32
+            )
+
+    @staticmethod
+    def _param_index(param_name):
+        return NymphesPreset.all_param_names().index(param_name)
@@ -0,0 +1,154 @@
+import threading
+import time
+from bisect import bisect_left
+
+
+class PresetSnapshotScheduler:
+    """
+    Decides when to send a snapshot of the current preset to Nymphes
+    after its parameters have changed.
+    - The first change after a quiet period is sent on the next call to
+      take_due() (leading edge).
+    - While changes keep arriving, snapshots are sent at most once every
+      min_interval_sec, and not while the previous SYSEX snapshot is
+      still waiting to be sent, so the rate adapts to how fast the MIDI
+      link drains instead of building up a backlog.
+    - A change made after the last snapshot is always sent once the
+      gesture stops (trailing edge). This includes changes made while a
+      snapshot is being sent.
+    - Changes requested with settle=True have already been sent some
+      other way (ie: as an approximate MIDI CC), so their snapshot waits
+      until there have been no changes for settle_sec.
+    request() may be called from any thread. take_due() and cancel()
+    should be called from the thread which sends the snapshots.
+    """
+
+    # Upper limits of the latency histogram's buckets, in milliseconds.
+    # The last bucket counts everything slower.
+    latency_bucket_limits_ms = (5, 10, 25, 50, 100, 250)
+
+    def __init__(self, min_interval_sec=0.1, settle_sec=0.15):
+        """
+        :param min_interval_sec: float. The minimum time between snapshots during a gesture.
+        :param settle_sec: float. How long to wait after the last settle=True request.
+        """
+        if min_interval_sec < 0:
+            raise Exception(f'min_interval_sec should be 0 or more: {min_interval_sec}')
+
+        if settle_sec < 0:
+            raise Exception(f'settle_sec should be 0 or more: {settle_sec}')
+
+        self.min_interval_sec = min_interval_sec
+        self.settle_sec = settle_sec
+
+        # Protects the request timestamps
+        self._lock = threading.Lock()
+
+        # When the first change which hasn't been sent yet was requested,
+        # or None if there are no changes to send
+        self._first_request_timestamp = None
+
+        # When the last change which hasn't been sent yet was requested
+        self._last_request_timestamp = None
+
+        # True if any change which hasn't been sent yet was requested
+        # without settle=True
+        self._immediate = False
+
+        # When the last snapshot was sent, or None if none has been sent
+        self._last_snapshot_timestamp = None
+
+        # Counters, for stats
+        self.snapshot_count = 0
+        self._latency_bucket_counts = [0] * (len(self.latency_bucket_limits_ms) + 1)
+
+    @property
+    def pending(self):
+        return self._first_request_timestamp is not None
+
+    def request(self, settle=False):
+        """
+        Record that the current preset has changed and a snapshot should be sent.
+        :param settle: bool. If True, then wait until the changes have settled.
+        :return:
+        """
+        now = time.monotonic()
+
+        with self._lock:
+            if self._first_request_timestamp is None:
+                self._first_request_timestamp = now
+
+            self._last_request_timestamp = now
+
+            if not settle:
+                self._immediate = True
+
+    def cancel(self):
+        """
+        Forget any changes which haven't been sent, ie: because Nymphes is not connected.
+        :return:
+        """
+        with self._lock:
+            self._first_request_timestamp = None
+            self._last_request_timestamp = None
+            self._immediate = False
+
+    def take_due(self, link_busy=False):
+        """
+        Check whether a snapshot should be sent now. If it should, the
+        pending changes are cleared and counted as sent, and the caller
+        must send the snapshot.
+        :param link_busy: bool. True if the previous snapshot is still waiting to be sent.
+        :return: bool. True if a snapshot should be sent now.
+        """
+        if self._first_request_timestamp is None or link_busy:
+            return False
+
+        now = time.monotonic()
+
+        if self._last_snapshot_timestamp is not None and \
+                now - self._last_snapshot_timestamp < self.min_interval_sec:
+            return False
+
+        # Clear the request before the snapshot is sent, so a change made
+        # while it is being sent causes another snapshot
+        with self._lock:
+            if self._immediate:
+                # The time since the first change
+                due_timestamp = self._first_request_timestamp
+
+            else:
+                # The time since the changes settled
+                due_timestamp = self._last_request_timestamp + self.settle_sec
+                if now < due_timestamp:
+                    return False
+
+            self._first_request_timestamp = None
+            self._last_request_timestamp = None
+            self._immediate = False
+
+        self._last_snapshot_timestamp = now
+        self.snapshot_count += 1
+
+        latency_ms = (now - due_timestamp) * 1000
+        self._latency_bucket_counts[bisect_left(self.latency_bucket_limits_ms, latency_ms)] += 1
+
+        return True
+
+    @property
+    def stats(self):
+        """
+        Returns the number of snapshots sent, and a histogram of how long
+        it took from the first change to its snapshot being sent. For
+        settle=True changes this is timed from when they settled.
+        :return: dict. Keys are strings and values are ints.
+        """
+        stats = {'preset_snapshots_sent': self.snapshot_count}
+
+        for limit_ms, count in zip(self.latency_bucket_limits_ms, self._latency_bucket_counts):
+            stats[f'preset_snapshot_latency_up_to_{limit_ms}ms'] = count
+
+        stats[f'preset_snapshot_latency_over_{self.latency_bucket_limits_ms[-1]}ms'] = \
+            self._latency_bucket_counts[-1]
+
+        return stats
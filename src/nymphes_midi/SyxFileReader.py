@@ -0,0 +1,158 @@
+import mmap
+import os
+
+
+class SyxFileReader:
+    """
+    Reads the SYSEX messages in a .syx file one at a time.
+    Binary .syx files are memory-mapped and scanned for F0 ... F7
+    frames, so the whole file is never read into memory and memory use
+    doesn't depend on the size of the file.
+    Text .syx files (hex digits, as written by some editors) are rare
+    and small, so they are read with mido.read_syx_file().
+    Use it as a context manager:
+
+        with SyxFileReader(filepath) as reader:
+            for data in reader:
+                ...
+    """
+
+    _sysex_start_byte = 0xf0
+    _sysex_end_byte = 0xf7
+
+    def __init__(self, filepath):
+        """
+        :param filepath: A Path or string. The path to the .syx file.
+        """
+        self._filepath = filepath
+        self._file = None
+        self._mmap = None
+
+        # The data of each message, if this is a text .syx file
+        self._text_messages_data = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def open(self):
+        """
+        Open the file.
+        Raises an Exception if it can't be opened.
+        :return:
+        """
+        self._file = open(self._filepath, 'rb')
+
+        if os.fstat(self._file.fileno()).st_size == 0:
+            # Empty files can't be memory-mapped
+            self._text_messages_data = []
+            return
+
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        # Text files start with a hex digit. Anything else is scanned
+        # as a binary file, so bytes before the first SYSEX message
+        # are skipped.
+        first_byte_pos = 0
+        while first_byte_pos < len(self._mmap) and self._mmap[first_byte_pos] in b' \t\r\n':
+            first_byte_pos += 1
+
+        if first_byte_pos < len(self._mmap) and self._mmap[first_byte_pos] in b'0123456789abcdefABCDEF':
+            # mido is only imported when it is needed, as importing it is slow
+            import mido
+
+            self._text_messages_data = [
+                bytes(msg.data) for msg in mido.read_syx_file(self._filepath) if msg.type == 'sysex'
+            ]
+
+    def close(self):
+        """
+        Close the file.
+        :return:
+        """
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def count(self):
+        """
+        Count the SYSEX messages in the file without decoding them.
+        :return: int
+        """
+        if self._text_messages_data is not None:
+            return len(self._text_messages_data)
+
+        return sum(1 for _ in self._frame_positions())
+
+    def count_presets(self, max_count=None):
+        """
+        Count the SYSEX messages in the file which decode as Nymphes
+        presets. Other SYSEX messages are not counted.
+        A .syx file is written to a single preset file if this is 1, and
+        to a folder of preset files if it is more, so NymphesMIDI and
+        PresetConverter use this to decide.
+        :param max_count: int or None. If supplied, then stop decoding
+        once this many presets have been found.
+        :return: int
+        """
+        # NymphesPreset is only imported when it is needed, as importing it is slow
+        from nymphes_midi.NymphesPreset import NymphesPreset
+
+        num_presets = 0
+
+        for data in self:
+            try:
+                NymphesPreset(sysex_data=data)
+            except Exception:
+                continue
+
+            num_presets += 1
+            if max_count is not None and num_presets >= max_count:
+                break
+
+        return num_presets
+
+    def __iter__(self):
+        """
+        Yields the data of each SYSEX message in the file as bytes,
+        without the start and end bytes.
+        """
+        if self._text_messages_data is not None:
+            yield from self._text_messages_data
+            return
+
+        for start_pos, end_pos in self._frame_positions():
+            yield self._mmap[start_pos + 1:end_pos]
+
+    def _frame_positions(self):
+        """
+        Yields (start_pos, end_pos) for each complete F0 ... F7 frame
+        in the memory-mapped file. Bytes outside frames are skipped.
+        """
+        pos = 0
+        while True:
+            start_pos = self._mmap.find(b'\xf0', pos)
+            if start_pos == -1:
+                return
+
+            end_pos = self._mmap.find(b'\xf7', start_pos + 1)
+            if end_pos == -1:
+                # The last frame is incomplete
+                return
+
+            # If another frame starts before this one ends, then this
+            # one was truncated. Skip to the next one.
+            next_start_pos = self._mmap.find(b'\xf0', start_pos + 1, end_pos)
+            if next_start_pos != -1:
+                pos = next_start_pos
+                continue
+
+            yield start_pos, end_pos
+            pos = end_pos + 1
@@ -0,0 +1,46 @@
+# The command-line arguments for converting preset files.
+# These are kept out of PresetConverter so building the command-line
+# parser doesn't import PresetConverter and NymphesPreset, which is slow.
+
+
+# The formats that preset files can be converted to.
+# These are the keys of PresetConverter.output_formats.
+convert_output_formats = ['txt', 'nym', 'syx']
+
+
+def add_convert_arguments(parser):
+    """
+    Add the command-line arguments for converting preset files to parser.
+    :param parser: argparse.ArgumentParser
+    :return:
+    """
+    parser.add_argument(
+        'input_paths',
+        nargs='+',
+        help='Preset files, .syx files or directories to convert'
+    )
+
+    parser.add_argument(
+        '--output_directory',
+        required=True,
+        help='The directory to write converted files to'
+    )
+
+    parser.add_argument(
+        '--format',
+        required=True,
+        choices=convert_output_formats,
+        help='The format to convert to'
+    )
+
+    parser.add_argument(
+        '--overwrite',
+        action='store_true',
+        help='Optional. Overwrite files that already exist. Otherwise they are skipped.'
+    )
+
+    parser.add_argument(
+        '--workers',
+        type=int,
+        help='Optional. The number of worker processes. Defaults to the number of CPUs.'
+    )
@@ -1,6 +1,6 @@
 import threading
 import socket
-from zeroconf import ServiceInfo, Zeroconf
+import time
 from pythonosc.udp_client import SimpleUDPClient
 from pythonosc.dispatcher import Dispatcher
 from pythonosc.osc_server import BlockingOSCUDPServer
@@ -9,69 +9,15 @@ from nymphes_midi.NymphesMIDI import NymphesMIDI
 from nymphes_midi.NymphesPreset import NymphesPreset
 from nymphes_midi.PresetEvents import PresetEvents
 from nymphes_midi.MidiConnectionEvents import MidiConnectionEvents
-from nymphes_osc.file_locations import get_data_files_directory_path
-import netifaces
+from nymphes_osc.logging_config import configure_logging
+from nymphes_osc.osc_addresses import osc_address_from_parameter_name, parameter_name_from_osc_address
+from nymphes_osc.performance_control_stage import PerformanceControlStage
 import logging
-from logging.handlers import RotatingFileHandler
 from pathlib import Path
 import os
 import platform
 
 
-#
-# Logging
-#
-
-logger = logging.getLogger('nymphes-osc')
-logger.setLevel(logging.DEBUG)
-
-log_formatter = logging.Formatter(
-    '%(asctime)s.%(msecs)03d - %(name)s - %(levelname)s - %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-)
-
-# Logging to console
-#
-console_handler = logging.StreamHandler()
-console_handler.setFormatter(log_formatter)
-logger.addHandler(console_handler)
-
-#
-# Logging to a file
-#
-
-# Create data files directory if necessary
-data_files_directory_path = get_data_files_directory_path()
-if not data_files_directory_path.exists():
-    try:
-        data_files_directory_path.mkdir()
-        logger.info(f'Created data files directory at {data_files_directory_path}')
-
-    except Exception as e:
-        logger.critical(f'Failed to create data files directory at {data_files_directory_path}: {e}')
-
-# Create logs directory if necessary
-logs_directory_path = data_files_directory_path / 'logs'
-if not logs_directory_path.exists():
-    try:
-        logs_directory_path.mkdir()
-        logger.info(f'Created logs directory at {logs_directory_path}')
-
-    except Exception as e:
-        logger.critical(f'Failed to create data files directory at {logs_directory_path}: {e}')
-
-file_handler = logging.FileHandler(logs_directory_path / 'log.txt', mode='w')
-file_handler.setFormatter(log_formatter)
-logger.addHandler(file_handler)
-
-
-def osc_address_from_parameter_name(parameter_name):
-    return f"/{parameter_name.replace('.', '/')}"
-
-def parameter_name_from_osc_address(osc_address):
-    return osc_address[1:].replace('/', '.')
-
-
 class NymphesOSC:
     """
     An OSC server that uses NymphesMidi to handle MIDI communication with
@@ -80,6 +26,23 @@ class NymphesOSC:
     MIDI-controllable functionality.
     """
 
+    # The maximum number of presets sent in one /preset_list message,
+    # to keep it within the size of a UDP datagram
+    max_presets_per_list = 100
+
+    # Parameter and performance control messages from clients are
+    # counted rather than logged one at a time, and a summary is
+    # logged at this interval. Each message is still logged at DEBUG.
+    traffic_summary_interval_sec = 5.0
+
+    # While a client is touching a parameter's control, the values it
+    # sends are passed on to other clients at most this often
+    touch_echo_interval_sec = 0.1
+
+    # A touch ends by itself if the client sends nothing for the
+    # parameter for this long, in case /touch/... 0 was lost
+    touch_timeout_sec = 10.0
+
     def __init__(
             self,
             nymphes_midi_channel=1,
@@ -91,9 +54,18 @@ class NymphesOSC:
             mdns_name=None,
             osc_log_level=logging.DEBUG,
             midi_log_level=logging.DEBUG,
-            presets_directory_path=None
+            presets_directory_path=None,
+            preset_cache_capacity=32,
+            midi_output_bytes_per_sec=10000,
+            preset_snapshot_min_interval_sec=0.1,
+            hybrid_float_params=False,
+            performance_control_max_rate_hz=200
     ):
 
+        # Set up console and file logging, if the application
+        # hasn't already done so
+        configure_logging()
+
         # Get logger
         self.logger = logging.getLogger('nymphes-osc.nymphes_osc')
         self.logger.setLevel(osc_log_level)
@@ -108,12 +80,21 @@ class NymphesOSC:
         self.logger.info(f'nymphes_osc_log_level: {osc_log_level}')
         self.logger.info(f'nymphes_midi_log_level: {midi_log_level}')
         self.logger.info(f'presets_directory_path: {presets_directory_path}')
+        self.logger.info(f'preset_cache_capacity: {preset_cache_capacity}')
+        self.logger.info(f'midi_output_bytes_per_sec: {midi_output_bytes_per_sec}')
+        self.logger.info(f'preset_snapshot_min_interval_sec: {preset_snapshot_min_interval_sec}')
+        self.logger.info(f'hybrid_float_params: {hybrid_float_params}')
+        self.logger.info(f'performance_control_max_rate_hz: {performance_control_max_rate_hz}')
 
         # Create NymphesMidi object
         self._nymphes_midi = NymphesMIDI(
             notification_callback_function=self._on_nymphes_notification,
             log_level=midi_log_level,
-            presets_directory_path=presets_directory_path
+            presets_directory_path=presets_directory_path,
+            preset_cache_capacity=preset_cache_capacity,
+            midi_output_bytes_per_sec=midi_output_bytes_per_sec,
+            preset_snapshot_min_interval_sec=preset_snapshot_min_interval_sec,
+            hybrid_float_params=hybrid_float_params
         )
 
         # The MIDI channel Nymphes is set to use.
@@ -157,6 +138,35 @@ class NymphesOSC:
         # value: The osc client object the client
         self._osc_clients_dict = {}
 
+        # Clients which have subscribed to /preset_library_changed messages
+        # A set of tuples: (str(hostname), int(port))
+        self._preset_library_subscribers = set()
+
+        # The number of parameter and performance control messages received
+        # for each OSC address since the last traffic summary was logged.
+        # They are counted on the OSC server thread and logged by update().
+        self._traffic_counts = {}
+        self._traffic_counts_lock = threading.Lock()
+        self._traffic_summary_last_timestamp = time.time()
+
+        # Parameters whose controls are being touched by clients.
+        # They are changed on the OSC server thread and checked by update().
+        # key: param name, value: a dict with these keys:
+        #   'host': str. The host of the client touching the control
+        #   'last_activity_timestamp': float
+        #   'last_echo_timestamp': float
+        #   'pending_value': The latest value not yet sent to other clients, or None
+        self._touches_dict = {}
+        self._touches_lock = threading.Lock()
+
+        # Quantizes, de-duplicates and rate-limits mod wheel, aftertouch
+        # and sustain pedal values from clients before they are sent
+        self._performance_control_stage = PerformanceControlStage(
+            send_function=self._send_performance_control,
+            max_values_dict={'mod_wheel': 127, 'aftertouch': 127, 'sustain_pedal': 1},
+            max_rate_hz=performance_control_max_rate_hz
+        )
+
         # Register for non-Control Parameter OSC messages
         #
         self._dispatcher.map(
@@ -219,6 +229,31 @@ class NymphesOSC:
             self._on_osc_message_request_preset_dump,
             needs_reply_address=True
         )
+        self._dispatcher.map(
+            '/list_presets',
+            self._on_osc_message_list_presets,
+            needs_reply_address=True
+        )
+        self._dispatcher.map(
+            '/refresh_preset_library',
+            self._on_osc_message_refresh_preset_library,
+            needs_reply_address=True
+        )
+        self._dispatcher.map(
+            '/request_all_params',
+            self._on_osc_message_request_all_params,
+            needs_reply_address=True
+        )
+        self._dispatcher.map(
+            '/request_preset_fingerprint',
+            self._on_osc_message_request_preset_fingerprint,
+            needs_reply_address=True
+        )
+        self._dispatcher.map(
+            '/request_stats',
+            self._on_osc_message_request_stats,
+            needs_reply_address=True
+        )
         self._dispatcher.map(
             '/connect_nymphes',
             self._on_osc_message_connect_nymphes,
@@ -249,6 +284,16 @@ class NymphesOSC:
             self._on_osc_message_disable_midi_feedback_suppression,
             needs_reply_address=True
         )
+        self._dispatcher.map(
+            '/enable_hybrid_float_params',
+            self._on_osc_message_enable_hybrid_float_params,
+            needs_reply_address=True
+        )
+        self._dispatcher.map(
+            '/disable_hybrid_float_params',
+            self._on_osc_message_disable_hybrid_float_params,
+            needs_reply_address=True
+        )
         self._dispatcher.map(
             '/connect_midi_output',
             self._on_osc_message_connect_midi_output,
@@ -264,6 +309,31 @@ class NymphesOSC:
             self._on_osc_message_set_nymphes_midi_channel,
             needs_reply_address=True
         )
+        self._dispatcher.map(
+            '/convert_presets',
+            self._on_osc_message_convert_presets,
+            needs_reply_address=True
+        )
+        self._dispatcher.map(
+            '/find_presets',
+            self._on_osc_message_find_presets,
+            needs_reply_address=True
+        )
+        self._dispatcher.map(
+            '/find_similar_presets',
+            self._on_osc_message_find_similar_presets,
+            needs_reply_address=True
+        )
+        self._dispatcher.map(
+            '/subscribe_preset_library_changes',
+            self._on_osc_message_subscribe_preset_library_changes,
+            needs_reply_address=True
+        )
+        self._dispatcher.map(
+            '/unsubscribe_preset_library_changes',
+            self._on_osc_message_unsubscribe_preset_library_changes,
+            needs_reply_address=True
+        )
         self._dispatcher.map(
             '/mod_wheel',
             self._on_osc_message_mod_wheel,
@@ -298,6 +368,14 @@ class NymphesOSC:
         """
         self._nymphes_midi.update()
 
+        self._performance_control_stage.flush()
+
+        if self._touches_dict:
+            self._update_touches()
+
+        if time.time() - self._traffic_summary_last_timestamp >= self.traffic_summary_interval_sec:
+            self._log_traffic_summary()
+
     def register_osc_client(self, host, port):
         """
         Add a new client to send OSC messages to.
@@ -436,6 +514,9 @@ class NymphesOSC:
             # been removed
             osc_client = self._osc_clients_dict.pop((ip_address_string, port))
 
+            # It no longer receives preset library changes
+            self._preset_library_subscribers.discard((ip_address_string, port))
+
             # Send osc notification to the client that has been removed
             msg = OscMessageBuilder(address='/client_unregistered')
             msg.add_arg(ip_address_string)
@@ -465,8 +546,12 @@ class NymphesOSC:
 
         if self._use_mdns and self._mdns_name is not None:
             try:
-                # Advertise OSC Server on the network using mDNS
+                # Advertise OSC Server on the network using mDNS.
+                # zeroconf is slow to import, so it is only imported
+                # when mDNS is used.
                 #
+                from zeroconf import ServiceInfo, Zeroconf
+
                 self._mdns_service_info = ServiceInfo(
                     type_="_osc._udp.local.",
                     name=f"{self._mdns_name}._osc._udp.local.",
@@ -496,11 +581,17 @@ class NymphesOSC:
             self._osc_server_thread = None
             self.logger.info("OSC Server Stopped")
 
+        self._log_traffic_summary()
+
         if self._zeroconf is not None:
             self._zeroconf.unregister_service(self._mdns_service_info)
             self._zeroconf.close()
             self.logger.info("mdns Closed")
 
+        # Stop NymphesMIDI's background threads and close its
+        # MIDI ports and preset library
+        self._nymphes_midi.close()
+
 
 
     #
@@ -539,6 +630,43 @@ class NymphesOSC:
         for osc_client in self._osc_clients_dict.values():
             osc_client.send(msg)
 
+    def _send_osc_to_other_clients(self, host, address, *args):
+        """
+        Creates an OSC message from the supplied address and arguments
+        and sends it to all clients except those on host.
+        :param host: str. The host of the clients to skip
+        :param address: The osc address including the forward slash ie: /osc/wave/value
+        :param args: A variable number of arguments, separated by commas.
+        :return:
+        """
+        msg = OscMessageBuilder(address=address)
+        for arg in args:
+            msg.add_arg(arg)
+        msg = msg.build()
+
+        for (client_host, client_port), osc_client in list(self._osc_clients_dict.items()):
+            if client_host != host:
+                osc_client.send(msg)
+
+    def _send_osc_to_preset_library_subscribers(self, address, *args):
+        """
+        Creates an OSC message from the supplied address and arguments
+        and sends it to registered clients which have subscribed to
+        preset library changes.
+        :param address: The osc address including the forward slash ie: /preset_library_changed
+        :param args: A variable number of arguments, separated by commas.
+        :return:
+        """
+        msg = OscMessageBuilder(address=address)
+        for arg in args:
+            msg.add_arg(arg)
+        msg = msg.build()
+
+        for client_key in list(self._preset_library_subscribers):
+            osc_client = self._osc_clients_dict.get(client_key)
+            if osc_client is not None:
+                osc_client.send(msg)
+
     #
     # OSC Message Handling Methods
     #
@@ -705,7 +833,7 @@ class NymphesOSC:
             filepath = Path(args[0])
             self.logger.info(f'Received {address} {filepath} from {sender_ip[0]}')
 
-            if filepath.suffix in ['.txt', '.TXT']:
+            if filepath.suffix in ['.txt', '.TXT', '.nym', '.NYM']:
                 # This might be a preset file
                 self._nymphes_midi.load_file(filepath=filepath)
 
@@ -889,6 +1017,290 @@ class NymphesOSC:
         # Send the dump request
         self._nymphes_midi.request_preset_dump()
 
+    def _on_osc_message_list_presets(self, sender_ip, address, *args):
+        """
+        Send a page of preset files from the preset library to clients.
+        The reply is a single /preset_list message.
+        :param sender_ip: This is the automatically-detected IP address of the sender
+        :param address: (str) The OSC address of the message
+        :param *args: The OSC message's arguments
+        :return:
+        """
+        # Make sure the offset and limit were supplied
+        if len(args) < 2:
+            self.logger.warning(f'Received {address} from client at {sender_ip[0]} without offset and limit arguments')
+            return
+
+        try:
+            offset = int(args[0])
+            limit = min(int(args[1]), self.max_presets_per_list)
+            query = str(args[2]) if len(args) > 2 else None
+
+            self.logger.info(f'Received {address} {offset} {limit} {query} from client at {sender_ip[0]}')
+
+            total_count, presets = self._nymphes_midi.list_presets(offset=offset, limit=limit, query=query)
+
+            self._send_osc_to_all_clients(
+                '/preset_list',
+                total_count,
+                offset,
+                *[path for path, fingerprint in presets]
+            )
+
+        except Exception as e:
+            # Send status update and log it
+            status = f'Failed to list presets'
+            self._send_error_message_to_osc_clients(status, str(e))
+            self.logger.warning(f'{status}: {e}')
+
+    def _on_osc_message_refresh_preset_library(self, sender_ip, address, *args):
+        """
+        Bring the preset library up to date with the presets directory.
+        :param sender_ip: This is the automatically-detected IP address of the sender
+        :param address: (str) The OSC address of the message
+        :param *args: The OSC message's arguments
+        :return:
+        """
+        self.logger.info(f'Received {address} from client at {sender_ip[0]}')
+
+        self._nymphes_midi.refresh_preset_library()
+
+    def _on_osc_message_convert_presets(self, sender_ip, address, *args):
+        """
+        Convert preset files to another format on a background thread.
+        Progress is reported with /preset_conversion_progress messages.
+        :param sender_ip: This is the automatically-detected IP address of the sender
+        :param address: (str) The OSC address of the message
+        :param *args: The OSC message's arguments
+        :return:
+        """
+        # Make sure the arguments were supplied
+        if len(args) < 3:
+            self.logger.warning(f'Received {address} from client at {sender_ip[0]} without input path, output directory and format arguments')
+            return
+
+        try:
+            input_path = Path(str(args[0]))
+            output_directory_path = Path(str(args[1]))
+            output_format = str(args[2])
+            overwrite = bool(int(args[3])) if len(args) > 3 else False
+
+            self.logger.info(f'Received {address} {input_path} {output_directory_path} {output_format} {overwrite} from client at {sender_ip[0]}')
+
+            self._nymphes_midi.convert_presets(
+                input_path,
+                output_directory_path,
+                output_format,
+                overwrite=overwrite
+            )
+
+        except Exception as e:
+            # Send status update and log it
+            status = f'Failed to convert presets'
+            self._send_error_message_to_osc_clients(status, str(e))
+            self.logger.warning(f'{status}: {e}')
+
+    def _on_osc_message_find_presets(self, sender_ip, address, *args):
+        """
+        Find the presets in the preset library whose parameter values
+        are within the supplied ranges. The reply is a single
+        /found_presets message.
+        The arguments are groups of three: parameter name, minimum value and
+        maximum value. The parameter name may also be given as an OSC address.
+        :param sender_ip: This is the automatically-detected IP address of the sender
+        :param address: (str) The OSC address of the message
+        :param *args: The OSC message's arguments
+        :return:
+        """
+        # Make sure the arguments were supplied
+        if len(args) == 0 or len(args) % 3 != 0:
+            self.logger.warning(f'Received {address} from client at {sender_ip[0]} without parameter name, min and max arguments')
+            return
+
+        try:
+            self.logger.info(f'Received {address} {" ".join(str(arg) for arg in args)} from client at {sender_ip[0]}')
+
+            ranges = {}
+            for i in range(0, len(args), 3):
+                param_name = str(args[i])
+                if param_name.startswith('/'):
+                    param_name = parameter_name_from_osc_address(param_name)
+
+                ranges[param_name] = (float(args[i + 1]), float(args[i + 2]))
+
+            total_count, paths = self._nymphes_midi.find_presets(ranges, limit=self.max_presets_per_list)
+
+            self._send_osc_to_all_clients('/found_presets', total_count, *paths)
+
+        except Exception as e:
+            # Send status update and log it
+            status = f'Failed to find presets'
+            self._send_error_message_to_osc_clients(status, str(e))
+            self.logger.warning(f'{status}: {e}')
+
+    def _on_osc_message_find_similar_presets(self, sender_ip, address, *args):
+        """
+        Find the presets in the preset library which are most similar to
+        the current preset, or to a preset file. The reply is a single
+        /similar_presets message.
+        :param sender_ip: This is the automatically-detected IP address of the sender
+        :param address: (str) The OSC address of the message
+        :param *args: The OSC message's arguments
+        :return:
+        """
+        # Make sure the count was supplied
+        if len(args) == 0:
+            self.logger.warning(f'Received {address} from client at {sender_ip[0]} without any arguments')
+            return
+
+        try:
+            count = min(int(args[0]), self.max_presets_per_list)
+            metric = str(args[1]) if len(args) > 1 else 'cosine'
+            filepath = Path(str(args[2])) if len(args) > 2 else None
+
+            self.logger.info(f'Received {address} {count} {metric} {filepath} from client at {sender_ip[0]}')
+
+            results = self._nymphes_midi.find_similar_presets(filepath=filepath, count=count, metric=metric)
+
+            reply_args = []
+            for path, distance in results:
+                reply_args.extend([path, distance])
+
+            self._send_osc_to_all_clients('/similar_presets', *reply_args)
+
+        except Exception as e:
+            # Send status update and log it
+            status = f'Failed to find similar presets'
+            self._send_error_message_to_osc_clients(status, str(e))
+            self.logger.warning(f'{status}: {e}')
+
+    def _on_osc_message_subscribe_preset_library_changes(self, sender_ip, address, *args):
+        """
+        A registered client has asked to be sent a /preset_library_changed
+        message whenever a preset file is added, modified or removed.
+        We use the sender's IP address.
+        :param sender_ip: This is the automatically-detected IP address of the sender
+        :param address: (str) The OSC address of the message
+        :param *args: The OSC message's arguments
+        :return:
+        """
+        # Make sure an argument was supplied
+        if len(args) == 0:
+            self.logger.warning(f'Received {address} from client at {sender_ip[0]} without any arguments')
+            return
+
+        try:
+            # Get the client's port
+            client_port = int(args[0])
+
+            self.logger.info(f'Received {address} {client_port} from client at {sender_ip[0]}')
+
+            if (sender_ip[0], client_port) not in self._osc_clients_dict:
+                raise Exception(f'{sender_ip[0]}:{client_port} is not a registered client')
+
+            self._preset_library_subscribers.add((sender_ip[0], client_port))
+
+            # Send status update and log it
+            status = f'Subscribed client to preset library changes ({sender_ip[0]}:{client_port})'
+            self._send_status_to_osc_clients(status)
+            self.logger.info(status)
+
+        except Exception as e:
+            # Send status update and log it
+            status = f'Failed to subscribe to preset library changes'
+            self._send_error_message_to_osc_clients(status, str(e))
+            self.logger.warning(f'{status}: {e}')
+
+    def _on_osc_message_unsubscribe_preset_library_changes(self, sender_ip, address, *args):
+        """
+        A client has asked to stop receiving /preset_library_changed messages.
+        We use the sender's IP address.
+        :param sender_ip: This is the automatically-detected IP address of the sender
+        :param address: (str) The OSC address of the message
+        :param *args: The OSC message's arguments
+        :return:
+        """
+        # Make sure an argument was supplied
+        if len(args) == 0:
+            self.logger.warning(f'Received {address} from client at {sender_ip[0]} without any arguments')
+            return
+
+        try:
+            # Get the client's port
+            client_port = int(args[0])
+
+            self.logger.info(f'Received {address} {client_port} from client at {sender_ip[0]}')
+
+            self._preset_library_subscribers.discard((sender_ip[0], client_port))
+
+            # Send status update and log it
+            status = f'Unsubscribed client from preset library changes ({sender_ip[0]}:{client_port})'
+            self._send_status_to_osc_clients(status)
+            self.logger.info(status)
+
+        except Exception as e:
+            # Send status update and log it
+            status = f'Failed to unsubscribe from preset library changes'
+            self._send_error_message_to_osc_clients(status, str(e))
+            self.logger.warning(f'{status}: {e}')
+
+    def _on_osc_message_request_all_params(self, sender_ip, address, *args):
+        """
+        Send the values of all parameters in the current preset to clients.
+        Clients can use this to resync if their copy of the preset
+        doesn't match the fingerprint in a /preset_replaced message.
+        :param sender_ip: This is the automatically-detected IP address of the sender
+        :param address: (str) The OSC address of the message
+        :param *args: The OSC message's arguments
+        :return:
+        """
+        self.logger.info(f'Received {address} from client at {sender_ip[0]}')
+
+        if not self._nymphes_midi.has_curr_preset:
+            status = 'There is no current preset'
+            self._send_status_to_osc_clients(status)
+            self.logger.warning(status)
+            return
+
+        self._nymphes_midi.send_current_preset_notifications()
+
+    def _on_osc_message_request_preset_fingerprint(self, sender_ip, address, *args):
+        """
+        Send the fingerprint of the current preset to clients.
+        :param sender_ip: This is the automatically-detected IP address of the sender
+        :param address: (str) The OSC address of the message
+        :param *args: The OSC message's arguments
+        :return:
+        """
+        self.logger.info(f'Received {address} from client at {sender_ip[0]}')
+
+        fingerprint = self._nymphes_midi.curr_preset_fingerprint
+
+        if fingerprint is None:
+            status = 'There is no current preset'
+            self._send_status_to_osc_clients(status)
+            self.logger.warning(status)
+            return
+
+        self._send_osc_to_all_clients('/preset_fingerprint', fingerprint)
+
+    def _on_osc_message_request_stats(self, sender_ip, address, *args):
+        """
+        Send the NymphesMIDI and performance control counters to clients,
+        one /stats message per counter.
+        :param sender_ip: This is the automatically-detected IP address of the sender
+        :param address: (str) The OSC address of the message
+        :param *args: The OSC message's arguments
+        :return:
+        """
+        self.logger.info(f'Received {address} from client at {sender_ip[0]}')
+
+        stats = self._nymphes_midi.stats
+        stats.update(self._performance_control_stage.stats)
+
+        for name, value in stats.items():
+            self._send_osc_to_all_clients('/stats', name, value)
+
     def _on_osc_message_connect_midi_input(self, sender_ip, address, *args):
         """
         Connect a MIDI input port using its name
@@ -1008,6 +1420,21 @@ class NymphesOSC:
         self.logger.info(f'Received {address} from client at {sender_ip[0]}')
         self._nymphes_midi.disable_midi_feedback_suppression()
 
+    def _on_osc_message_enable_hybrid_float_params(self, sender_ip, address, *args):
+        """
+        Send the nearest MIDI CC value straight away when a float parameter
+        is set, and the exact value once the changes have settled
+        """
+        self.logger.info(f'Received {address} from client at {sender_ip[0]}')
+        self._nymphes_midi.enable_hybrid_float_params()
+
+    def _on_osc_message_disable_hybrid_float_params(self, sender_ip, address, *args):
+        """
+        Only send float parameter values in preset snapshots
+        """
+        self.logger.info(f'Received {address} from client at {sender_ip[0]}')
+        self._nymphes_midi.disable_hybrid_float_params()
+
     def _on_osc_message_connect_midi_output(self, sender_ip, address, *args):
         """
         Connect a MIDI output port using its name
@@ -1106,9 +1533,9 @@ class NymphesOSC:
         try:
             value = args[0]
 
-            self.logger.info(f'Received {address} {value} from client at {sender_ip[0]}')
+            self._count_traffic(sender_ip, address, value)
 
-            self._nymphes_midi.set_mod_wheel(value)
+            self._performance_control_stage.put('mod_wheel', value)
 
         except Exception as e:
             # Send status update and log it
@@ -1132,9 +1559,9 @@ class NymphesOSC:
         try:
             value = args[0]
 
-            self.logger.info(f'Received {address} {value} from client at {sender_ip[0]}')
+            self._count_traffic(sender_ip, address, value)
 
-            self._nymphes_midi.set_channel_aftertouch(value)
+            self._performance_control_stage.put('aftertouch', value)
 
         except Exception as e:
             # Send status update and log it
@@ -1159,9 +1586,9 @@ class NymphesOSC:
         try:
             value = args[0]
 
-            self.logger.info(f'Received {address} {value} from client at {sender_ip[0]}')
+            self._count_traffic(sender_ip, address, value)
 
-            self._nymphes_midi.set_sustain_pedal(value)
+            self._performance_control_stage.put('sustain_pedal', value)
 
         except Exception as e:
             # Send status update and log it
@@ -1179,12 +1606,16 @@ class NymphesOSC:
         :param *args: The OSC message's arguments
         :return:
         """
+        if address.startswith('/touch/'):
+            self._on_osc_message_touch(sender_ip, address, *args)
+            return
+
         # Create a param name from the address by removing the leading slash
         # and replacing other slashes with periods
         param_name = parameter_name_from_osc_address(address)
 
         # Check whether this is a valid parameter name
-        if param_name in NymphesPreset.all_param_names():
+        if NymphesPreset.is_param_name(param_name):
             #
             # The parameter name is valid
             #
@@ -1197,12 +1628,15 @@ class NymphesOSC:
             # Get the value
             value = args[0]
 
-            self.logger.info(f'Received {address} {value} from client at {sender_ip[0]}')
+            self._count_traffic(sender_ip, address, value)
 
             if isinstance(value, int):
                 try:
                     self._nymphes_midi.set_param(param_name, int_value=value)
 
+                    if param_name in self._touches_dict:
+                        self._echo_touched_param(param_name, value, from_toucher=True)
+
                 except Exception as e:
                     # Send status update and log it
                     status = f'Failed to set parameter'
@@ -1213,6 +1647,9 @@ class NymphesOSC:
                 try:
                     self._nymphes_midi.set_param(param_name, float_value=value)
 
+                    if param_name in self._touches_dict:
+                        self._echo_touched_param(param_name, value, from_toucher=True)
+
                 except Exception as e:
                     # Send status update and log it
                     status = f'Failed to set parameter'
@@ -1234,6 +1671,199 @@ class NymphesOSC:
             self._send_status_to_osc_clients(status)
             self.logger.warning(status)
 
+    def _send_performance_control(self, name, value):
+        """
+        Send a performance control value from the performance control stage.
+        :param name: str. 'mod_wheel', 'aftertouch' or 'sustain_pedal'
+        :param value: int. The MIDI value
+        :return:
+        """
+        if name == 'mod_wheel':
+            self._nymphes_midi.set_mod_wheel(value)
+
+        elif name == 'aftertouch':
+            self._nymphes_midi.set_channel_aftertouch(value)
+
+        elif name == 'sustain_pedal':
+            self._nymphes_midi.set_sustain_pedal(value)
+
+    def _on_osc_message_touch(self, sender_ip, address, *args):
+        """
+        A client has started or stopped touching the control for a
+        parameter. The address is /touch followed by the parameter's
+        address, ie: /touch/osc/wave/value. The argument is 1 when the
+        gesture begins and 0 when it ends.
+        :param sender_ip: This is the automatically-detected IP address of the sender
+        :param address: (str) The OSC address of the message
+        :param *args: The OSC message's arguments
+        :return:
+        """
+        param_name = parameter_name_from_osc_address(address[len('/touch'):])
+
+        if not NymphesPreset.is_param_name(param_name):
+            # Send status update and log it
+            status = f'Unknown OSC message received ({address} from client at {sender_ip[0]})'
+            self._send_status_to_osc_clients(status)
+            self.logger.warning(status)
+            return
+
+        # Make sure an argument was supplied
+        if len(args) == 0:
+            self.logger.warning(f'Received {address} from client at {sender_ip[0]} without any arguments')
+            return
+
+        self._count_traffic(sender_ip, address, args[0])
+
+        try:
+            if args[0]:
+                self._begin_touch(param_name, sender_ip[0])
+            else:
+                self._end_touch(param_name)
+
+        except Exception as e:
+            # Send status update and log it
+            status = f'Failed to handle {address}'
+            self._send_error_message_to_osc_clients(status, str(e))
+            self.logger.warning(f'{status}: {e}')
+
+    def _begin_touch(self, param_name, host):
+        """
+        Start a gesture for a parameter touched by the client at host.
+        :param param_name: str
+        :param host: str
+        :return:
+        """
+        now = time.monotonic()
+
+        with self._touches_lock:
+            self._touches_dict[param_name] = {
+                'host': host,
+                'last_activity_timestamp': now,
+                'last_echo_timestamp': 0.0,
+                'pending_value': None
+            }
+
+        self._nymphes_midi.begin_param_gesture(param_name)
+
+    def _end_touch(self, param_name):
+        """
+        End the gesture for a parameter, sending its exact value to
+        Nymphes and its latest value to other clients.
+        :param param_name: str
+        :return:
+        """
+        with self._touches_lock:
+            touch = self._touches_dict.pop(param_name, None)
+
+        self._nymphes_midi.end_param_gesture(param_name)
+
+        if touch is not None and touch['pending_value'] is not None:
+            self._send_osc_to_other_clients(
+                touch['host'],
+                osc_address_from_parameter_name(param_name),
+                touch['pending_value']
+            )
+
+    def _echo_touched_param(self, param_name, value, from_toucher):
+        """
+        Send a new value for a touched parameter to other clients, unless
+        one was sent less than touch_echo_interval_sec ago. In that case
+        it is kept and sent by update() or when the touch ends.
+        :param param_name: str
+        :param value: int or float
+        :param from_toucher: bool. True if the client touching the control sent it.
+        :return: bool. False if the parameter isn't being touched.
+        """
+        now = time.monotonic()
+
+        with self._touches_lock:
+            touch = self._touches_dict.get(param_name)
+            if touch is None:
+                return False
+
+            if from_toucher:
+                touch['last_activity_timestamp'] = now
+
+            if now - touch['last_echo_timestamp'] < self.touch_echo_interval_sec:
+                touch['pending_value'] = value
+                return True
+
+            touch['last_echo_timestamp'] = now
+            touch['pending_value'] = None
+            host = touch['host']
+
+        self._send_osc_to_other_clients(host, osc_address_from_parameter_name(param_name), value)
+        return True
+
+    def _update_touches(self):
+        """
+        Send values of touched parameters which were held back, and end
+        touches which have timed out.
+        :return:
+        """
+        now = time.monotonic()
+        echoes = []
+        timed_out_param_names = []
+
+        with self._touches_lock:
+            for param_name, touch in self._touches_dict.items():
+                if now - touch['last_activity_timestamp'] >= self.touch_timeout_sec:
+                    timed_out_param_names.append(param_name)
+
+                elif touch['pending_value'] is not None and \
+                        now - touch['last_echo_timestamp'] >= self.touch_echo_interval_sec:
+                    echoes.append((touch['host'], param_name, touch['pending_value']))
+                    touch['last_echo_timestamp'] = now
+                    touch['pending_value'] = None
+
+        for host, param_name, value in echoes:
+            self._send_osc_to_other_clients(host, osc_address_from_parameter_name(param_name), value)
+
+        for param_name in timed_out_param_names:
+            self.logger.warning(f'Touch for {param_name} timed out')
+            self._end_touch(param_name)
+
+    def _count_traffic(self, sender_ip, address, value):
+        """
+        Count a parameter or performance control message received from
+        a client, and log it if DEBUG logging is enabled.
+        This is called for every message, so it doesn't format anything
+        unless the message will be logged.
+        :param sender_ip: The sender_ip argument of the OSC message handler
+        :param address: (str) The OSC address of the message
+        :param value: The message's value
+        :return:
+        """
+        with self._traffic_counts_lock:
+            self._traffic_counts[address] = self._traffic_counts.get(address, 0) + 1
+
+        self.logger.debug('Received %s %s from client at %s', address, value, sender_ip[0])
+
+    def _log_traffic_summary(self):
+        """
+        Log the number of parameter and performance control messages
+        received since the last summary, and the busiest addresses.
+        :return:
+        """
+        with self._traffic_counts_lock:
+            traffic_counts = self._traffic_counts
+            self._traffic_counts = {}
+
+        now = time.time()
+        elapsed_sec = now - self._traffic_summary_last_timestamp
+        self._traffic_summary_last_timestamp = now
+
+        if len(traffic_counts) == 0:
+            return
+
+        busiest_addresses = sorted(traffic_counts, key=traffic_counts.get, reverse=True)[:5]
+        busiest_string = ', '.join(f'{address}: {traffic_counts[address]}' for address in busiest_addresses)
+
+        self.logger.info(
+            f'Received {sum(traffic_counts.values())} parameter and performance control messages '
+            f'for {len(traffic_counts)} addresses in the last {elapsed_sec:.1f} sec ({busiest_string})'
+        )
+
     def _on_nymphes_notification(self, name, value):
         """
         A notification has been received from the NymphesMIDI object.
@@ -1246,11 +1876,16 @@ class NymphesOSC:
             # This is a notification for a MIDI performance control
             #
 
+            # It was received from a MIDI input port, so Nymphes no longer
+            # has the last value that clients sent through the stage
+            if name != 'velocity':
+                self._performance_control_stage.reset(name)
+
             # Send it to OSC clients
             self._send_osc_to_all_clients(f'/{name}', value)
 
             # Log it
-            self.logger.debug(f'{name}: {value}')
+            self.logger.debug('%s: %s', name, value)
 
         elif name == 'float_param':
             #
@@ -1260,6 +1895,12 @@ class NymphesOSC:
             # Get the parameter name and value
             param_name, param_value = value
 
+            # Values of touched parameters are sent at a limited rate,
+            # and not to the client touching the control
+            if param_name in self._touches_dict and \
+                    self._echo_touched_param(param_name, float(param_value), from_toucher=False):
+                return
+
             # Send OSC message to clients
             # The address will start with a /, followed by the param name with periods
             # replaced by /
@@ -1267,11 +1908,17 @@ class NymphesOSC:
             self._send_osc_to_all_clients(osc_address_from_parameter_name(param_name), float(param_value))
 
             # Log it
-            self.logger.debug(f'{name}: {value}')
+            self.logger.debug('%s: %s', name, value)
 
         elif name == 'int_param':
             param_name, param_value = value
 
+            # Values of touched parameters are sent at a limited rate,
+            # and not to the client touching the control
+            if param_name in self._touches_dict and \
+                    self._echo_touched_param(param_name, int(param_value), from_toucher=False):
+                return
+
             # Send OSC message to clients
             # The address will start with a /, followed by the param name with periods
             # replaced by /
@@ -1279,7 +1926,17 @@ class NymphesOSC:
             self._send_osc_to_all_clients(osc_address_from_parameter_name(param_name), int(param_value))
 
             # Log it
-            self.logger.debug(f'{name}: {value}')
+            self.logger.debug('%s: %s', name, value)
+
+        elif name == PresetEvents.preset_library_changed.value:
+            #
+            # A preset file has been added, modified or removed.
+            # Only subscribed clients are told about this.
+            #
+            self._send_osc_to_preset_library_subscribers(f'/{name}', *value)
+
+            # Log it
+            self.logger.debug('%s: %s', name, value)
 
         elif name in PresetEvents.all_values():
             if isinstance(value, tuple):
@@ -1301,6 +1958,11 @@ class NymphesOSC:
                 self.logger.info(f'{name}: {value}')
 
         elif name in MidiConnectionEvents.all_values():
+            if name == MidiConnectionEvents.nymphes_connected.value:
+                # Send the next performance control values even if they
+                # are the same as the ones sent to the last connection
+                self._performance_control_stage.reset()
+
             if isinstance(value, tuple):
                 self._send_osc_to_all_clients(f'/{name}', *value)
 
@@ -1347,6 +2009,9 @@ class NymphesOSC:
         return '127.0.0.1'
         :return: str
         """
+        # netifaces is only needed when no server host was supplied
+        import netifaces
+
         # Get a list of all network interfaces
         interfaces = netifaces.interfaces()
 
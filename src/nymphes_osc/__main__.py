@@ -1,21 +1,108 @@
 import logging
-
-from nymphes_osc.NymphesOSC import NymphesOSC
 import time
 import argparse
+import sys
 from pathlib import Path
 
+# Other modules are imported where they are used, so the offline
+# subcommands don't pay for importing (and starting) the OSC server
+# and MIDI handling
+
 app_version_string = '1.0.1'
 
 
 def main():
+    # Worker processes used for preset conversion need this when
+    # nymphes-osc has been bundled by pyinstaller
+    if getattr(sys, 'frozen', False):
+        import multiprocessing
+        multiprocessing.freeze_support()
+
     # Get logger
     logger = logging.getLogger('nymphes-osc.main')
 
     #
     # Handle command-line arguments
     #
+    args = build_parser().parse_args()
+
+    from nymphes_midi.NymphesPreset import NymphesPreset
+
+    if args.command is not None:
+        # Choose the preset codec
+        NymphesPreset.set_codec(args.preset_codec)
+
+        if args.command == 'convert':
+            sys.exit(run_convert(args))
+
+        elif args.command == 'validate':
+            sys.exit(run_validate(args))
+
+        elif args.command == 'index':
+            sys.exit(run_index(args))
+
+        elif args.command == 'export-schema':
+            sys.exit(run_export_schema(args))
+
+    # Set up console and file logging
+    from nymphes_osc.logging_config import configure_logging
+    configure_logging()
+
+    from nymphes_osc.NymphesOSC import NymphesOSC
+
+    if args.presets_directory_path == '':
+        presets_directory_path = None
+    else:
+        presets_directory_path = Path(args.presets_directory_path)
+
+    logger.info(f'***** Starting nymphes-osc {app_version_string} *****')
 
+    #
+    # Choose the preset codec
+    #
+    NymphesPreset.set_codec(args.preset_codec)
+    logger.info(f'Using preset codec: {args.preset_codec}')
+
+    #
+    # Create the Nymphes OSC Controller
+    #
+    nymphes_osc = NymphesOSC(
+        nymphes_midi_channel=args.midi_channel,
+        server_port=args.server_port,
+        server_host=args.server_host,
+        client_port=args.client_port,
+        client_host=args.client_host,
+        use_mdns=args.use_mdns,
+        mdns_name=args.mdns_name,
+        osc_log_level=log_level_for_name(args.osc_log_level),
+        midi_log_level=log_level_for_name(args.midi_log_level),
+        presets_directory_path=presets_directory_path,
+        preset_cache_capacity=args.preset_cache_size,
+        midi_output_bytes_per_sec=args.midi_output_byte_rate,
+        preset_snapshot_min_interval_sec=args.preset_snapshot_interval,
+        hybrid_float_params=args.hybrid_float_params,
+        performance_control_max_rate_hz=args.performance_control_rate
+    )
+
+    #
+    # Stay running until manually stopped
+    #
+    try:
+        while True:
+            nymphes_osc.update()
+            time.sleep(0.0001)
+    except KeyboardInterrupt:
+        logger.warning(f'nymphes-osc is about to close')
+        nymphes_osc.stop_osc_server()
+
+
+def build_parser():
+    """
+    Create the command-line argument parser.
+    This only imports the modules needed to describe the arguments,
+    so the offline subcommands start quickly.
+    :return: argparse.ArgumentParser
+    """
     parser = argparse.ArgumentParser()
 
     # Server Host
@@ -91,41 +178,218 @@ def main():
         help='Optional. The path for preset files'
     )
 
-    args = parser.parse_args()
+    parser.add_argument(
+        '--preset_cache_size',
+        type=int,
+        default=32,
+        help='Optional. The number of recently loaded preset files to keep in memory. 0 disables the cache. Defaults to 32.'
+    )
 
-    if args.presets_directory_path == '':
-        presets_directory_path = None
-    else:
-        presets_directory_path = Path(args.presets_directory_path)
+    parser.add_argument(
+        '--midi_output_byte_rate',
+        type=int,
+        default=10000,
+        help='Optional. The most bytes per second to send to Nymphes and to each MIDI output port. 0 means no limit. Defaults to 10000.'
+    )
 
-    logger.info(f'***** Starting nymphes-osc {app_version_string} *****')
+    parser.add_argument(
+        '--preset_snapshot_interval',
+        type=float,
+        default=0.1,
+        help='Optional. The minimum number of seconds between preset snapshots sent to Nymphes while float parameters are changing. Defaults to 0.1.'
+    )
 
-    #
-    # Create the Nymphes OSC Controller
-    #
-    nymphes_osc = NymphesOSC(
-        nymphes_midi_channel=args.midi_channel,
-        server_port=args.server_port,
-        server_host=args.server_host,
-        client_port=args.client_port,
-        client_host=args.client_host,
-        use_mdns=args.use_mdns,
-        mdns_name=args.mdns_name,
-        osc_log_level=log_level_for_name(args.osc_log_level),
-        midi_log_level=log_level_for_name(args.midi_log_level),
-        presets_directory_path=presets_directory_path
+    parser.add_argument(
+        '--hybrid_float_params',
+        action='store_true',
+        help='Optional. If this flag is present, then float parameter changes are sent straight away as the nearest MIDI CC value, and the exact value is sent once the changes settle.'
+    )
+
+    parser.add_argument(
+        '--performance_control_rate',
+        type=float,
+        default=200,
+        help='Optional. The most mod wheel, aftertouch or sustain pedal messages to send to Nymphes per second, for each control. 0 means no limit. Defaults to 200.'
+    )
+
+    parser.add_argument(
+        '--preset_codec',
+        default='protobuf',
+        choices={'protobuf', 'fast'},
+        help='Optional. The codec used to encode and decode preset data. Defaults to protobuf.'
     )
 
     #
-    # Stay running until manually stopped
+    # Offline subcommands. These don't start the OSC server or use MIDI.
     #
+    subparsers = parser.add_subparsers(
+        dest='command',
+        title='subcommands',
+        description='Optional. Run one of these instead of starting the OSC server'
+    )
+
+    convert_parser = subparsers.add_parser(
+        'convert',
+        help='Convert preset files between .txt, .nym and .syx'
+    )
+    from nymphes_midi.convert_arguments import add_convert_arguments
+    add_convert_arguments(convert_parser)
+
+    validate_parser = subparsers.add_parser(
+        'validate',
+        help='Check that preset files can be loaded'
+    )
+    validate_parser.add_argument(
+        'input_paths',
+        nargs='+',
+        help='Preset files, .syx files or directories to check'
+    )
+    validate_parser.add_argument(
+        '--workers',
+        type=int,
+        help='Optional. The number of worker processes. Defaults to the number of CPUs.'
+    )
+
+    index_parser = subparsers.add_parser(
+        'index',
+        help='Bring the preset library index up to date'
+    )
+    index_parser.add_argument(
+        'presets_directory',
+        nargs='?',
+        help='Optional. The presets directory to index. Defaults to the presets directory in the nymphes-osc data folder.'
+    )
+    index_parser.add_argument(
+        '--database',
+        help='Optional. The index database file. Defaults to preset_library.sqlite3 in the nymphes-osc data folder.'
+    )
+    index_parser.add_argument(
+        '--workers',
+        type=int,
+        help='Optional. The number of worker processes. Defaults to the number of CPUs.'
+    )
+
+    export_schema_parser = subparsers.add_parser(
+        'export-schema',
+        help='Write a listing of all Nymphes parameters and their OSC addresses'
+    )
+    export_schema_parser.add_argument(
+        '--format',
+        default='json',
+        choices=['json', 'csv'],
+        help='Optional. Defaults to json.'
+    )
+    export_schema_parser.add_argument(
+        '--output',
+        help='Optional. The file to write. If not supplied, then the listing is written to stdout.'
+    )
+
+    return parser
+
+
+def run_convert(args):
+    """
+    Convert preset files.
+    :param args: argparse.Namespace
+    :return: int. The exit status: 0 if all presets were converted, 1 if any failed.
+    """
+    # PresetConverter is only imported when it is needed, as importing it is slow
+    from nymphes_midi.PresetConverter import run_convert as run_preset_conversion
+
+    return run_preset_conversion(args)
+
+
+def run_validate(args):
+    """
+    Check that preset files can be loaded.
+    :param args: argparse.Namespace
+    :return: int. The exit status: 0 if all presets are valid, 1 if any are not.
+    """
+    from nymphes_midi.PresetConverter import PresetConverter
+
+    result = PresetConverter(max_workers=args.workers).validate(args.input_paths)
+
+    for source, error in result['failed']:
+        print(f'Invalid: {source}: {error}', file=sys.stderr)
+
+    print(f'Valid {result["valid"]}, invalid {len(result["failed"])}')
+
+    return 1 if len(result['failed']) > 0 else 0
+
+
+def run_index(args):
+    """
+    Bring the preset library index up to date, parsing new and
+    modified preset files in worker processes.
+    :param args: argparse.Namespace
+    :return: int. The exit status
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    from nymphes_midi.PresetLibrary import PresetLibrary
+    from nymphes_midi.file_locations import get_data_files_directory_path
+
+    if args.presets_directory is not None:
+        presets_directory_path = Path(args.presets_directory)
+    else:
+        presets_directory_path = get_data_files_directory_path() / 'presets'
+
+    if args.database is not None:
+        database_filepath = Path(args.database)
+    else:
+        database_filepath = get_data_files_directory_path() / 'preset_library.sqlite3'
+        database_filepath.parent.mkdir(parents=True, exist_ok=True)
+
+    if not presets_directory_path.is_dir():
+        print(f'Presets directory not found: {presets_directory_path}', file=sys.stderr)
+        return 1
+
+    preset_library = PresetLibrary(presets_directory_path, database_filepath)
+
+    with ProcessPoolExecutor(
+            max_workers=args.workers,
+            mp_context=multiprocessing.get_context('spawn')
+    ) as executor:
+        num_added, num_updated, num_removed, num_failed = preset_library.refresh(executor=executor)
+
+    print(f'Added {num_added}, updated {num_updated}, removed {num_removed}, '
+          f'failed to read {num_failed}, '
+          f'{preset_library.num_presets} presets in {database_filepath}')
+
+    preset_library.close()
+
+    return 0
+
+
+def run_export_schema(args):
+    """
+    Write a listing of all Nymphes parameters.
+    :param args: argparse.Namespace
+    :return: int. The exit status
+    """
+    from nymphes_osc.utilities import parameters_map_rows
+
+    rows = parameters_map_rows()
+
+    file = open(args.output, 'w', newline='') if args.output is not None else sys.stdout
+
     try:
-        while True:
-            nymphes_osc.update()
-            time.sleep(0.0001)
-    except KeyboardInterrupt:
-        logger.warning(f'nymphes-osc is about to close')
-        nymphes_osc.stop_osc_server()
+        if args.format == 'json':
+            import json
+            json.dump(rows, file, indent=2)
+            file.write('\n')
+
+        else:
+            import csv
+            writer = csv.DictWriter(file, fieldnames=rows[0].keys())
+            writer.writeheader()
+            writer.writerows(rows)
+
+    finally:
+        if file is not sys.stdout:
+            file.close()
+
+    return 0
 
 
 def log_level_for_name(name):
@@ -1,20 +1,4 @@
-import platform
-from pathlib import Path
-import os
-
-
-# Determine the root directory for data files (config files, logs, etc)
-def get_data_files_directory_path():
-    os_name = platform.system()
-
-    if os_name == 'Darwin':
-        #
-        # On macOS we use ~/Library/Application Support/nymphes-osc/
-        #
-        return Path(os.path.expanduser('~')) / 'Library/Application Support/nymphes-osc'
-
-    else:
-        #
-        # On all other systems, we use a folder in the user's home folder
-        #
-        return Path(os.path.expanduser('~')) / 'nymphes-osc data/'
+# The data files location is shared with nymphes_midi, which doesn't
+# depend on nymphes_osc. It is imported here so existing imports of
+# nymphes_osc.file_locations keep working.
+from nymphes_midi.file_locations import get_data_files_directory_path
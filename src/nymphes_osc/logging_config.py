@@ -0,0 +1,153 @@
+import atexit
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from nymphes_midi.file_locations import get_data_files_directory_path
+
+
+log_formatter = logging.Formatter(
+    '%(asctime)s.%(msecs)03d - %(name)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+
+# log.txt is rotated when it reaches this size, and when nymphes-osc
+# starts, keeping this many old log files (log.txt.1, log.txt.2, ...)
+log_file_max_bytes = 5 * 1024 * 1024
+log_file_backup_count = 5
+
+# Writes queued log records to the console and log file on its own thread
+_queue_listener = None
+
+# Puts records logged to the nymphes-osc logger on the listener's queue
+_queue_handler = None
+
+
+class _LazyQueueHandler(QueueHandler):
+    """
+    A QueueHandler which puts records on the queue without formatting
+    them, so messages logged with %-style arguments are formatted on
+    the listener's thread instead of the thread that logged them.
+    The queue is only used within this process, so records don't need
+    to be made picklable. Arguments should not be changed after they
+    are logged.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+def configure_logging(log_to_file=True):
+    """
+    Set up logging for the nymphes-osc logger.
+    Records are put on a queue and written to the console and log file
+    by a background thread, so logging never blocks on console or disk
+    I/O. The log file is rotated when nymphes-osc starts and whenever
+    it reaches log_file_max_bytes.
+    This used to happen when NymphesOSC was imported. It is now done
+    explicitly, so importing nymphes_osc doesn't create directories or
+    touch the log file.
+    Calls after the first have no effect until stop_logging() is called,
+    so it is safe to call it more than once.
+    :param log_to_file: bool. If True, then also log to logs/log.txt in the data files directory.
+    :return: The nymphes-osc logger
+    """
+    global _queue_listener, _queue_handler
+
+    logger = logging.getLogger('nymphes-osc')
+
+    if _queue_listener is not None:
+        return logger
+
+    logger.setLevel(logging.DEBUG)
+
+    # Records logged before the listener starts wait in the queue,
+    # so they are written to the log file too
+    log_queue = queue.SimpleQueue()
+    _queue_handler = _LazyQueueHandler(log_queue)
+    logger.addHandler(_queue_handler)
+
+    #
+    # Logging to console
+    #
+
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(log_formatter)
+    handlers = [console_handler]
+
+    #
+    # Logging to a file
+    #
+
+    if log_to_file:
+        # Create data files directory if necessary
+        data_files_directory_path = get_data_files_directory_path()
+        if not data_files_directory_path.exists():
+            try:
+                data_files_directory_path.mkdir()
+                logger.info(f'Created data files directory at {data_files_directory_path}')
+
+            except Exception as e:
+                logger.critical(f'Failed to create data files directory at {data_files_directory_path}: {e}')
+
+        # Create logs directory if necessary
+        logs_directory_path = data_files_directory_path / 'logs'
+        if not logs_directory_path.exists():
+            try:
+                logs_directory_path.mkdir()
+                logger.info(f'Created logs directory at {logs_directory_path}')
+
+            except Exception as e:
+                logger.critical(f'Failed to create logs directory at {logs_directory_path}: {e}')
+
+        try:
+            log_filepath = logs_directory_path / 'log.txt'
+
+            file_handler = RotatingFileHandler(
+                log_filepath,
+                maxBytes=log_file_max_bytes,
+                backupCount=log_file_backup_count,
+                encoding='utf-8'
+            )
+            file_handler.setFormatter(log_formatter)
+
+            # Start each run with a new log file, keeping the previous ones
+            if log_filepath.stat().st_size > 0:
+                file_handler.doRollover()
+
+            handlers.append(file_handler)
+
+        except Exception as e:
+            logger.critical(f'Failed to open log file in {logs_directory_path}: {e}')
+
+    _queue_listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _queue_listener.start()
+
+    # Write any records still in the queue before the process exits.
+    # atexit would call it once for each time it was registered.
+    atexit.unregister(stop_logging)
+    atexit.register(stop_logging)
+
+    return logger
+
+
+def stop_logging():
+    """
+    Write any queued log records and stop the logging thread.
+    Called automatically when the process exits.
+    configure_logging() may be called again afterwards.
+    :return:
+    """
+    global _queue_listener, _queue_handler
+
+    if _queue_listener is None:
+        return
+
+    logging.getLogger('nymphes-osc').removeHandler(_queue_handler)
+    _queue_handler = None
+
+    queue_listener = _queue_listener
+    _queue_listener = None
+    queue_listener.stop()
+
+    for handler in queue_listener.handlers:
+        handler.close()
@@ -0,0 +1,5 @@
+def osc_address_from_parameter_name(parameter_name):
+    return f"/{parameter_name.replace('.', '/')}"
+
+def parameter_name_from_osc_address(osc_address):
+    return osc_address[1:].replace('/', '.')
@@ -0,0 +1,147 @@
+import threading
+import time
+
+
+class PerformanceControlStage:
+    """
+    Turns performance control values from clients (mod wheel, aftertouch,
+    sustain pedal), which may arrive hundreds of times per second from
+    XY pads or motion sensors, into the MIDI values worth sending.
+    - Int or float values are quantized to 7-bit MIDI values.
+    - Values which don't change the MIDI value are dropped.
+    - Each control is sent at most max_rate_hz times per second. A value
+      which arrives too soon is held back and sent by flush(), replacing
+      any older held-back value, so the last value always lands.
+    put() may be called from any thread. flush() should be called regularly.
+    """
+
+    def __init__(self, send_function, max_values_dict, max_rate_hz=200):
+        """
+        :param send_function: A function taking a control name and an int
+        MIDI value, which sends it.
+        :param max_values_dict: A dict. key: control name, value: the
+        largest MIDI value for the control. The smallest is 0.
+        :param max_rate_hz: float or None. The most values to send per
+        second for each control. None or 0 means no limit.
+        """
+        if max_rate_hz is not None and max_rate_hz < 0:
+            raise Exception(f'max_rate_hz should be None or 0 or more: {max_rate_hz}')
+
+        self._send_function = send_function
+        self._max_values_dict = dict(max_values_dict)
+        self._min_interval_sec = 1.0 / max_rate_hz if max_rate_hz else 0.0
+
+        # Protects _controls_dict
+        self._lock = threading.Lock()
+
+        # key: control name, value: a dict with these keys:
+        #   'sent_value': int or None. The last value sent
+        #   'sent_timestamp': float. When it was sent
+        #   'pending_value': int or None. A value held back by the rate limit
+        #   'received': int. The number of values received
+        #   'sent': int. The number of values sent
+        self._controls_dict = {
+            name: {
+                'sent_value': None,
+                'sent_timestamp': 0.0,
+                'pending_value': None,
+                'received': 0,
+                'sent': 0
+            }
+            for name in self._max_values_dict
+        }
+
+    def put(self, name, value):
+        """
+        Accept a new value for a control. It is sent now, held back
+        until flush(), or dropped if it doesn't change the MIDI value.
+        Raises an Exception if name or value is invalid.
+        :param name: str. The control name
+        :param value: int or float, between 0 and the control's max value
+        :return:
+        """
+        if name not in self._max_values_dict:
+            raise Exception(f'Invalid performance control name: {name}')
+
+        max_value = self._max_values_dict[name]
+        if not isinstance(value, (int, float)) or value < 0 or value > max_value:
+            raise Exception(f'Invalid value: {value} (should be between 0 and {max_value})')
+
+        midi_value = int(round(value))
+
+        now = time.monotonic()
+
+        with self._lock:
+            control = self._controls_dict[name]
+            control['received'] += 1
+
+            if midi_value == control['sent_value']:
+                # Nothing to send, and any held-back value is out of date
+                control['pending_value'] = None
+                return
+
+            if now - control['sent_timestamp'] < self._min_interval_sec:
+                control['pending_value'] = midi_value
+                return
+
+            self._mark_sent(control, midi_value, now)
+
+        self._send_function(name, midi_value)
+
+    def flush(self):
+        """
+        Send held-back values whose controls may be sent again.
+        :return:
+        """
+        now = time.monotonic()
+        values_to_send = []
+
+        with self._lock:
+            for name, control in self._controls_dict.items():
+                if control['pending_value'] is not None and \
+                        now - control['sent_timestamp'] >= self._min_interval_sec:
+                    values_to_send.append((name, control['pending_value']))
+                    self._mark_sent(control, control['pending_value'], now)
+
+        for name, midi_value in values_to_send:
+            self._send_function(name, midi_value)
+
+    def reset(self, name=None):
+        """
+        Forget the values sent, ie: after Nymphes has been reconnected,
+        or after a control has been changed by something else such as a
+        MIDI keyboard, so the next value is sent even if it is the same.
+        Raises an Exception if name is invalid.
+        :param name: str or None. The control to reset, or None for all controls.
+        :return:
+        """
+        if name is not None and name not in self._controls_dict:
+            raise Exception(f'Invalid performance control name: {name}')
+
+        with self._lock:
+            for control_name, control in self._controls_dict.items():
+                if name is None or control_name == name:
+                    control['sent_value'] = None
+                    control['pending_value'] = None
+
+    @staticmethod
+    def _mark_sent(control, midi_value, timestamp):
+        control['sent_value'] = midi_value
+        control['sent_timestamp'] = timestamp
+        control['pending_value'] = None
+        control['sent'] += 1
+
+    @property
+    def stats(self):
+        """
+        Returns the number of values received and sent for each control.
+        :return: dict. Keys are strings and values are ints.
+        """
+        stats = {}
+
+        with self._lock:
+            for name, control in self._controls_dict.items():
+                stats[f'{name}_values_received'] = control['received']
+                stats[f'{name}_values_sent'] = control['sent']
+
+        return stats
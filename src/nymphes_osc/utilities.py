@@ -1,35 +1,20 @@
 from nymphes_midi.NymphesPreset import NymphesPreset
-from nymphes_osc import NymphesOSC
+from nymphes_osc.osc_addresses import osc_address_from_parameter_name
 from pathlib import Path
 import csv
 
 
-def generate_parameters_map_csv_file_for_audio_plugin(filepath):
+def parameters_map_rows():
     """
-    Generate a CSV file containing a full listing of all Nymphes
-    parameters and their OSC messages, as well as value types and
-    min/max values, for use in creating a remote control plugin.
-    Periods in parameter names are replaced with underscores, as some
-    plugin hosts don't like to see periods in parameter IDs.
-    :param filepath: Str or Path. This is where the CSV file will be written. Raises an Exception if empty.
+    Get a listing of all Nymphes parameters and their OSC messages,
+    as well as value types, min/max values and default values.
+    :return: A list of dicts, one for each parameter
     """
-    if filepath is None:
-        raise Exception("filepath was None")
-
-    if len(filepath) == 0:
-        raise Exception("Filepath is empty")
-
-    # Make sure filepath is a Path object, and expand tilde into
-    # the home folder path (if present). This might be important
-    # on some systems.
-    filepath = Path(filepath).expanduser()
-
     p = NymphesPreset()
 
     param_names = p.all_param_names()
 
-    # This will be a list of dicts, one for each row in the
-    # CSV file
+    # This will be a list of dicts, one for each parameter
     rows = []
 
     for param_name in param_names:
@@ -46,14 +31,39 @@ def generate_parameters_map_csv_file_for_audio_plugin(filepath):
         display_name = f"{section} {feature}{mod_source}".replace("_", " ")
         this_row_dict['display_name'] = display_name
 
-        this_row_dict['osc_address'] = NymphesOSC.osc_address_from_parameter_name(param_name)
+        this_row_dict['osc_address'] = osc_address_from_parameter_name(param_name)
         this_row_dict['value_type'] = "float" if p.type_for_param_name(param_name) == float else "int"
         this_row_dict['min_value'] = p.min_val_for_param_name(param_name)
         this_row_dict['max_value'] = p.max_val_for_param_name(param_name)
         this_row_dict['default_value'] = p.get_value(param_name)
-        
+
         rows.append(this_row_dict)
 
+    return rows
+
+
+def generate_parameters_map_csv_file_for_audio_plugin(filepath):
+    """
+    Generate a CSV file containing a full listing of all Nymphes
+    parameters and their OSC messages, as well as value types and
+    min/max values, for use in creating a remote control plugin.
+    Periods in parameter names are replaced with underscores, as some
+    plugin hosts don't like to see periods in parameter IDs.
+    :param filepath: Str or Path. This is where the CSV file will be written. Raises an Exception if empty.
+    """
+    if filepath is None:
+        raise Exception("filepath was None")
+
+    if len(filepath) == 0:
+        raise Exception("Filepath is empty")
+
+    # Make sure filepath is a Path object, and expand tilde into
+    # the home folder path (if present). This might be important
+    # on some systems.
+    filepath = Path(filepath).expanduser()
+
+    rows = parameters_map_rows()
+
     with open(filepath, mode="w", newline="") as file:
         writer = csv.DictWriter(file, fieldnames=rows[0].keys())
         writer.writeheader()
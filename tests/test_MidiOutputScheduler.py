@@ -0,0 +1,311 @@
+import unittest
+from unittest import mock
+import mido
+from nymphes_midi.MidiOutputScheduler import MidiOutputScheduler
+
+
+class FakePort:
+    name = 'Fake'
+
+    def __init__(self):
+        self.sent = []
+
+    def send(self, msg):
+        self.sent.append(msg)
+
+
+def cc(control, value, channel=0):
+    return mido.Message('control_change', channel=channel, control=control, value=value)
+
+
+def sysex(size):
+    """
+    Create a SYSEX message of size bytes, including the start and end bytes.
+    """
+    return mido.Message('sysex', data=[0x7d] * (size - 2))
+
+
+class TestMidiOutputSchedulerOrdering(unittest.TestCase):
+    def setUp(self):
+        self.port = FakePort()
+        self.scheduler = MidiOutputScheduler(self.port, bytes_per_sec=None)
+
+    def send_all(self):
+        self.scheduler.send_pending()
+        return self.port.sent
+
+    def test_performance_control_does_not_overtake_note(self):
+        self.scheduler.put(cc(64, 0))
+        self.scheduler.put(mido.Message('note_on', note=60, velocity=100))
+        self.scheduler.put(mido.Message('note_off', note=60))
+        self.scheduler.put(cc(64, 127))
+
+        sent = self.send_all()
+
+        self.assertEqual(
+            [(m.type, getattr(m, 'value', None)) for m in sent],
+            [('control_change', 0), ('note_on', None), ('note_off', None), ('control_change', 127)]
+        )
+
+    def test_performance_controls_coalesce_between_notes(self):
+        self.scheduler.put(mido.Message('note_on', note=60, velocity=100))
+        for value in range(10):
+            self.scheduler.put(cc(1, value))
+
+        sent = self.send_all()
+
+        self.assertEqual([m.type for m in sent], ['note_on', 'control_change'])
+        self.assertEqual(sent[1].value, 9)
+        self.assertEqual(self.scheduler.messages_coalesced, 9)
+
+    def test_parameter_does_not_overtake_sysex(self):
+        self.scheduler.put(cc(74, 1))
+        self.scheduler.put(mido.Message('sysex', data=[0x7d, 0x01]))
+        self.scheduler.put(cc(74, 2))
+
+        sent = self.send_all()
+
+        self.assertEqual(
+            [(m.type, getattr(m, 'value', None)) for m in sent],
+            [('control_change', 1), ('sysex', None), ('control_change', 2)]
+        )
+
+    def test_parameter_coalesces_in_place(self):
+        self.scheduler.put(cc(74, 1))
+        self.scheduler.put(cc(71, 5))
+        self.scheduler.put(cc(74, 2))
+
+        sent = self.send_all()
+
+        self.assertEqual([(m.control, m.value) for m in sent], [(74, 2), (71, 5)])
+
+    def test_send_now_does_not_overtake_queued_performance_controls(self):
+        self.scheduler.put(mido.Message('note_on', note=60, velocity=100))
+
+        self.assertFalse(self.scheduler.send_now(mido.Message('note_off', note=60)))
+
+        sent = self.send_all()
+
+        self.assertEqual([m.type for m in sent], ['note_on', 'note_off'])
+
+    def test_send_now_does_not_overtake_messages_from_midi_inputs(self):
+        self.scheduler.put_in_order(mido.Message('program_change', program=3))
+        self.scheduler.put_in_order(cc(74, 10))
+
+        self.assertFalse(self.scheduler.send_now(mido.Message('note_on', note=60, velocity=100)))
+
+        sent = self.send_all()
+
+        self.assertEqual([m.type for m in sent], ['program_change', 'control_change', 'note_on'])
+
+        # Once they have been sent, notes go straight out again
+        self.assertTrue(self.scheduler.send_now(mido.Message('note_off', note=60)))
+
+    def test_messages_from_midi_inputs_are_not_replaced(self):
+        self.scheduler.put_in_order(cc(74, 1))
+        self.scheduler.put_in_order(mido.Message('note_on', note=60, velocity=100))
+        self.scheduler.put(cc(74, 2))
+
+        sent = self.send_all()
+
+        self.assertEqual(
+            [(m.type, getattr(m, 'value', None)) for m in sent],
+            [('control_change', 1), ('note_on', None), ('control_change', 2)]
+        )
+
+
+class TestMidiOutputSchedulerModSource(unittest.TestCase):
+    def setUp(self):
+        self.port = FakePort()
+        self.scheduler = MidiOutputScheduler(self.port, bytes_per_sec=None, mod_matrix_control_numbers={31})
+
+    def sent_mod_source_values(self):
+        return [m.value for m in self.port.sent if m.type == 'control_change' and m.control == 30]
+
+    def test_selected_source_is_left_out(self):
+        self.scheduler.set_mod_source(0, 2)
+        self.scheduler.put(cc(30, 2))
+        self.scheduler.put(cc(31, 10))
+        self.scheduler.send_pending()
+
+        self.assertEqual(self.sent_mod_source_values(), [])
+
+    def test_source_is_sent_once_it_is_unknown(self):
+        self.scheduler.set_mod_source(0, 2)
+
+        # ie: Nymphes has loaded a preset
+        self.scheduler.set_mod_source(0, None)
+
+        self.scheduler.put(cc(30, 2))
+        self.scheduler.put(cc(31, 10))
+        self.scheduler.send_pending()
+
+        self.assertEqual(self.sent_mod_source_values(), [2])
+
+    def test_source_is_sent_after_program_change(self):
+        self.scheduler.put(cc(30, 2))
+        self.scheduler.put(mido.Message('program_change', program=3))
+        self.scheduler.send_pending()
+
+        self.scheduler.put(cc(30, 2))
+        self.scheduler.send_pending()
+
+        self.assertEqual(self.sent_mod_source_values(), [2, 2])
+
+
+class TestMidiOutputSchedulerPacing(unittest.TestCase):
+    def setUp(self):
+        self.port = FakePort()
+
+        # The time used by the scheduler, in seconds
+        self.now = 100.0
+
+        patcher = mock.patch('nymphes_midi.MidiOutputScheduler.time')
+        fake_time = patcher.start()
+        self.addCleanup(patcher.stop)
+        fake_time.monotonic.side_effect = lambda: self.now
+
+    def create_scheduler(self, bytes_per_sec=1000, burst_bytes=1000, reserve_bytes=256):
+        return MidiOutputScheduler(
+            self.port,
+            bytes_per_sec=bytes_per_sec,
+            burst_bytes=burst_bytes,
+            reserve_bytes=reserve_bytes
+        )
+
+    def send_pending(self, scheduler):
+        """
+        Send what the budget allows, and return the messages sent.
+        """
+        scheduler.send_pending()
+        sent, self.port.sent = self.port.sent, []
+        return sent
+
+    def test_burst_is_limited(self):
+        scheduler = self.create_scheduler(burst_bytes=100, reserve_bytes=0)
+
+        # Parameter MIDI CCs, which aren't replaced by each other
+        for channel in range(2):
+            for control in range(70, 95):
+                scheduler.put(cc(control, 1, channel=channel))
+
+        self.assertEqual(len(self.send_pending(scheduler)), 33)
+        self.assertEqual(scheduler.bytes_sent, 99)
+
+        # Tokens are earned at bytes_per_sec
+        self.now += 0.03
+        self.assertEqual(len(self.send_pending(scheduler)), 10)
+
+        # No more than the burst is earned during a long pause
+        self.now += 10.0
+        self.assertEqual(len(self.send_pending(scheduler)), 7)
+        self.assertEqual(scheduler.pending_count, 0)
+
+    def test_rate_over_time(self):
+        scheduler = self.create_scheduler(bytes_per_sec=800, burst_bytes=200, reserve_bytes=0)
+
+        for _ in range(20):
+            scheduler.put(sysex(100))
+
+        bytes_sent_by_time = []
+        for _ in range(10):
+            scheduler.send_pending()
+            bytes_sent_by_time.append(scheduler.bytes_sent)
+            self.now += 0.125
+
+        # The initial burst, then 100 bytes every 0.125 sec
+        self.assertEqual(bytes_sent_by_time, [200, 300, 400, 500, 600, 700, 800, 900, 1000, 1100])
+
+    def test_performance_controls_are_sent_first(self):
+        scheduler = self.create_scheduler()
+
+        scheduler.put(cc(74, 1))
+        scheduler.put(sysex(100))
+        scheduler.put(mido.Message('note_on', note=60, velocity=100))
+        scheduler.put(cc(1, 64))
+
+        self.assertEqual(
+            [(m.type, getattr(m, 'control', None)) for m in self.send_pending(scheduler)],
+            [('note_on', None), ('control_change', 1), ('control_change', 74), ('sysex', None)]
+        )
+
+    def test_sysex_leaves_reserve_for_performance_controls(self):
+        scheduler = self.create_scheduler(bytes_per_sec=1000, burst_bytes=1000, reserve_bytes=256)
+
+        scheduler.put(sysex(500))
+        scheduler.put(sysex(500))
+        scheduler.put(cc(74, 1))
+        scheduler.put(cc(1, 64))
+
+        # The second SYSEX would use the reserve. The parameter CC
+        # queued after it waits for it.
+        self.assertEqual([m.type for m in self.send_pending(scheduler)], ['control_change', 'sysex'])
+        self.assertEqual(scheduler.sysex_pending_count, 1)
+
+        # Performance controls can use the reserve
+        scheduler.put(cc(1, 100))
+        self.assertEqual([(m.type, m.control) for m in self.send_pending(scheduler)], [('control_change', 1)])
+
+        # 494 + 260 tokens isn't enough to send 500 bytes and keep 256
+        self.now += 0.26
+        self.assertEqual(self.send_pending(scheduler), [])
+
+        self.now += 0.04
+        self.assertEqual(
+            [(m.type, getattr(m, 'control', None)) for m in self.send_pending(scheduler)],
+            [('sysex', None), ('control_change', 74)]
+        )
+
+    def test_message_larger_than_burst_is_sent_when_bucket_is_full(self):
+        scheduler = self.create_scheduler(bytes_per_sec=1000, burst_bytes=100, reserve_bytes=0)
+
+        scheduler.put(sysex(300))
+        scheduler.put(cc(74, 1))
+
+        self.assertEqual([m.type for m in self.send_pending(scheduler)], ['sysex'])
+
+        # The bucket is now 200 bytes short
+        self.now += 0.2
+        self.assertEqual(self.send_pending(scheduler), [])
+
+        self.now += 0.01
+        self.assertEqual([m.type for m in self.send_pending(scheduler)], ['control_change'])
+
+    def test_send_now_uses_budget(self):
+        scheduler = self.create_scheduler(bytes_per_sec=1000, burst_bytes=3, reserve_bytes=0)
+
+        self.assertTrue(scheduler.send_now(cc(1, 10)))
+        self.assertEqual([m.value for m in self.port.sent], [10])
+        self.port.sent.clear()
+
+        # The bucket is empty, so it is queued
+        self.assertFalse(scheduler.send_now(cc(1, 11)))
+        self.assertEqual(scheduler.pending_count, 1)
+
+        self.now += 0.003
+        self.assertEqual([m.value for m in self.send_pending(scheduler)], [11])
+
+    def test_no_limit(self):
+        scheduler = self.create_scheduler(bytes_per_sec=None, burst_bytes=100)
+
+        for _ in range(10):
+            scheduler.put(sysex(1000))
+
+        self.assertEqual(len(self.send_pending(scheduler)), 10)
+
+    def test_set_byte_rate(self):
+        scheduler = self.create_scheduler()
+
+        scheduler.set_byte_rate(0)
+        self.assertIsNone(scheduler.bytes_per_sec)
+
+        scheduler.set_byte_rate(500)
+        self.assertEqual(scheduler.bytes_per_sec, 500)
+
+        for bytes_per_sec in [-1, 1.5, '100']:
+            with self.assertRaises(Exception):
+                scheduler.set_byte_rate(bytes_per_sec)
+
+
+if __name__ == '__main__':
+    unittest.main()
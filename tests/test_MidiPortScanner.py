@@ -0,0 +1,195 @@
+import os
+import time
+import unittest
+from unittest import mock
+import mido
+from nymphes_midi import MidiPortScanner as midi_port_scanner_module
+from nymphes_midi.MidiPortScanner import MidiPortScanner
+
+
+def wait_for(condition_function, timeout_sec=5.0):
+    """
+    Wait until condition_function returns a value which isn't None or False.
+    :return: The value, or None if it timed out
+    """
+    end_timestamp = time.monotonic() + timeout_sec
+    while time.monotonic() < end_timestamp:
+        value = condition_function()
+        if value is not None and value is not False:
+            return value
+        time.sleep(0.005)
+
+    return None
+
+
+class FakeAnnounceListener:
+    """
+    Stands in for _AlsaSeqAnnounceListener. Call announce() to send a
+    port event.
+    """
+
+    def __init__(self):
+        self._read_fd, self._write_fd = os.pipe()
+        os.set_blocking(self._read_fd, False)
+        self.fds = [self._read_fd]
+
+    def announce(self):
+        os.write(self._write_fd, b'\0')
+
+    def read_port_events(self):
+        try:
+            return len(os.read(self._read_fd, 1024)) > 0
+        except BlockingIOError:
+            return False
+
+    def close(self):
+        os.close(self._read_fd)
+        os.close(self._write_fd)
+
+
+class MidiPortScannerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.input_port_names = ['Nymphes']
+        self.output_port_names = ['Nymphes']
+
+        for patcher in [
+            mock.patch.object(mido, 'get_input_names', side_effect=lambda: list(self.input_port_names)),
+            mock.patch.object(mido, 'get_output_names', side_effect=lambda: list(self.output_port_names))
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def create_scanner(self, listener=None, **kwargs):
+        """
+        Create and start a scanner which uses listener for announce
+        events, or polling if listener is None.
+        """
+        if listener is None:
+            listener_patcher = mock.patch.object(
+                midi_port_scanner_module,
+                '_AlsaSeqAnnounceListener',
+                side_effect=Exception('Not available')
+            )
+        else:
+            listener_patcher = mock.patch.object(
+                midi_port_scanner_module,
+                '_AlsaSeqAnnounceListener',
+                return_value=listener
+            )
+
+        scanner = MidiPortScanner(**kwargs)
+        with listener_patcher:
+            scanner.start()
+        self.addCleanup(scanner.stop)
+
+        return scanner
+
+
+class TestMidiPortScannerPolling(MidiPortScannerTestCase):
+    def test_first_scan_is_immediate(self):
+        scanner = self.create_scanner(slow_poll_interval_sec=100, fast_polling_function=lambda: False)
+
+        self.assertEqual(wait_for(scanner.get_changed_port_names, 1.0), (['Nymphes'], ['Nymphes']))
+
+        # Nothing has changed since
+        self.assertIsNone(scanner.get_changed_port_names())
+
+    def test_new_port_is_detected(self):
+        scanner = self.create_scanner(fast_poll_interval_sec=0.01)
+        wait_for(scanner.get_changed_port_names)
+
+        self.input_port_names.append('Keyboard')
+
+        self.assertEqual(wait_for(scanner.get_changed_port_names), (['Nymphes', 'Keyboard'], ['Nymphes']))
+
+    def test_request_scan_wakes_slow_polling(self):
+        scanner = self.create_scanner(slow_poll_interval_sec=100, fast_polling_function=lambda: False)
+        wait_for(scanner.get_changed_port_names)
+
+        self.output_port_names.remove('Nymphes')
+        scanner.request_scan()
+
+        self.assertEqual(wait_for(scanner.get_changed_port_names, 1.0), (['Nymphes'], []))
+
+    def test_poll_rate_follows_fast_polling_function(self):
+        fast_polling = True
+        scanner = self.create_scanner(
+            fast_polling_function=lambda: fast_polling,
+            fast_poll_interval_sec=0.01,
+            slow_poll_interval_sec=100
+        )
+
+        self.assertTrue(wait_for(lambda: scanner.scan_count >= 5, 2.0))
+
+        # The next wait uses the slow interval
+        fast_polling = False
+        time.sleep(0.05)
+        scan_count = scanner.scan_count
+        time.sleep(0.2)
+
+        self.assertEqual(scanner.scan_count, scan_count)
+
+    def test_own_and_missing_port_names_are_left_out(self):
+        self.input_port_names.extend([None, f'{MidiPortScanner.alsa_client_name}:announce 128:0'])
+        scanner = self.create_scanner()
+
+        self.assertEqual(wait_for(scanner.get_changed_port_names), (['Nymphes'], ['Nymphes']))
+
+    def test_failed_scan_is_ignored(self):
+        scanner = self.create_scanner(fast_poll_interval_sec=0.01)
+        wait_for(scanner.get_changed_port_names)
+
+        mido.get_input_names.side_effect = Exception('Failed')
+        scan_count = scanner.scan_count
+        self.assertTrue(wait_for(lambda: scanner.scan_count > scan_count + 2))
+        self.assertIsNone(scanner.get_changed_port_names())
+
+        mido.get_input_names.side_effect = lambda: ['Keyboard']
+        self.assertEqual(wait_for(scanner.get_changed_port_names), (['Keyboard'], ['Nymphes']))
+
+    def test_stop(self):
+        scanner = self.create_scanner(slow_poll_interval_sec=100, fast_polling_function=lambda: False)
+        self.assertTrue(scanner.running)
+
+        start_timestamp = time.monotonic()
+        scanner.stop()
+
+        self.assertFalse(scanner.running)
+        self.assertLess(time.monotonic() - start_timestamp, 1.0)
+
+
+class TestMidiPortScannerAnnouncements(MidiPortScannerTestCase):
+    def test_port_event_causes_scan(self):
+        listener = FakeAnnounceListener()
+        scanner = self.create_scanner(listener=listener, announce_settle_sec=0.01, announce_poll_interval_sec=100)
+        wait_for(scanner.get_changed_port_names)
+        scan_count = scanner.scan_count
+
+        # Without a port event, there are no more scans
+        time.sleep(0.1)
+        self.assertEqual(scanner.scan_count, scan_count)
+
+        self.input_port_names.append('Keyboard')
+        listener.announce()
+
+        self.assertEqual(wait_for(scanner.get_changed_port_names, 1.0), (['Nymphes', 'Keyboard'], ['Nymphes']))
+
+    def test_request_scan_wakes_thread(self):
+        listener = FakeAnnounceListener()
+        scanner = self.create_scanner(listener=listener, announce_poll_interval_sec=100)
+        wait_for(scanner.get_changed_port_names)
+
+        self.input_port_names.clear()
+        scanner.request_scan()
+
+        self.assertEqual(wait_for(scanner.get_changed_port_names, 1.0), ([], ['Nymphes']))
+
+    def test_periodic_scan(self):
+        listener = FakeAnnounceListener()
+        scanner = self.create_scanner(listener=listener, announce_poll_interval_sec=0.01)
+
+        self.assertTrue(wait_for(lambda: scanner.scan_count >= 5, 2.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
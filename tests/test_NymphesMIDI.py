@@ -0,0 +1,390 @@
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+import mido
+from nymphes_midi.NymphesPreset import NymphesPreset
+
+try:
+    from nymphes_midi.NymphesMIDI import NymphesMIDI
+except ImportError:
+    # python-rtmidi, or the system MIDI library it uses, is not available
+    NymphesMIDI = None
+
+
+class FakePort:
+    """
+    Stands in for a MIDI port connected to Nymphes.
+    """
+    name = 'Nymphes'
+
+    def __init__(self):
+        self.sent = []
+        self.pending = []
+
+    def send(self, msg):
+        self.sent.append(msg)
+
+    def iter_pending(self):
+        pending, self.pending = self.pending, []
+        return pending
+
+    def close(self):
+        pass
+
+
+@unittest.skipIf(NymphesMIDI is None, 'python-rtmidi is not available')
+class NymphesMIDITestCase(unittest.TestCase):
+    """
+    Creates a NymphesMIDI which uses a temporary data files folder,
+    doesn't detect any MIDI ports, and is connected to a fake Nymphes.
+    """
+
+    # Keyword arguments for NymphesMIDI
+    nymphes_midi_kwargs = {}
+
+    def setUp(self):
+        temp_directory = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_directory.cleanup)
+        self.temp_directory_path = Path(temp_directory.name)
+
+        for patcher in [
+            mock.patch.dict(os.environ, {'HOME': str(self.temp_directory_path)}),
+            mock.patch.object(mido, 'get_input_names', return_value=[]),
+            mock.patch.object(mido, 'get_output_names', return_value=[])
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.presets_directory_path = self.temp_directory_path / 'presets'
+        self.presets_directory_path.mkdir()
+
+        # Send MIDI messages without pacing them, unless a test asks for it
+        nymphes_midi_kwargs = {'midi_output_bytes_per_sec': None}
+        nymphes_midi_kwargs.update(self.nymphes_midi_kwargs)
+
+        self.notifications = []
+        self.nymphes_midi = NymphesMIDI(
+            notification_callback_function=lambda name, value: self.notifications.append((name, value)),
+            presets_directory_path=self.presets_directory_path,
+            **nymphes_midi_kwargs
+        )
+        self.addCleanup(self.nymphes_midi.close)
+
+        # Connect to a fake Nymphes
+        self.nymphes_input_port = FakePort()
+        self.nymphes_output_port = FakePort()
+        self.nymphes_midi._nymphes_midi_input_port_object = self.nymphes_input_port
+        self.nymphes_midi._nymphes_midi_output_port_object = self.nymphes_output_port
+        self.nymphes_midi._nymphes_midi_output_scheduler = self.nymphes_midi._create_midi_output_scheduler(
+            self.nymphes_output_port,
+            is_nymphes=True
+        )
+
+        self.nymphes_midi.update()
+        self.notifications.clear()
+
+    def sent_to_nymphes(self):
+        """
+        Send everything queued for Nymphes, and return the messages
+        sent since this was last called.
+        """
+        self.nymphes_midi._nymphes_midi_output_scheduler.send_pending()
+        sent, self.nymphes_output_port.sent = self.nymphes_output_port.sent, []
+        return sent
+
+    def notification_names(self):
+        return [name for name, value in self.notifications]
+
+
+class TestCurrentPreset(NymphesMIDITestCase):
+    def test_has_curr_preset_does_not_copy(self):
+        with mock.patch.object(self.nymphes_midi._curr_preset_object, 'clone') as clone:
+            self.assertTrue(self.nymphes_midi.has_curr_preset)
+
+        clone.assert_not_called()
+
+    def test_curr_preset_object_is_a_copy(self):
+        curr_preset_object = self.nymphes_midi.curr_preset_object
+        curr_preset_object.set_float('lpf.cutoff.value', 100.0)
+
+        self.assertNotEqual(self.nymphes_midi.curr_preset_object.get_float('lpf.cutoff.value'), 100.0)
+
+
+class TestDataFilesDirectory(NymphesMIDITestCase):
+    def test_data_files_directory_is_created(self):
+        from nymphes_midi.file_locations import get_data_files_directory_path
+
+        self.assertTrue(get_data_files_directory_path().is_dir())
+        self.assertIsNotNone(self.nymphes_midi._preset_library)
+
+
+class TestPresetTransitions(NymphesMIDITestCase):
+    nymphes_midi_kwargs = {'preset_snapshot_min_interval_sec': 0}
+
+    def load_preset(self, preset):
+        """
+        Load preset as a file, and return the messages sent to Nymphes.
+        """
+        filepath = self.presets_directory_path / f'preset_{len(self.notifications)}.txt'
+        preset.save_preset_file(filepath)
+
+        self.nymphes_midi.load_file(filepath)
+        self.nymphes_midi.update()
+
+        return self.sent_to_nymphes()
+
+    def test_first_preset_is_sent_via_sysex(self):
+        self.assertEqual([msg.type for msg in self.load_preset(NymphesPreset())], ['sysex'])
+
+    def test_few_changes_are_sent_via_cc(self):
+        p = NymphesPreset()
+        self.load_preset(p)
+
+        p.set_float('lpf.cutoff.value', 41.0)
+        p.set_int('osc.voice_mode.value', 3)
+        sent = self.load_preset(p)
+
+        self.assertEqual(
+            sorted((msg.type, msg.control, msg.value) for msg in sent),
+            sorted([
+                ('control_change', NymphesPreset.midi_cc_for_param_name('lpf.cutoff.value'), 41),
+                ('control_change', NymphesPreset.midi_cc_for_param_name('osc.voice_mode.value'), 3)
+            ])
+        )
+        self.assertEqual(self.nymphes_midi.stats['preset_transitions_cc'], 1)
+
+    def test_all_float_changes_are_sent_via_cc_when_smaller(self):
+        p = NymphesPreset()
+        self.load_preset(p)
+
+        for param_name in NymphesPreset.all_param_names():
+            if NymphesPreset.type_for_param_name(param_name) == float:
+                p.set_float(param_name, 100.0)
+
+        sent = self.load_preset(p)
+
+        self.assertEqual(set(msg.type for msg in sent), {'control_change'})
+        self.assertLess(
+            sum(len(msg.bytes()) for msg in sent),
+            len(p.generate_sysex_data('non-persistent', 'user', 'A', 1)) + 2
+        )
+
+    def test_chord_change_is_sent_via_sysex(self):
+        p = NymphesPreset()
+        self.load_preset(p)
+
+        # Chord settings have no MIDI CC
+        p.set_int('chord_1.root.value', 5)
+
+        self.assertEqual([msg.type for msg in self.load_preset(p)], ['sysex'])
+        self.assertEqual(self.nymphes_midi.stats['preset_transitions_sysex'], 2)
+
+    def test_fractional_float_is_sent_via_sysex(self):
+        p = NymphesPreset()
+        self.load_preset(p)
+
+        # This can't be sent exactly using MIDI CC
+        p.set_float('lpf.cutoff.value', 41.5)
+
+        self.assertEqual([msg.type for msg in self.load_preset(p)], ['sysex'])
+
+
+class TestHybridFloatParams(NymphesMIDITestCase):
+    nymphes_midi_kwargs = {'hybrid_float_params': True, 'preset_snapshot_min_interval_sec': 0}
+
+    def setUp(self):
+        super().setUp()
+
+        # Load a preset, so Nymphes has a known preset
+        p = NymphesPreset()
+        p.set_float('lpf.cutoff.value', 10.0)
+        filepath = self.presets_directory_path / 'start.txt'
+        p.save_preset_file(filepath)
+
+        self.nymphes_midi.load_file(filepath)
+        self.nymphes_midi.update()
+        self.sent_to_nymphes()
+
+        # The time used by the preset snapshot scheduler, in seconds.
+        # It continues from the real time, as the preset has been sent.
+        self.now = time.monotonic()
+
+        patcher = mock.patch('nymphes_midi.PresetSnapshotScheduler.time')
+        fake_time = patcher.start()
+        self.addCleanup(patcher.stop)
+        fake_time.monotonic.side_effect = lambda: self.now
+
+    def set_cutoff(self, value):
+        """
+        Set the cutoff, and return the messages sent to Nymphes.
+        """
+        self.nymphes_midi.set_param('lpf.cutoff.value', float_value=value)
+        self.nymphes_midi.update()
+        return self.sent_to_nymphes()
+
+    def settle(self):
+        """
+        Wait for the changes to settle, and return the messages sent to Nymphes.
+        """
+        self.now += self.nymphes_midi._preset_snapshot_scheduler.settle_sec
+        self.nymphes_midi.update()
+        return self.sent_to_nymphes()
+
+    def test_cc_then_sysex_commit(self):
+        cutoff_control = NymphesPreset.midi_cc_for_param_name('lpf.cutoff.value')
+
+        # The nearest MIDI CC value is sent straight away
+        sent = self.set_cutoff(41.3)
+        self.assertEqual([(msg.type, msg.control, msg.value) for msg in sent], [('control_change', cutoff_control, 41)])
+
+        # The exact value is sent once the changes have settled
+        sent = self.settle()
+        self.assertEqual([msg.type for msg in sent], ['sysex'])
+        self.assertEqual(NymphesPreset(sysex_data=sent[0].data).get_float('lpf.cutoff.value'), 41.3)
+
+        # Nothing more is sent
+        self.now += 1.0
+        self.nymphes_midi.update()
+        self.assertEqual(self.sent_to_nymphes(), [])
+
+    def test_commit_waits_for_changes_to_settle(self):
+        for value in [41.3, 45.6, 50.2]:
+            self.set_cutoff(value)
+            self.now += self.nymphes_midi._preset_snapshot_scheduler.settle_sec / 2
+
+        self.nymphes_midi.update()
+        self.assertEqual(self.sent_to_nymphes(), [])
+
+        sent = self.settle()
+        self.assertEqual([msg.type for msg in sent], ['sysex'])
+        self.assertEqual(NymphesPreset(sysex_data=sent[0].data).get_float('lpf.cutoff.value'), 50.2)
+
+    def test_cc_is_only_sent_when_nearest_value_changes(self):
+        self.assertEqual([msg.value for msg in self.set_cutoff(41.1)], [41])
+        self.assertEqual(self.set_cutoff(41.3), [])
+        self.assertEqual([msg.value for msg in self.set_cutoff(41.6)], [42])
+
+    def test_whole_number_commit_is_sent_via_cc(self):
+        self.set_cutoff(41.0)
+
+        sent = self.settle()
+        self.assertEqual([(msg.type, msg.value) for msg in sent], [('control_change', 41)])
+
+    def test_disabled(self):
+        self.nymphes_midi.disable_hybrid_float_params()
+
+        # The exact value is sent straight away, without a MIDI CC
+        sent = self.set_cutoff(41.3)
+        self.assertEqual([msg.type for msg in sent], ['sysex'])
+
+
+class TestPresetReceivedFromNymphes(NymphesMIDITestCase):
+    def receive_preset(self, preset):
+        """
+        Receive preset from Nymphes as a non-persistent SYSEX import.
+        """
+        self.notifications.clear()
+        self.nymphes_input_port.pending.append(mido.Message(
+            'sysex',
+            data=preset.generate_sysex_data('non-persistent', 'user', 'A', 1)
+        ))
+
+        # Notifications are sent at the start of update()
+        self.nymphes_midi.update()
+        self.nymphes_midi.update()
+
+    def test_only_changed_params_are_notified(self):
+        p = self.nymphes_midi.curr_preset_object
+        previous_fingerprint = p.fingerprint
+        p.set_float('lpf.cutoff.value', 12.5)
+        p.set_int('osc.voice_mode.value', 3)
+
+        self.receive_preset(p)
+
+        self.assertEqual(
+            sorted(value for name, value in self.notifications if name in ['float_param', 'int_param']),
+            [('lpf.cutoff.value', 12.5), ('osc.voice_mode.value', 3)]
+        )
+        self.assertIn(('preset_replaced', (previous_fingerprint, p.fingerprint, 2)), self.notifications)
+
+    def test_same_preset_sends_no_param_notifications(self):
+        p = self.nymphes_midi.curr_preset_object
+
+        self.receive_preset(p)
+
+        self.assertNotIn('float_param', self.notification_names())
+        self.assertNotIn('int_param', self.notification_names())
+        self.assertIn(('preset_replaced', (p.fingerprint, p.fingerprint, 0)), self.notifications)
+
+
+
+class TestSyxImport(NymphesMIDITestCase):
+    def write_syx_file(self, presets, name='archive.syx'):
+        filepath = self.temp_directory_path / name
+        filepath.write_bytes(b''.join(
+            bytes([0xf0] + p.generate_sysex_data('non-persistent', 'user', 'A', 1) + [0xf7]) for p in presets
+        ))
+        return filepath
+
+    def wait_for_import(self):
+        """
+        Call update() until the .syx file import has finished and its
+        notifications have been sent.
+        """
+        while self.nymphes_midi.importing_syx_file:
+            self.nymphes_midi._syx_import_thread.join(timeout=5)
+
+        self.nymphes_midi.update()
+        self.nymphes_midi.update()
+
+    def test_import_runs_in_background(self):
+        presets = []
+        for cutoff in [10.0, 20.0, 30.0]:
+            p = NymphesPreset()
+            p.set_float('lpf.cutoff.value', cutoff)
+            presets.append(p)
+
+        filepath = self.write_syx_file(presets)
+
+        with mock.patch.object(self.nymphes_midi, 'load_file', wraps=self.nymphes_midi.load_file) as load_file:
+            self.nymphes_midi.load_syx_file(filepath)
+            self.assertIsNotNone(self.nymphes_midi._syx_import_thread)
+
+            self.wait_for_import()
+
+        first_preset_filepath = self.presets_directory_path / 'archive' / 'archive_1.txt'
+        self.assertEqual(sorted(path.name for path in (self.presets_directory_path / 'archive').iterdir()),
+                         ['archive_1.txt', 'archive_2.txt', 'archive_3.txt'])
+        self.assertIn(('syx_import_finished', (str(filepath), 3, str(first_preset_filepath))), self.notifications)
+        self.assertIn(('syx_import_progress', (str(filepath), 3, 3)), self.notifications)
+
+        # The first preset is loaded on the thread calling update()
+        load_file.assert_called_once_with(first_preset_filepath)
+        self.assertIn(('loaded_file', str(first_preset_filepath)), self.notifications)
+        self.assertEqual(self.nymphes_midi.curr_preset_object.get_float('lpf.cutoff.value'), 10.0)
+
+    def test_import_without_presets(self):
+        filepath = self.temp_directory_path / 'other.syx'
+        filepath.write_bytes(bytes([0xf0, 0x7e, 0x7f, 0x06, 0x01, 0xf7]))
+
+        self.nymphes_midi.load_syx_file(filepath)
+        self.wait_for_import()
+
+        self.assertIn(('syx_import_finished', (str(filepath), 0, '')), self.notifications)
+        self.assertNotIn('loaded_file', self.notification_names())
+        self.assertFalse((self.presets_directory_path / 'other').exists())
+        self.assertFalse((self.presets_directory_path / 'other.txt').exists())
+
+    def test_only_one_import_at_a_time(self):
+        filepath = self.write_syx_file([NymphesPreset()])
+
+        with mock.patch.object(type(self.nymphes_midi), 'importing_syx_file', new_callable=mock.PropertyMock, return_value=True):
+            with self.assertRaises(Exception):
+                self.nymphes_midi.load_syx_file(filepath)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,247 @@
+import logging
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+import mido
+from nymphes_midi.NymphesPreset import NymphesPreset
+from nymphes_osc import logging_config
+
+try:
+    from nymphes_osc.NymphesOSC import NymphesOSC
+except ImportError:
+    # python-rtmidi, or the system MIDI library it uses, is not available
+    NymphesOSC = None
+
+
+# The sender_ip argument for OSC message handlers
+sender_ip = ('127.0.0.1', 50000)
+
+
+class FakePort:
+    """
+    Stands in for a MIDI port connected to Nymphes.
+    """
+    name = 'Nymphes'
+
+    def __init__(self):
+        self.sent = []
+
+    def send(self, msg):
+        self.sent.append(msg)
+
+    def iter_pending(self):
+        return []
+
+    def close(self):
+        pass
+
+
+@unittest.skipIf(NymphesOSC is None, 'python-rtmidi is not available')
+class NymphesOSCTestCase(unittest.TestCase):
+    """
+    Creates a NymphesOSC which uses a temporary data files folder,
+    doesn't detect any MIDI ports and has no OSC clients.
+    OSC messages are passed straight to their handlers.
+    """
+
+    # Keyword arguments for NymphesOSC
+    nymphes_osc_kwargs = {}
+
+    def setUp(self):
+        temp_directory = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_directory.cleanup)
+        self.temp_directory_path = Path(temp_directory.name)
+
+        for patcher in [
+            mock.patch.dict(os.environ, {'HOME': str(self.temp_directory_path)}),
+            mock.patch.object(mido, 'get_input_names', return_value=[]),
+            mock.patch.object(mido, 'get_output_names', return_value=[])
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.presets_directory_path = self.temp_directory_path / 'presets'
+        self.presets_directory_path.mkdir()
+
+        # NymphesOSC sets up logging, which writes to the temporary folder
+        logging_config.stop_logging()
+        self.addCleanup(logging_config.stop_logging)
+
+        nymphes_osc_kwargs = {'midi_output_bytes_per_sec': None}
+        nymphes_osc_kwargs.update(self.nymphes_osc_kwargs)
+
+        self.nymphes_osc = NymphesOSC(
+            server_host='127.0.0.1',
+            server_port=0,
+            presets_directory_path=self.presets_directory_path,
+            **nymphes_osc_kwargs
+        )
+        self.addCleanup(self.nymphes_osc.stop_osc_server)
+
+    def connect_fake_nymphes(self):
+        """
+        Connect NymphesMIDI to a fake Nymphes.
+        """
+        nymphes_midi = self.nymphes_osc._nymphes_midi
+
+        self.nymphes_output_port = FakePort()
+        nymphes_midi._nymphes_midi_input_port_object = FakePort()
+        nymphes_midi._nymphes_midi_output_port_object = self.nymphes_output_port
+        nymphes_midi._nymphes_midi_output_scheduler = nymphes_midi._create_midi_output_scheduler(
+            self.nymphes_output_port,
+            is_nymphes=True
+        )
+
+    def sent_to_nymphes(self):
+        """
+        Send everything queued for Nymphes, and return the messages
+        sent since this was last called.
+        """
+        self.nymphes_osc._nymphes_midi._nymphes_midi_output_scheduler.send_pending()
+        sent, self.nymphes_output_port.sent = self.nymphes_output_port.sent, []
+        return sent
+
+
+class TestTrafficSummary(NymphesOSCTestCase):
+    def receive_performance_control_messages(self):
+        for value in [10, 20, 30]:
+            self.nymphes_osc._on_osc_message_mod_wheel(sender_ip, '/mod_wheel', value)
+
+        for value in [40, 50]:
+            self.nymphes_osc._on_osc_message_aftertouch(sender_ip, '/aftertouch', value)
+
+    def test_summary_counts_messages(self):
+        self.receive_performance_control_messages()
+
+        with self.assertLogs(self.nymphes_osc.logger, logging.INFO) as logs:
+            self.nymphes_osc._log_traffic_summary()
+
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn('Received 5 parameter and performance control messages for 2 addresses', logs.output[0])
+        self.assertIn('/mod_wheel: 3, /aftertouch: 2', logs.output[0])
+
+    def test_counts_are_reset_after_summary(self):
+        self.receive_performance_control_messages()
+        self.nymphes_osc._log_traffic_summary()
+
+        with mock.patch.object(self.nymphes_osc.logger, 'info') as info:
+            self.nymphes_osc._log_traffic_summary()
+
+        info.assert_not_called()
+
+    def test_messages_are_logged_lazily_at_debug_level(self):
+        with self.assertLogs(self.nymphes_osc.logger, logging.DEBUG) as logs:
+            self.nymphes_osc._on_osc_message_mod_wheel(sender_ip, '/mod_wheel', 10)
+
+        record = logs.records[0]
+        self.assertEqual(record.levelno, logging.DEBUG)
+        self.assertEqual(record.msg, 'Received %s %s from client at %s')
+        self.assertEqual(record.args, ('/mod_wheel', 10, '127.0.0.1'))
+
+    def test_summary_is_logged_by_update(self):
+        self.receive_performance_control_messages()
+
+        # Nothing is logged until the interval has passed
+        with mock.patch.object(self.nymphes_osc, '_log_traffic_summary') as log_traffic_summary:
+            self.nymphes_osc.update()
+        log_traffic_summary.assert_not_called()
+
+        self.nymphes_osc._traffic_summary_last_timestamp = time.time() - NymphesOSC.traffic_summary_interval_sec
+
+        with self.assertLogs(self.nymphes_osc.logger, logging.INFO) as logs:
+            self.nymphes_osc.update()
+
+        self.assertTrue(any('Received 5 parameter' in line for line in logs.output))
+
+
+class TestTouch(NymphesOSCTestCase):
+    nymphes_osc_kwargs = {'preset_snapshot_min_interval_sec': 0}
+
+    def setUp(self):
+        super().setUp()
+
+        self.connect_fake_nymphes()
+        self.nymphes_osc.update()
+        self.sent_to_nymphes()
+
+    def receive(self, address, value):
+        """
+        Pass an OSC message from a client to NymphesOSC, and return
+        the messages sent to Nymphes.
+        """
+        self.nymphes_osc._on_other_osc_message(sender_ip, address, value)
+        self.nymphes_osc.update()
+        return self.sent_to_nymphes()
+
+    def test_float_param_is_committed_when_touch_ends(self):
+        cutoff_control = NymphesPreset.midi_cc_for_param_name('lpf.cutoff.value')
+
+        self.assertEqual(self.receive('/touch/lpf/cutoff/value', 1), [])
+
+        # While the control is touched, the nearest MIDI CC values are sent
+        sent = self.receive('/lpf/cutoff/value', 41.3)
+        self.assertEqual([(msg.type, msg.control, msg.value) for msg in sent], [('control_change', cutoff_control, 41)])
+
+        for value in [43.2, 45.6]:
+            sent = self.receive('/lpf/cutoff/value', value)
+            self.assertNotIn('sysex', [msg.type for msg in sent])
+
+        self.assertIn('lpf.cutoff.value', self.nymphes_osc._nymphes_midi._param_gestures_dict)
+
+        # The exact value is sent when the touch ends
+        sent = self.receive('/touch/lpf/cutoff/value', 0)
+        self.assertEqual([msg.type for msg in sent], ['sysex'])
+        self.assertEqual(NymphesPreset(sysex_data=sent[0].data).get_float('lpf.cutoff.value'), 45.6)
+
+        self.assertEqual(self.nymphes_osc._touches_dict, {})
+        self.assertEqual(self.nymphes_osc._nymphes_midi._param_gestures_dict, {})
+
+    def test_int_param_is_committed_when_touch_ends(self):
+        voice_mode_control = NymphesPreset.midi_cc_for_param_name('osc.voice_mode.value')
+
+        self.receive('/touch/osc/voice_mode/value', 1)
+
+        # Values sent less than param_gesture_transmit_interval_sec
+        # after the last one are held back
+        with mock.patch.object(type(self.nymphes_osc._nymphes_midi), 'param_gesture_transmit_interval_sec', 100.0):
+            sent = []
+            for value in [1, 2, 3]:
+                sent.extend(self.receive('/osc/voice_mode/value', value))
+
+            self.assertEqual([(msg.control, msg.value) for msg in sent], [(voice_mode_control, 1)])
+
+            # The last value is sent when the touch ends
+            sent = self.receive('/touch/osc/voice_mode/value', 0)
+
+        self.assertEqual([(msg.type, msg.control, msg.value) for msg in sent], [('control_change', voice_mode_control, 3)])
+
+    def test_touch_without_changes_sends_nothing(self):
+        self.receive('/touch/lpf/cutoff/value', 1)
+
+        self.assertEqual(self.receive('/touch/lpf/cutoff/value', 0), [])
+
+    def test_touch_times_out(self):
+        self.receive('/touch/lpf/cutoff/value', 1)
+        self.receive('/lpf/cutoff/value', 41.3)
+
+        self.nymphes_osc._touches_dict['lpf.cutoff.value']['last_activity_timestamp'] -= NymphesOSC.touch_timeout_sec
+
+        # The touch ends, so the exact value is committed
+        self.nymphes_osc.update()
+        self.nymphes_osc.update()
+        sent = self.sent_to_nymphes()
+
+        self.assertEqual([msg.type for msg in sent], ['sysex'])
+        self.assertEqual(self.nymphes_osc._touches_dict, {})
+
+    def test_touch_for_unknown_param(self):
+        self.receive('/touch/not/a/param', 1)
+
+        self.assertEqual(self.nymphes_osc._touches_dict, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,254 @@
+import copy
+import random
+import tempfile
+import unittest
+from pathlib import Path
+from nymphes_midi.NymphesPreset import NymphesPreset
+
+
+def random_preset(seed):
+    """
+    Returns a NymphesPreset with a random value for every parameter.
+    Float values have more decimal places than CSV preset files store.
+    """
+    rng = random.Random(seed)
+    p = NymphesPreset()
+
+    for param_name in NymphesPreset.all_param_names():
+        min_val = NymphesPreset.min_val_for_param_name(param_name)
+        max_val = NymphesPreset.max_val_for_param_name(param_name)
+
+        if NymphesPreset.type_for_param_name(param_name) == float:
+            p.set_float(param_name, rng.uniform(min_val, max_val))
+        else:
+            p.set_int(param_name, rng.randint(min_val, max_val))
+
+    return p
+
+
+class TestNymphesPresetClone(unittest.TestCase):
+    def setUp(self):
+        self.original = NymphesPreset()
+        self.original.set_float('lpf.cutoff.value', 40.0)
+        self.original.set_int('osc.voice_mode.value', 2)
+
+    def test_writes_to_clone_do_not_change_original(self):
+        original_fingerprint = self.original.fingerprint
+        original_sysex_data = self.original.generate_sysex_data('non-persistent', 'user', 'A', 1)
+
+        clone = self.original.clone()
+        clone.set_float('lpf.cutoff.value', 90.0)
+        clone.set_int('osc.voice_mode.value', 4)
+
+        self.assertEqual(self.original.get_float('lpf.cutoff.value'), 40.0)
+        self.assertEqual(self.original.get_int('osc.voice_mode.value'), 2)
+        self.assertEqual(self.original.fingerprint, original_fingerprint)
+        self.assertEqual(self.original.generate_sysex_data('non-persistent', 'user', 'A', 1), original_sysex_data)
+
+        self.assertEqual(clone.get_float('lpf.cutoff.value'), 90.0)
+        self.assertNotEqual(clone.fingerprint, original_fingerprint)
+
+    def test_writes_to_original_do_not_change_clone(self):
+        clone = self.original.clone()
+        self.original.set_float('lpf.cutoff.value', 90.0)
+
+        self.assertEqual(clone.get_float('lpf.cutoff.value'), 40.0)
+
+    def test_clone_of_clone(self):
+        clone = self.original.clone()
+        second_clone = clone.clone()
+        clone.set_float('lpf.cutoff.value', 10.0)
+        second_clone.set_float('lpf.cutoff.value', 20.0)
+
+        self.assertEqual(
+            [p.get_float('lpf.cutoff.value') for p in [self.original, clone, second_clone]],
+            [40.0, 10.0, 20.0]
+        )
+
+    def test_deepcopy_clones(self):
+        copied = copy.deepcopy(self.original)
+        copied.set_float('lpf.cutoff.value', 90.0)
+
+        self.assertEqual(self.original.get_float('lpf.cutoff.value'), 40.0)
+
+
+class TestNymphesPresetDiff(unittest.TestCase):
+    def test_identical_presets(self):
+        self.assertEqual(NymphesPreset().diff(NymphesPreset()), [])
+
+    def test_changed_params(self):
+        p = NymphesPreset()
+        other = p.clone()
+        other.set_float('lpf.cutoff.value', 12.5)
+        other.set_int('osc.voice_mode.value', 3)
+
+        self.assertEqual(sorted(p.diff(other)), ['lpf.cutoff.value', 'osc.voice_mode.value'])
+
+    def test_float_values_are_compared_at_stored_precision(self):
+        p = NymphesPreset()
+        p.set_float('lpf.cutoff.value', 12.5)
+        other = p.clone()
+        other.set_float('lpf.cutoff.value', 12.5001)
+
+        self.assertEqual(p.diff(other), [])
+
+
+class TestNymphesPresetFileLoading(unittest.TestCase):
+    def setUp(self):
+        temp_directory = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_directory.cleanup)
+        self.filepath = Path(temp_directory.name) / 'preset.txt'
+
+    def write_rows(self, header_string, rows):
+        self.filepath.write_text('\n'.join([header_string] + [f'{name}, {value}' for name, value in rows]) + '\n')
+
+    def test_v2_values_are_loaded(self):
+        p = NymphesPreset()
+        p.set_float('lpf.cutoff.value', 12.3)
+        p.set_int('osc.voice_mode.value', 3)
+        p.set_int('chord_1.semi_2.value', -12)
+        p.save_preset_file(self.filepath)
+
+        loaded = NymphesPreset(filepath=self.filepath)
+
+        self.assertEqual(loaded.get_float('lpf.cutoff.value'), 12.3)
+        self.assertEqual(loaded.get_int('osc.voice_mode.value'), 3)
+        self.assertEqual(loaded.get_int('chord_1.semi_2.value'), -12)
+        self.assertEqual(loaded.diff(p), [])
+
+    def test_v1_none_values_keep_defaults(self):
+        default_cutoff = NymphesPreset().get_float('lpf.cutoff.value')
+
+        self.write_rows('nymphes-midi preset v1.0.0', [
+            ('lpf.cutoff.value', 'None'),
+            ('lpf.resonance.value', '20.0')
+        ])
+
+        loaded = NymphesPreset(filepath=self.filepath)
+
+        self.assertEqual(loaded.get_float('lpf.cutoff.value'), default_cutoff)
+        self.assertEqual(loaded.get_float('lpf.resonance.value'), 20.0)
+
+    def test_unknown_rows_are_ignored(self):
+        self.write_rows('Blue and Pink Synth Editor Preset v2.0.0', [
+            ('preset_type', 'user'),
+            ('lpf.cutoff.value', '30.0')
+        ])
+
+        self.assertEqual(NymphesPreset(filepath=self.filepath).get_float('lpf.cutoff.value'), 30.0)
+
+    def test_invalid_files(self):
+        for header_string, rows in [
+            ('Not a preset', [('lpf.cutoff.value', '30.0')]),
+            ('Blue and Pink Synth Editor Preset v2.0.0', [('osc.voice_mode.value', '9')]),
+            ('Blue and Pink Synth Editor Preset v2.0.0', [('lpf.cutoff.value', 'None')]),
+        ]:
+            self.write_rows(header_string, rows)
+
+            with self.assertRaises(Exception):
+                NymphesPreset(filepath=self.filepath)
+
+    def test_binary_data_which_is_not_a_preset(self):
+        self.filepath.write_bytes(bytes(range(256)))
+
+        with self.assertRaises(Exception):
+            NymphesPreset(filepath=self.filepath)
+
+
+class TestNymphesPresetBinaryFile(unittest.TestCase):
+    def setUp(self):
+        temp_directory = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_directory.cleanup)
+        self.temp_directory_path = Path(temp_directory.name)
+
+        self.preset = random_preset(3)
+        self.filepath = self.temp_directory_path / 'preset.nym'
+        self.preset.save_preset_file(self.filepath)
+
+    def test_round_trip(self):
+        loaded = NymphesPreset(filepath=self.filepath)
+
+        self.assertEqual(self.filepath.read_bytes()[:4], b'NYMP')
+        self.assertEqual(loaded._protobuf_preset.SerializeToString(), self.preset._protobuf_preset.SerializeToString())
+
+    def test_smaller_than_csv(self):
+        csv_filepath = self.temp_directory_path / 'preset.txt'
+        self.preset.save_preset_file(csv_filepath)
+
+        self.assertLess(self.filepath.stat().st_size, csv_filepath.stat().st_size)
+
+    def test_csv_and_binary_files_load_the_same_preset(self):
+        csv_filepath = self.temp_directory_path / 'preset.txt'
+        self.preset.save_preset_file(csv_filepath)
+
+        self.assertEqual(NymphesPreset(filepath=csv_filepath).diff(NymphesPreset(filepath=self.filepath)), [])
+
+    def test_corrupt_files_are_rejected(self):
+        data = self.filepath.read_bytes()
+
+        for corrupt_data in [
+            data[:10],                              # Truncated header
+            data[:-1],                              # Truncated preset data
+            data[:-1] + bytes([data[-1] ^ 0xff]),   # Changed preset data
+            data[:4] + bytes([2, 0]) + data[6:]     # Unsupported version
+        ]:
+            self.filepath.write_bytes(corrupt_data)
+
+            with self.assertRaises(Exception):
+                NymphesPreset(filepath=self.filepath)
+
+    def test_invalid_file_format(self):
+        with self.assertRaises(Exception):
+            self.preset.save_preset_file(self.filepath, file_format='v4.0.0')
+
+
+class TestNymphesPresetFingerprint(unittest.TestCase):
+    def setUp(self):
+        temp_directory = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_directory.cleanup)
+        self.temp_directory_path = Path(temp_directory.name)
+
+    def assert_fingerprint_survives_save(self, filename, file_format=None):
+        for seed in range(10):
+            p = random_preset(seed)
+            filepath = self.temp_directory_path / filename
+            p.save_preset_file(filepath, file_format=file_format)
+
+            self.assertEqual(NymphesPreset(filepath=filepath).fingerprint, p.fingerprint, f'seed {seed}')
+
+    def test_txt_file(self):
+        self.assert_fingerprint_survives_save('preset.txt')
+
+    def test_nym_file(self):
+        self.assert_fingerprint_survives_save('preset.nym')
+
+    def test_v3_file_with_txt_suffix(self):
+        self.assert_fingerprint_survives_save('preset_v3.txt', file_format='v3.0.0')
+
+    def test_sysex(self):
+        p = random_preset(1)
+        sysex_data = p.generate_sysex_data('persistent', 'user', 'B', 3)
+
+        self.assertEqual(NymphesPreset(sysex_data=sysex_data).fingerprint, p.fingerprint)
+
+    def test_fingerprint_changes_with_values(self):
+        p = NymphesPreset()
+        fingerprint = p.fingerprint
+
+        p.set_float('lpf.cutoff.value', 12.5)
+        self.assertNotEqual(p.fingerprint, fingerprint)
+
+        p.set_float('lpf.cutoff.value', NymphesPreset().get_float('lpf.cutoff.value'))
+        self.assertEqual(p.fingerprint, fingerprint)
+
+    def test_fingerprint_ignores_slot(self):
+        p = random_preset(2)
+
+        self.assertEqual(
+            NymphesPreset(sysex_data=p.generate_sysex_data('persistent', 'user', 'A', 1)).fingerprint,
+            NymphesPreset(sysex_data=p.generate_sysex_data('persistent', 'factory', 'G', 7)).fingerprint
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from nymphes_midi.NymphesPreset import NymphesPreset
+from nymphes_midi.PresetCache import PresetCache
+
+
+class TestPresetCache(unittest.TestCase):
+    def setUp(self):
+        temp_directory = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_directory.cleanup)
+        self.temp_directory_path = Path(temp_directory.name)
+
+    def write_preset_file(self, name, cutoff):
+        filepath = self.temp_directory_path / name
+        filepath.parent.mkdir(parents=True, exist_ok=True)
+
+        p = NymphesPreset()
+        p.set_float('lpf.cutoff.value', cutoff)
+        p.save_preset_file(filepath)
+
+        return filepath
+
+    def test_hits_and_misses(self):
+        cache = PresetCache(capacity=2)
+        filepath = self.write_preset_file('a.txt', 10.0)
+
+        self.assertEqual(cache.load(filepath).get_float('lpf.cutoff.value'), 10.0)
+        self.assertEqual(cache.load(filepath).get_float('lpf.cutoff.value'), 10.0)
+
+        self.assertEqual(cache.stats, {'preset_cache_hits': 1, 'preset_cache_misses': 1, 'preset_cache_size': 1})
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = PresetCache(capacity=2)
+        a_filepath = self.write_preset_file('a.txt', 10.0)
+        b_filepath = self.write_preset_file('b.txt', 20.0)
+        c_filepath = self.write_preset_file('c.txt', 30.0)
+
+        cache.load(a_filepath)
+        cache.load(b_filepath)
+
+        # a is now more recently used than b
+        cache.load(a_filepath)
+
+        # This evicts b
+        cache.load(c_filepath)
+
+        cache.load(a_filepath)
+        self.assertEqual(cache.stats['preset_cache_misses'], 3)
+
+        cache.load(b_filepath)
+        self.assertEqual(cache.stats['preset_cache_misses'], 4)
+        self.assertEqual(cache.stats['preset_cache_size'], 2)
+
+    def test_changed_file_is_parsed_again(self):
+        cache = PresetCache()
+        filepath = self.write_preset_file('a.txt', 10.0)
+        cache.load(filepath)
+
+        self.write_preset_file('a.txt', 20.5)
+
+        # Make sure the modification time differs, even on
+        # filesystems with coarse timestamps
+        stat_result = filepath.stat()
+        os.utime(filepath, ns=(stat_result.st_atime_ns, stat_result.st_mtime_ns + 1_000_000_000))
+
+        self.assertEqual(cache.load(filepath).get_float('lpf.cutoff.value'), 20.5)
+        self.assertEqual(cache.stats['preset_cache_misses'], 2)
+
+    def test_invalidate_files_and_directories(self):
+        cache = PresetCache()
+        a_filepath = self.write_preset_file('a.txt', 10.0)
+        b_filepath = self.write_preset_file('folder/b.txt', 20.0)
+        c_filepath = self.write_preset_file('folder/c.txt', 30.0)
+
+        for filepath in [a_filepath, b_filepath, c_filepath]:
+            cache.load(filepath)
+
+        cache.invalidate([str(a_filepath)])
+        self.assertEqual(cache.stats['preset_cache_size'], 2)
+
+        cache.invalidate([self.temp_directory_path / 'folder'])
+        self.assertEqual(cache.stats['preset_cache_size'], 0)
+
+    def test_loaded_presets_are_copies(self):
+        cache = PresetCache()
+        filepath = self.write_preset_file('a.txt', 10.0)
+
+        cache.load(filepath).set_float('lpf.cutoff.value', 99.0)
+
+        self.assertEqual(cache.load(filepath).get_float('lpf.cutoff.value'), 10.0)
+
+    def test_zero_capacity_disables_cache(self):
+        cache = PresetCache(capacity=0)
+        filepath = self.write_preset_file('a.txt', 10.0)
+
+        cache.load(filepath)
+        cache.load(filepath)
+
+        self.assertEqual(cache.stats, {'preset_cache_hits': 0, 'preset_cache_misses': 2, 'preset_cache_size': 0})
+
+    def test_invalid_capacity(self):
+        with self.assertRaises(Exception):
+            PresetCache(capacity=-1)
+
+
+if __name__ == '__main__':
+    unittest.main()
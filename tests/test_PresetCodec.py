@@ -0,0 +1,70 @@
+import random
+import unittest
+from nymphes_midi.NymphesPreset import NymphesPreset
+from nymphes_midi.PresetCodec import PresetCodec
+
+
+def random_preset(seed):
+    """
+    Returns a NymphesPreset with a random value for every parameter.
+    """
+    rng = random.Random(seed)
+    p = NymphesPreset()
+
+    for param_name in NymphesPreset.all_param_names():
+        min_val = NymphesPreset.min_val_for_param_name(param_name)
+        max_val = NymphesPreset.max_val_for_param_name(param_name)
+
+        if NymphesPreset.type_for_param_name(param_name) == float:
+            p.set_float(param_name, round(rng.uniform(min_val, max_val), 3))
+        else:
+            p.set_int(param_name, rng.randint(min_val, max_val))
+
+    return p
+
+
+class TestPresetCodec(unittest.TestCase):
+    def tearDown(self):
+        NymphesPreset.set_codec('protobuf')
+
+    def test_encode_matches_protobuf_runtime(self):
+        for seed in range(20):
+            protobuf_preset = random_preset(seed)._protobuf_preset
+
+            self.assertEqual(PresetCodec.encode(protobuf_preset), protobuf_preset.SerializeToString())
+
+    def test_decode_round_trips(self):
+        for seed in range(20):
+            protobuf_bytes = random_preset(seed)._protobuf_preset.SerializeToString()
+
+            decoded_protobuf_preset = PresetCodec.decode(protobuf_bytes)
+
+            self.assertEqual(decoded_protobuf_preset.SerializeToString(), protobuf_bytes)
+            self.assertEqual(PresetCodec.encode(decoded_protobuf_preset), protobuf_bytes)
+
+    def test_decode_rejects_unknown_fields(self):
+        protobuf_bytes = NymphesPreset()._protobuf_preset.SerializeToString()
+
+        # Field 100, varint 1
+        with self.assertRaises(Exception):
+            PresetCodec.decode(protobuf_bytes + bytes([0xa0, 0x06, 0x01]))
+
+    def test_sysex_is_the_same_with_either_codec(self):
+        p = random_preset(1)
+        protobuf_sysex_data = p.generate_sysex_data('non-persistent', 'user', 'A', 1)
+
+        NymphesPreset.set_codec('fast')
+
+        fast_sysex_data = random_preset(1).generate_sysex_data('non-persistent', 'user', 'A', 1)
+        self.assertEqual(fast_sysex_data, protobuf_sysex_data)
+
+        decoded_preset = NymphesPreset(sysex_data=fast_sysex_data)
+        self.assertEqual(decoded_preset.fingerprint, p.fingerprint)
+
+    def test_invalid_codec_name(self):
+        with self.assertRaises(Exception):
+            NymphesPreset.set_codec('json')
+
+
+if __name__ == '__main__':
+    unittest.main()
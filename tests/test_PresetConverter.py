@@ -0,0 +1,68 @@
+import tempfile
+import unittest
+from pathlib import Path
+from nymphes_midi.NymphesPreset import NymphesPreset
+from nymphes_midi.PresetConverter import PresetConverter
+from nymphes_midi.SyxFileReader import SyxFileReader
+
+
+def preset_sysex_bytes(wave):
+    preset = NymphesPreset()
+    preset.set_float('osc.wave.value', wave)
+    return bytes([0xf0] + preset.generate_sysex_data('non-persistent', 'user', 'A', 1) + [0xf7])
+
+
+# A SYSEX message which isn't a Nymphes preset
+other_sysex_bytes = bytes([0xf0, 0x7e, 0x7f, 0x06, 0x01, 0xf7])
+
+
+class TestPresetConverterSyxFiles(unittest.TestCase):
+    def setUp(self):
+        self.temp_directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_directory.cleanup)
+
+        self.temp_directory_path = Path(self.temp_directory.name)
+        self.output_directory_path = self.temp_directory_path / 'output'
+
+    def write_syx_file(self, name, data):
+        filepath = self.temp_directory_path / name
+        filepath.write_bytes(data)
+        return filepath
+
+    def output_filepaths(self):
+        return sorted(
+            filepath.relative_to(self.output_directory_path).as_posix()
+            for filepath in self.output_directory_path.rglob('*') if filepath.is_file()
+        )
+
+    def test_count_presets_ignores_other_sysex(self):
+        filepath = self.write_syx_file('a.syx', other_sysex_bytes + preset_sysex_bytes(10.0) + other_sysex_bytes)
+
+        with SyxFileReader(filepath) as reader:
+            self.assertEqual(reader.count(), 3)
+            self.assertEqual(reader.count_presets(), 1)
+
+    def test_one_preset_with_other_sysex_is_a_single_file(self):
+        filepath = self.write_syx_file('a.syx', other_sysex_bytes + preset_sysex_bytes(10.0))
+
+        result = PresetConverter().convert([filepath], self.output_directory_path, 'txt')
+
+        self.assertEqual(self.output_filepaths(), ['a.txt'])
+        self.assertEqual(result['converted'], 1)
+        self.assertEqual(len(result['failed']), 1)
+        self.assertEqual(
+            NymphesPreset(filepath=self.output_directory_path / 'a.txt').get_float('osc.wave.value'),
+            10.0
+        )
+
+    def test_several_presets_are_written_to_a_folder(self):
+        filepath = self.write_syx_file('a.syx', preset_sysex_bytes(10.0) + preset_sysex_bytes(20.0))
+
+        result = PresetConverter().convert([filepath], self.output_directory_path, 'nym')
+
+        self.assertEqual(self.output_filepaths(), ['a/a_1.nym', 'a/a_2.nym'])
+        self.assertEqual(result['failed'], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
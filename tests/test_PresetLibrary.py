@@ -0,0 +1,70 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from nymphes_midi.NymphesPreset import NymphesPreset
+from nymphes_midi.PresetLibrary import PresetLibrary
+
+
+def write_preset_file(filepath, wave=0.0):
+    preset = NymphesPreset()
+    preset.set_float('osc.wave.value', wave)
+    preset.save_preset_file(filepath)
+    return preset
+
+
+class TestPresetLibrary(unittest.TestCase):
+    def setUp(self):
+        self.temp_directory = tempfile.TemporaryDirectory()
+        self.temp_directory_path = Path(self.temp_directory.name).resolve()
+        self.presets_directory_path = self.temp_directory_path / 'presets'
+        self.presets_directory_path.mkdir()
+        self.database_filepath = self.temp_directory_path / 'library.sqlite3'
+
+    def tearDown(self):
+        self.temp_directory.cleanup()
+
+    def test_refresh_counts_changes(self):
+        write_preset_file(self.presets_directory_path / 'a.txt', 10.0)
+        write_preset_file(self.presets_directory_path / 'b.nym', 20.0)
+        (self.presets_directory_path / 'broken.txt').write_text('not a preset\n')
+
+        library = PresetLibrary(self.presets_directory_path, self.database_filepath)
+        self.addCleanup(library.close)
+
+        self.assertEqual(library.refresh(), (2, 0, 0, 1))
+        self.assertEqual(library.num_presets, 2)
+
+        write_preset_file(self.presets_directory_path / 'a.txt', 30.0)
+        (self.presets_directory_path / 'b.nym').unlink()
+
+        self.assertEqual(library.refresh(), (0, 1, 1, 0))
+        self.assertEqual(library.param_values('a.txt')['osc.wave.value'], 30.0)
+
+    def test_relative_presets_directory(self):
+        preset = write_preset_file(self.presets_directory_path / 'a.txt', 10.0)
+
+        previous_working_directory_path = Path.cwd()
+        os.chdir(self.temp_directory_path)
+        try:
+            library = PresetLibrary('presets', self.database_filepath)
+            library.refresh()
+        finally:
+            os.chdir(previous_working_directory_path)
+
+        self.addCleanup(library.close)
+
+        total_count, presets = library.list_presets()
+        self.assertEqual(total_count, 1)
+
+        filepath, fingerprint = presets[0]
+        self.assertEqual(Path(filepath), self.presets_directory_path / 'a.txt')
+        self.assertTrue(Path(filepath).exists())
+        self.assertEqual(fingerprint, preset.fingerprint)
+
+        self.assertEqual(library.paths_for_fingerprint(preset.fingerprint), [filepath])
+        self.assertIsNotNone(library.param_values(filepath))
+
+
+if __name__ == '__main__':
+    unittest.main()
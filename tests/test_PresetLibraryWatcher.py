@@ -0,0 +1,87 @@
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from nymphes_midi.NymphesPreset import NymphesPreset
+from nymphes_midi.PresetLibrary import PresetLibrary
+from nymphes_midi.PresetLibraryWatcher import PresetLibraryWatcher
+
+
+def write_preset_file(filepath, wave):
+    preset = NymphesPreset()
+    preset.set_float('osc.wave.value', wave)
+    preset.save_preset_file(filepath)
+
+
+class TestPresetLibraryWatcher(unittest.TestCase):
+    def setUp(self):
+        self.temp_directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_directory.cleanup)
+
+        temp_directory_path = Path(self.temp_directory.name).resolve()
+        self.presets_directory_path = temp_directory_path / 'presets'
+        self.presets_directory_path.mkdir()
+
+        # Open the library with a relative path, as the watcher
+        # must report the same absolute paths as the library
+        previous_working_directory_path = Path.cwd()
+        os.chdir(temp_directory_path)
+        try:
+            self.library = PresetLibrary('presets', temp_directory_path / 'library.sqlite3')
+        finally:
+            os.chdir(previous_working_directory_path)
+
+        self.addCleanup(self.library.close)
+
+        self.changes = []
+        self.watcher = PresetLibraryWatcher(
+            preset_library=self.library,
+            changes_callback_function=self.changes.extend,
+            debounce_sec=0.05,
+            max_batch_delay_sec=0.5,
+            poll_interval_sec=0.1
+        )
+        self.watcher.start()
+        self.addCleanup(self.watcher.stop)
+
+    def indexed_paths(self):
+        total_count, presets = self.library.list_presets()
+        return [Path(filepath).name for filepath, fingerprint in presets]
+
+    def wait_for(self, condition, timeout_sec=5.0):
+        end_time = time.time() + timeout_sec
+        while time.time() < end_time:
+            if condition():
+                return
+            time.sleep(0.02)
+
+        self.fail('Timed out waiting for the preset library to change')
+
+    def test_changes_are_applied_to_index(self):
+        a_filepath = self.presets_directory_path / 'a.txt'
+        b_filepath = self.presets_directory_path / 'b.txt'
+
+        # Create
+        write_preset_file(a_filepath, 10.0)
+        self.wait_for(lambda: self.indexed_paths() == ['a.txt'])
+        self.assertIn(('added', str(a_filepath)), self.changes)
+
+        # Modify
+        write_preset_file(a_filepath, 30.0)
+        self.wait_for(lambda: self.library.param_values(a_filepath)['osc.wave.value'] == 30.0)
+        self.assertIn(('modified', str(a_filepath)), self.changes)
+
+        # Move
+        a_filepath.rename(b_filepath)
+        self.wait_for(lambda: self.indexed_paths() == ['b.txt'])
+        self.assertEqual(self.library.param_values(b_filepath)['osc.wave.value'], 30.0)
+
+        # Delete
+        b_filepath.unlink()
+        self.wait_for(lambda: self.indexed_paths() == [])
+        self.assertIn(('removed', str(b_filepath)), self.changes)
+
+
+if __name__ == '__main__':
+    unittest.main()
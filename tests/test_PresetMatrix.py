@@ -0,0 +1,122 @@
+import importlib.util
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+from nymphes_midi.NymphesPreset import NymphesPreset
+from nymphes_midi.PresetLibrary import PresetLibrary
+from nymphes_midi.PresetMatrix import PresetMatrix
+
+
+@unittest.skipIf(importlib.util.find_spec('numpy') is None, 'numpy is not installed')
+class TestPresetMatrix(unittest.TestCase):
+    def setUp(self):
+        temp_directory = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_directory.cleanup)
+        self.temp_directory_path = Path(temp_directory.name).resolve()
+
+        self.presets_directory_path = self.temp_directory_path / 'presets'
+        self.presets_directory_path.mkdir()
+
+        # name: (cutoff, resonance)
+        for name, values in {'a': (10.0, 100.0), 'b': (20.0, 100.0), 'c': (30.0, 50.0), 'd': (120.0, 0.0)}.items():
+            self.write_preset_file(name, *values)
+
+        self.library = PresetLibrary(self.presets_directory_path, self.temp_directory_path / 'library.sqlite3')
+        self.addCleanup(self.library.close)
+        self.library.refresh()
+
+        self.matrix_filepath = self.temp_directory_path / 'matrix.npy'
+        self.matrix = self.create_matrix()
+
+    def create_matrix(self):
+        matrix = PresetMatrix(self.library, self.matrix_filepath)
+        self.addCleanup(matrix.close)
+        return matrix
+
+    def write_preset_file(self, name, cutoff, resonance):
+        p = NymphesPreset()
+        p.set_float('lpf.cutoff.value', cutoff)
+        p.set_float('lpf.resonance.value', resonance)
+        p.save_preset_file(self.presets_directory_path / f'{name}.txt')
+        return p
+
+    def names(self, paths):
+        return [Path(path).stem for path in paths]
+
+    def test_filter(self):
+        total_count, paths = self.matrix.filter({'lpf.cutoff.value': (15.0, None)})
+        self.assertEqual((total_count, self.names(paths)), (3, ['b', 'c', 'd']))
+
+        total_count, paths = self.matrix.filter({
+            'lpf.cutoff.value': (None, 30.0),
+            'lpf.resonance.value': (100.0, 100.0)
+        })
+        self.assertEqual((total_count, self.names(paths)), (2, ['a', 'b']))
+
+    def test_filter_limit(self):
+        total_count, paths = self.matrix.filter({'lpf.cutoff.value': (None, None)}, limit=2)
+
+        self.assertEqual((total_count, self.names(paths)), (4, ['a', 'b']))
+
+    def test_filter_invalid_param_name(self):
+        with self.assertRaises(Exception):
+            self.matrix.filter({'not_a_param': (0, 1)})
+
+    def test_nearest(self):
+        p = NymphesPreset()
+        p.set_float('lpf.cutoff.value', 22.0)
+        p.set_float('lpf.resonance.value', 100.0)
+
+        for metric in PresetMatrix.metrics:
+            nearest = self.matrix.nearest(p, count=3, metric=metric)
+
+            self.assertEqual(self.names(path for path, distance in nearest), ['b', 'a', 'c'], metric)
+            self.assertEqual([distance for path, distance in nearest], sorted(distance for path, distance in nearest))
+
+    def test_nearest_exclude_fingerprint(self):
+        p = self.write_preset_file('b', 20.0, 100.0)
+        nearest = self.matrix.nearest(p, count=1, metric='l2')
+        self.assertEqual(self.names(path for path, distance in nearest), ['b'])
+        self.assertAlmostEqual(nearest[0][1], 0.0, places=5)
+
+        nearest = self.matrix.nearest(p, count=1, metric='l2', exclude_fingerprint=p.fingerprint)
+        self.assertEqual(self.names(path for path, distance in nearest), ['a'])
+
+    def test_nearest_invalid_arguments(self):
+        with self.assertRaises(Exception):
+            self.matrix.nearest(NymphesPreset(), metric='manhattan')
+
+        with self.assertRaises(Exception):
+            self.matrix.nearest(NymphesPreset(), count=0)
+
+    def test_follows_library_changes(self):
+        self.assertEqual(self.matrix.num_presets, 4)
+
+        self.write_preset_file('e', 60.0, 60.0)
+        self.write_preset_file('a', 70.0, 100.0)
+        (self.presets_directory_path / 'd.txt').unlink()
+        self.library.refresh()
+
+        self.assertEqual(self.matrix.num_presets, 4)
+
+        total_count, paths = self.matrix.filter({'lpf.cutoff.value': (50.0, None)})
+        self.assertEqual(self.names(paths), ['a', 'e'])
+
+    def test_saved_matrix_is_reused(self):
+        self.matrix.update()
+        self.matrix.close()
+
+        self.assertTrue(self.matrix_filepath.exists())
+
+        # Any values not in the saved matrix would have to be read from the library
+        with mock.patch.object(self.library, 'param_values_bytes') as param_values_bytes:
+            matrix = self.create_matrix()
+            total_count, paths = matrix.filter({'lpf.cutoff.value': (15.0, None)})
+
+        param_values_bytes.assert_not_called()
+        self.assertEqual(self.names(paths), ['b', 'c', 'd'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,159 @@
+import unittest
+from unittest import mock
+from nymphes_midi.PresetSnapshotScheduler import PresetSnapshotScheduler
+
+
+class TestPresetSnapshotScheduler(unittest.TestCase):
+    def setUp(self):
+        # The time used by the scheduler, in seconds.
+        # Times in these tests are multiples of 1/32 sec, so they add
+        # up exactly.
+        self.now = 100.0
+
+        patcher = mock.patch('nymphes_midi.PresetSnapshotScheduler.time')
+        fake_time = patcher.start()
+        self.addCleanup(patcher.stop)
+        fake_time.monotonic.side_effect = lambda: self.now
+
+        self.scheduler = PresetSnapshotScheduler(min_interval_sec=0.125, settle_sec=0.25)
+
+    def test_nothing_to_send(self):
+        self.assertFalse(self.scheduler.pending)
+        self.assertFalse(self.scheduler.take_due())
+
+    def test_leading_edge(self):
+        self.scheduler.request()
+        self.assertTrue(self.scheduler.pending)
+
+        self.assertTrue(self.scheduler.take_due())
+        self.assertFalse(self.scheduler.pending)
+        self.assertFalse(self.scheduler.take_due())
+
+        # The first change after a quiet period is sent straight away
+        self.now += 1.0
+        self.scheduler.request()
+        self.assertTrue(self.scheduler.take_due())
+
+    def test_pacing_during_gesture(self):
+        self.scheduler.request()
+        self.assertTrue(self.scheduler.take_due())
+
+        self.now += 0.03125
+        self.scheduler.request()
+        self.assertFalse(self.scheduler.take_due())
+
+        self.now += 0.0625
+        self.assertFalse(self.scheduler.take_due())
+
+        self.now += 0.03125
+        self.assertTrue(self.scheduler.take_due())
+
+    def test_not_sent_while_link_is_busy(self):
+        self.scheduler.request()
+
+        self.assertFalse(self.scheduler.take_due(link_busy=True))
+        self.assertTrue(self.scheduler.pending)
+
+        self.assertTrue(self.scheduler.take_due(link_busy=False))
+
+    def test_trailing_edge(self):
+        snapshot_times = []
+
+        # A gesture sending a change every 1/32 sec, with take_due()
+        # called as often as changes arrive
+        for step in range(12):
+            self.scheduler.request()
+            if self.scheduler.take_due():
+                snapshot_times.append(self.now - 100.0)
+            self.now += 0.03125
+
+        # The gesture has stopped
+        for step in range(12):
+            if self.scheduler.take_due():
+                snapshot_times.append(self.now - 100.0)
+            self.now += 0.03125
+
+        # The last change, at 0.34375 sec, is sent by the last snapshot
+        self.assertEqual(snapshot_times, [0.0, 0.125, 0.25, 0.375])
+        self.assertFalse(self.scheduler.pending)
+
+    def test_change_while_sending_causes_another_snapshot(self):
+        self.scheduler.request()
+        self.assertTrue(self.scheduler.take_due())
+
+        # ie: A change made on another thread while the snapshot is being sent
+        self.scheduler.request()
+        self.assertTrue(self.scheduler.pending)
+
+        self.now += 0.125
+        self.assertTrue(self.scheduler.take_due())
+
+    def test_settle(self):
+        self.scheduler.request(settle=True)
+        self.assertFalse(self.scheduler.take_due())
+
+        # Each change restarts the wait
+        self.now += 0.1875
+        self.scheduler.request(settle=True)
+        self.now += 0.1875
+        self.assertFalse(self.scheduler.take_due())
+
+        self.now += 0.0625
+        self.assertTrue(self.scheduler.take_due())
+
+    def test_change_without_settle_is_sent_straight_away(self):
+        self.scheduler.request(settle=True)
+        self.scheduler.request()
+
+        self.assertTrue(self.scheduler.take_due())
+
+    def test_cancel(self):
+        self.scheduler.request()
+        self.scheduler.cancel()
+
+        self.assertFalse(self.scheduler.pending)
+        self.assertFalse(self.scheduler.take_due())
+
+    def test_no_min_interval(self):
+        scheduler = PresetSnapshotScheduler(min_interval_sec=0)
+
+        for _ in range(3):
+            scheduler.request()
+            self.assertTrue(scheduler.take_due())
+
+        self.assertEqual(scheduler.snapshot_count, 3)
+
+    def test_stats(self):
+        # Sent after 0 ms
+        self.scheduler.request()
+        self.scheduler.take_due()
+
+        # Sent 31.25 ms after the first change
+        self.now += 1.0
+        self.scheduler.request()
+        self.now += 0.03125
+        self.scheduler.take_due()
+
+        # Sent 500 ms after the changes settled
+        self.now += 1.0
+        self.scheduler.request(settle=True)
+        self.now += 0.75
+        self.scheduler.take_due()
+
+        stats = self.scheduler.stats
+        self.assertEqual(stats['preset_snapshots_sent'], 3)
+        self.assertEqual(stats['preset_snapshot_latency_up_to_5ms'], 1)
+        self.assertEqual(stats['preset_snapshot_latency_up_to_50ms'], 1)
+        self.assertEqual(stats['preset_snapshot_latency_over_250ms'], 1)
+        self.assertEqual(sum(count for name, count in stats.items() if 'latency' in name), 3)
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(Exception):
+            PresetSnapshotScheduler(min_interval_sec=-1)
+
+        with self.assertRaises(Exception):
+            PresetSnapshotScheduler(settle_sec=-1)
+
+
+if __name__ == '__main__':
+    unittest.main()
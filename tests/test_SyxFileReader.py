@@ -0,0 +1,124 @@
+import mmap
+import random
+import tempfile
+import unittest
+from pathlib import Path
+from nymphes_midi.SyxFileReader import SyxFileReader
+
+
+def sysex_bytes(data):
+    return bytes([0xf0]) + bytes(data) + bytes([0xf7])
+
+
+def random_data(rng, length):
+    return bytes(rng.randrange(0x80) for _ in range(length))
+
+
+class TestSyxFileReader(unittest.TestCase):
+    def setUp(self):
+        temp_directory = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_directory.cleanup)
+        self.temp_directory_path = Path(temp_directory.name)
+
+    def write_syx_file(self, data, name='a.syx'):
+        filepath = self.temp_directory_path / name
+        filepath.write_bytes(data)
+        return filepath
+
+    def read(self, filepath):
+        """
+        Return (count, list of message data) for the file at filepath.
+        """
+        with SyxFileReader(filepath) as reader:
+            return reader.count(), [bytes(data) for data in reader]
+
+    def test_messages_of_different_sizes(self):
+        rng = random.Random(1)
+        messages_data = [random_data(rng, length) for length in [0, 1, 5, 2107, 30000, 3]]
+
+        filepath = self.write_syx_file(b''.join(sysex_bytes(data) for data in messages_data))
+
+        self.assertEqual(self.read(filepath), (len(messages_data), messages_data))
+
+    def test_messages_across_page_boundaries(self):
+        # Messages which start before and end after each multiple of the page size
+        rng = random.Random(2)
+        page_size = mmap.ALLOCATIONGRANULARITY
+        messages_data = [random_data(rng, page_size // 3 + 1) for _ in range(10)]
+
+        filepath = self.write_syx_file(b''.join(sysex_bytes(data) for data in messages_data))
+
+        self.assertEqual(self.read(filepath), (len(messages_data), messages_data))
+
+    def test_large_file(self):
+        rng = random.Random(3)
+        message_data = random_data(rng, 2107)
+        num_messages = 2000
+
+        filepath = self.write_syx_file(sysex_bytes(message_data) * num_messages)
+
+        with SyxFileReader(filepath) as reader:
+            self.assertEqual(reader.count(), num_messages)
+
+            num_read = 0
+            for data in reader:
+                self.assertEqual(data, message_data)
+                num_read += 1
+
+        self.assertEqual(num_read, num_messages)
+
+    def test_bytes_between_messages_are_skipped(self):
+        filepath = self.write_syx_file(
+            sysex_bytes(b'\x01\x02') +
+            b'\x00junk\x7f\xf7' +
+            sysex_bytes(b'\x03') +
+            b'\r\n' +
+            sysex_bytes(b'\x04\x05\x06') +
+            b'trailing junk'
+        )
+
+        self.assertEqual(self.read(filepath), (3, [b'\x01\x02', b'\x03', b'\x04\x05\x06']))
+
+    def test_truncated_message_is_skipped(self):
+        # The second message has no end byte before the third one starts
+        filepath = self.write_syx_file(
+            sysex_bytes(b'\x01') +
+            b'\xf0\x02\x03' +
+            sysex_bytes(b'\x04')
+        )
+
+        self.assertEqual(self.read(filepath), (2, [b'\x01', b'\x04']))
+
+    def test_incomplete_last_message_is_skipped(self):
+        filepath = self.write_syx_file(sysex_bytes(b'\x01') + b'\xf0\x02\x03')
+
+        self.assertEqual(self.read(filepath), (1, [b'\x01']))
+
+    def test_leading_whitespace_in_binary_file(self):
+        filepath = self.write_syx_file(b'\n ' + sysex_bytes(b'\x01\x02'))
+
+        self.assertEqual(self.read(filepath), (1, [b'\x01\x02']))
+
+    def test_text_file(self):
+        filepath = self.write_syx_file(b'F0 01 02 F7\nF0 7E 7F 06 01 F7\n')
+
+        self.assertEqual(self.read(filepath), (2, [b'\x01\x02', b'\x7e\x7f\x06\x01']))
+
+    def test_empty_file(self):
+        filepath = self.write_syx_file(b'')
+
+        self.assertEqual(self.read(filepath), (0, []))
+
+    def test_bytes_before_first_message_are_skipped(self):
+        filepath = self.write_syx_file(b'\xf7\x00header' + sysex_bytes(b'\x01\x02'))
+
+        self.assertEqual(self.read(filepath), (1, [b'\x01\x02']))
+
+    def test_file_without_messages(self):
+        filepath = self.write_syx_file(b'\xf7\x00\x01')
+
+        self.assertEqual(self.read(filepath), (0, []))
+
+
+if __name__ == '__main__':
+    unittest.main()
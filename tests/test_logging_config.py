@@ -0,0 +1,104 @@
+import logging
+import os
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest import mock
+from nymphes_midi.file_locations import get_data_files_directory_path
+from nymphes_osc import logging_config
+
+
+class ThreadRecorder:
+    """
+    Records the threads it is formatted on.
+    """
+
+    def __init__(self):
+        self.threads = []
+
+    def __str__(self):
+        self.threads.append(threading.current_thread())
+        return 'recorder'
+
+
+class TestLoggingConfig(unittest.TestCase):
+    def setUp(self):
+        temp_directory = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_directory.cleanup)
+
+        patcher = mock.patch.dict(os.environ, {'HOME': temp_directory.name})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        # Start without the logging set up by any other tests
+        logging_config.stop_logging()
+        self.addCleanup(logging_config.stop_logging)
+
+        self.logger = logging.getLogger('nymphes-osc.test')
+        self.log_filepath = get_data_files_directory_path() / 'logs' / 'log.txt'
+
+    def test_records_are_formatted_on_listener_thread(self):
+        # Ignore any handlers which the test runner has added to the root logger
+        patcher = mock.patch.object(logging.getLogger('nymphes-osc'), 'propagate', False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        logging_config.configure_logging()
+
+        recorder = ThreadRecorder()
+        self.logger.info('Value: %s', recorder)
+
+        # Wait for the queued record to be written
+        logging_config.stop_logging()
+
+        self.assertGreater(len(recorder.threads), 0)
+        self.assertNotIn(threading.current_thread(), recorder.threads)
+        self.assertIn('Value: recorder', self.log_filepath.read_text())
+
+    def test_records_below_level_are_not_formatted(self):
+        logging_config.configure_logging()
+
+        recorder = ThreadRecorder()
+        self.logger.setLevel(logging.INFO)
+        self.addCleanup(self.logger.setLevel, logging.NOTSET)
+
+        self.logger.debug('Value: %s', recorder)
+        logging_config.stop_logging()
+
+        self.assertEqual(recorder.threads, [])
+
+    def test_log_file_is_rotated_at_start(self):
+        logging_config.configure_logging()
+        self.logger.info('First run')
+        logging_config.stop_logging()
+
+        logging_config.configure_logging()
+        self.logger.info('Second run')
+        logging_config.stop_logging()
+
+        self.assertNotIn('First run', self.log_filepath.read_text())
+        self.assertIn('Second run', self.log_filepath.read_text())
+        self.assertIn('First run', Path(f'{self.log_filepath}.1').read_text())
+
+    def test_configure_more_than_once(self):
+        nymphes_osc_logger = logging.getLogger('nymphes-osc')
+        num_handlers = len(nymphes_osc_logger.handlers)
+
+        logging_config.configure_logging()
+        logging_config.configure_logging()
+        self.assertEqual(len(nymphes_osc_logger.handlers), num_handlers + 1)
+
+        logging_config.stop_logging()
+        self.assertEqual(len(nymphes_osc_logger.handlers), num_handlers)
+
+    def test_without_log_file(self):
+        logging_config.configure_logging(log_to_file=False)
+        self.logger.info('Console only')
+        logging_config.stop_logging()
+
+        self.assertFalse(get_data_files_directory_path().exists())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+
+# The src folder, so the subprocesses can import nymphes_osc and nymphes_midi
+src_directory_path = Path(__file__).absolute().parent.parent / 'src'
+
+
+def run_python(code):
+    """
+    Run code in a new interpreter, with a temporary home folder.
+    :param code: str. It should print a JSON value.
+    :return: The value printed by code
+    """
+    with tempfile.TemporaryDirectory() as home_directory_path:
+        env = dict(os.environ)
+        env['HOME'] = home_directory_path
+        env['PYTHONPATH'] = os.pathsep.join([str(src_directory_path)] + env.get('PYTHONPATH', '').split(os.pathsep))
+
+        result = subprocess.run([sys.executable, '-c', code], env=env, capture_output=True, text=True, timeout=60)
+
+    if result.returncode != 0:
+        raise Exception(f'Failed to run python code: {result.stderr}')
+
+    return json.loads(result.stdout)
+
+
+class TestSubcommandStartup(unittest.TestCase):
+    def test_parsing_subcommand_arguments_is_fast(self):
+        # The fastest of several runs is checked, so a busy machine
+        # doesn't cause a failure
+        elapsed_times = []
+        for _ in range(3):
+            elapsed_sec, imported_module_names = run_python('''
+import json
+import sys
+import time
+
+start_time = time.perf_counter()
+
+import nymphes_osc.__main__
+nymphes_osc.__main__.build_parser().parse_args(['convert', 'a.syx', '--output_directory', 'out', '--format', 'nym'])
+
+elapsed_sec = time.perf_counter() - start_time
+print(json.dumps([elapsed_sec, list(sys.modules)]))
+''')
+            elapsed_times.append(elapsed_sec)
+
+            for module_name in ['nymphes_midi.PresetConverter', 'nymphes_midi.NymphesPreset', 'mido', 'multiprocessing']:
+                self.assertNotIn(module_name, imported_module_names)
+
+        self.assertLess(min(elapsed_times), 0.1)
+
+    def test_convert_output_formats(self):
+        from nymphes_midi.PresetConverter import PresetConverter
+        from nymphes_midi.convert_arguments import convert_output_formats
+
+        self.assertEqual(sorted(convert_output_formats), sorted(PresetConverter.output_formats))
+
+
+class TestImportSideEffects(unittest.TestCase):
+    def test_optional_network_modules_are_not_imported(self):
+        imported_module_names = run_python('''
+import json
+import sys
+import nymphes_osc.__main__
+print(json.dumps(list(sys.modules)))
+''')
+
+        for module_name in ['zeroconf', 'netifaces']:
+            self.assertNotIn(module_name, imported_module_names)
+
+    def test_no_files_are_created(self):
+        home_directory_contents = run_python('''
+import json
+import os
+import nymphes_osc.__main__
+import nymphes_osc.logging_config
+import nymphes_midi.file_locations
+print(json.dumps(os.listdir(os.path.expanduser('~'))))
+''')
+
+        self.assertEqual(home_directory_contents, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
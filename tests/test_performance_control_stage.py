@@ -0,0 +1,31 @@
+import unittest
+from nymphes_osc.performance_control_stage import PerformanceControlStage
+
+
+class TestPerformanceControlStage(unittest.TestCase):
+    def setUp(self):
+        self.sent = []
+        self.stage = PerformanceControlStage(
+            send_function=lambda name, value: self.sent.append((name, value)),
+            max_values_dict={'mod_wheel': 127},
+            max_rate_hz=None
+        )
+
+    def test_unchanged_value_is_dropped(self):
+        self.stage.put('mod_wheel', 64)
+        self.stage.put('mod_wheel', 64.2)
+
+        self.assertEqual(self.sent, [('mod_wheel', 64)])
+
+    def test_value_is_sent_again_after_reset(self):
+        self.stage.put('mod_wheel', 64)
+
+        # ie: a MIDI keyboard has moved the mod wheel
+        self.stage.reset('mod_wheel')
+        self.stage.put('mod_wheel', 64)
+
+        self.assertEqual(self.sent, [('mod_wheel', 64), ('mod_wheel', 64)])
+
+
+if __name__ == '__main__':
+    unittest.main()